@@ -0,0 +1,160 @@
+import asyncio
+import random
+import time
+import zlib
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from scrapers.parquet_sink import StreamingParquetWriter
+
+# Message templates: CTI ones contain at least one CTI keyword, the others none
+CTI_TEMPLATES = [
+    "{actor} exploits {cve} in {product} to deploy {malware} against {sector} networks",
+    "New {malware} ransomware campaign targets {sector} organisations in {country}",
+    "Patch now: {product} vulnerability {cve} is actively exploited in the wild",
+    "Phishing kit impersonating {brand} steals credentials from {sector} staff",
+    "Data breach at {company} exposes {count} customer records on a leak forum",
+    "{actor} botnet grows to {count} devices after abusing {cve}",
+    "Researchers detail zero-day in {product} used by {actor} to drop spyware",
+]
+NON_CTI_TEMPLATES = [
+    "Join our webinar on {topic} next {day}, registration is open",
+    "{company} announces quarterly results and a new office in {country}",
+    "Weekly roundup: {topic} tips for {sector} teams",
+    "Happy {holiday} from everyone at {company}!",
+    "{brand} releases version {version} of its mobile app with dark mode",
+    "Meet the {company} team at the {topic} conference in {country}",
+]
+VOCAB = {
+    "actor": ["APT28", "APT29", "Lazarus", "FIN7", "Scattered Spider", "Sandworm", "Kimsuky", "TA505"],
+    "malware": ["LockBit", "BlackCat", "Qakbot", "Emotet", "RedLine", "Cobalt Strike", "AsyncRAT", "Akira"],
+    "product": ["Fortinet FortiOS", "Citrix NetScaler", "Ivanti Connect Secure", "MOVEit Transfer",
+                "Microsoft Exchange", "VMware ESXi", "Confluence", "PAN-OS"],
+    "sector": ["healthcare", "finance", "government", "energy", "education", "retail", "telecom"],
+    "country": ["Germany", "Brazil", "Japan", "Canada", "India", "France", "Kenya", "Australia"],
+    "brand": ["Microsoft", "DHL", "PayPal", "Netflix", "Adobe", "DocuSign", "WhatsApp"],
+    "company": ["Acme Corp", "Globex", "Initech", "Umbrella", "Hooli", "Stark Industries", "Wayne Enterprises"],
+    "topic": ["cloud migration", "data engineering", "remote work", "DevOps", "product design", "AI adoption"],
+    "day": ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"],
+    "holiday": ["New Year", "Thanksgiving", "Diwali", "Lunar New Year", "Eid"],
+}
+
+
+def _fill(template, rng):
+    values = {name: rng.choice(choices) for name, choices in VOCAB.items()}
+    values["cve"] = f"CVE-{rng.randint(2019, 2025)}-{rng.randint(1000, 49999)}"
+    values["count"] = f"{rng.randint(1, 900) * 1000:,}"
+    values["version"] = f"{rng.randint(1, 12)}.{rng.randint(0, 9)}"
+    # A trailing tag keeps the vocabulary growing with the corpus, like real channels
+    return template.format(**values) + f" #{rng.randint(0, 1 << 20):x}"
+
+
+def generate_messages(n, cti_ratio=0.3, repost_ratio=0.05, seed=0):
+    """
+    Yield `n` synthetic Telegram message texts, deterministically for a given `seed`.
+    About `cti_ratio` of them are threat reports; `repost_ratio` repeat an earlier message.
+    """
+    rng = random.Random(seed)
+    recent = []
+    for _ in range(n):
+        if recent and rng.random() < repost_ratio:
+            yield rng.choice(recent)
+            continue
+        templates = CTI_TEMPLATES if rng.random() < cti_ratio else NON_CTI_TEMPLATES
+        text = _fill(rng.choice(templates), rng)
+        if len(recent) < 1000:
+            recent.append(text)
+        else:
+            recent[rng.randrange(1000)] = text
+        yield text
+
+
+def synthetic_dataset(path, n, cti_ratio=0.3, seed=0, chunk_size=50_000):
+    """
+    Write a synthetic corpus of `n` messages to `path` as a scraped dataset, one part file per
+    `chunk_size` messages through the scraper's StreamingParquetWriter, so memory stays bounded
+    by `chunk_size` however large `n` is. Returns `path`.
+    """
+    date_max = datetime(2025, 9, 1)
+    with StreamingParquetWriter(path, row_group_size=chunk_size) as writer:
+        for i, text in enumerate(generate_messages(n, cti_ratio=cti_ratio, seed=seed)):
+            message_id = n - i  # newest first, like a scrape
+            writer.append_row("text", "@bench_channel", text, date_max - timedelta(minutes=i), message_id,
+                              message_id * 7 % 5000, (), message_id % 13)
+    return path
+
+
+def fake_message(message_id, date, text):
+    """A telethon-like message with the attributes the scraper reads; every third one has reactions."""
+    return SimpleNamespace(
+        id=message_id,
+        date=date,
+        text=text,
+        views=message_id * 7 % 5000,
+        forwards=message_id % 13,
+        reactions=None if message_id % 3 else SimpleNamespace(results=[
+            SimpleNamespace(reaction=SimpleNamespace(emoticon="👍"), count=message_id % 50),
+            SimpleNamespace(reaction=SimpleNamespace(emoticon="🔥"), count=message_id % 7),
+        ]),
+    )
+
+
+class FakeTelegramClient:
+    """
+    Offline stand-in for telethon's TelegramClient, enough for `scrape(client=...)`.
+
+    Every channel holds `messages_per_channel` synthetic messages, ids 1..N, dated evenly
+    between `date_min` and `date_max` (newest first, like `iter_messages`). `latency`
+    seconds are spent per GetHistory page of `page_size` messages.
+    """
+
+    def __init__(self, messages_per_channel, date_min, date_max, latency=0.0, page_size=100, seed=0):
+        self.messages_per_channel = messages_per_channel
+        self.date_min = date_min
+        self.date_max = date_max
+        self.latency = latency
+        self.page_size = page_size
+        self.seed = seed
+        self.flood_sleep_threshold = 60
+        self.requests = 0
+
+    async def iter_messages(self, channel, search="", offset_id=0, min_id=0, wait_time=None, **kwargs):
+        n = self.messages_per_channel
+        step = (self.date_max - self.date_min) / max(n, 1)
+        texts = generate_messages(n, seed=zlib.crc32(f"{self.seed}:{channel}".encode("utf-8")))
+        top = min(offset_id - 1, n) if offset_id else n
+        served = 0
+        for message_id, text in zip(range(n, 0, -1), texts):
+            if message_id > top:
+                continue
+            if message_id <= min_id:
+                break
+            if served % self.page_size == 0:
+                self.requests += 1
+                await asyncio.sleep(self.latency)
+            served += 1
+            yield fake_message(message_id, self.date_min + step * (message_id - 1), text)
+
+
+class FakeExa:
+    """Offline stand-in for the Exa client: `search_and_contents` returns five canned hits after `latency` seconds."""
+
+    def __init__(self, latency=0.0, hits=5):
+        self.latency = latency
+        self.hits = hits
+        self.calls = 0
+
+    def search_and_contents(self, query, summary=True, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        slug = "-".join(query.lower().split()[:6])
+        return SimpleNamespace(results=[
+            SimpleNamespace(
+                title=f"Advisory {i + 1}: {query[:60]}",
+                url=f"https://news.example.com/{slug}/{i}?utm_source=exa",
+                published_date="2025-09-01",
+                summary=f"Summary {i + 1} of reporting on {query[:120]}. " * 3,
+            )
+            for i in range(self.hits)
+        ])
+
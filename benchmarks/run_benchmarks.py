@@ -0,0 +1,337 @@
+"""
+Offline benchmark suite: times the pipeline stages on synthetic data at several scales.
+
+    python -m benchmarks.run_benchmarks --sizes 10000,100000,1000000 --stages scrape,buffer,label,train,predict,exa
+    python -m benchmarks.run_benchmarks --sizes 100000 --stages handoff --telegram-latency 0.02
+
+Telegram, Exa and the LLM are replaced by the fakes in benchmarks/fixtures.py and
+benchmarks/stub_llm.py, so no network or API keys are needed. Every stage runs in a
+scratch working directory; results (wall time, items/sec, peak RSS, external calls)
+are printed and written as JSON + Prometheus text to --output.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import math
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STAGES = ("scrape", "buffer", "handoff", "label", "train", "predict", "exa", "crew")
+DEFAULT_STAGES = ("scrape", "buffer", "label", "train", "predict", "exa")
+SCRAPE_CHANNELS = 4
+
+
+def _parse_sizes(value):
+    return [int(float(size)) for size in value.split(",") if size.strip()]
+
+
+@contextlib.contextmanager
+def _quiet(enabled):
+    """Swallow the stages' own progress output unless --verbose."""
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def bench_scrape(n, args):
+    from benchmarks.fixtures import FakeTelegramClient
+    import scrapers.telegram_scraper as telegram_scraper
+
+    telegram_scraper.MAX_T_INDEX = n
+    client = FakeTelegramClient(
+        math.ceil(n / SCRAPE_CHANNELS), telegram_scraper.DATE_MIN, telegram_scraper.DATE_MAX,
+        latency=args.telegram_latency,
+    )
+    channels = [f"@bench_channel_{i}" for i in range(SCRAPE_CHANNELS)]
+    df, _ = asyncio.run(telegram_scraper.scrape(channels=channels, client=client, incremental=False))
+    return len(df)
+
+
+def _legacy_record(message, channel):
+    """A scraped row as the scraper used to build it: one dict, formatted date and reactions strings."""
+    emoji_string = ""
+    if message.reactions:
+        for reaction_count in message.reactions.results:
+            emoji_string += reaction_count.reaction.emoticon + " " + str(reaction_count.count) + " "
+    return {
+        "Type": "text",
+        "Group": channel,
+        "Content": message.text,
+        "Date": message.date.strftime("%Y-%m-%d %H:%M:%S"),
+        "Message ID": message.id,
+        "Views": message.views,
+        "Reactions": emoji_string,
+        "Shares": message.forwards,
+    }
+
+
+def bench_buffer(n, args):
+    """
+    Buffering `n` scraped messages and converting them to Arrow: one dict per row (the
+    former layout) vs the columnar MessageBuffer. Returns {layout: bytes held per message},
+    measured with tracemalloc in a separate pass so it does not slow the timed one.
+    """
+    import tracemalloc
+    from datetime import datetime, timedelta, timezone
+    import pyarrow as pa
+    from benchmarks.fixtures import fake_message, generate_messages
+    from scrapers.parquet_sink import MESSAGE_SCHEMA, MessageBuffer
+    from scrapers.telegram_scraper import message_reactions
+    from utils.text_normalization import NORMALIZED_COLUMN
+
+    # Dates and reactions used to be strings, and there was no normalized column
+    legacy_schema = pa.schema([(field.name, pa.string() if field.name in ("Date", "Reactions") else field.type)
+                               for field in MESSAGE_SCHEMA if field.name != NORMALIZED_COLUMN])
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    def fill(layout):
+        messages = (fake_message(i, start + timedelta(seconds=i), text)
+                    for i, text in enumerate(generate_messages(n, seed=n), 1))
+        if layout == "dicts":
+            return [_legacy_record(message, "@bench_channel") for message in messages]
+        buffer = MessageBuffer()
+        for message in messages:
+            buffer.append_row("text", "@bench_channel", message.text, message.date, message.id,
+                              message.views, message_reactions(message), message.forwards)
+        return buffer
+
+    per_message = {}
+    for layout in ("dicts", "columnar"):
+        with _telemetry().span(f"bench.buffer.{layout}", size=n) as span:
+            rows = fill(layout)
+            table = pa.Table.from_pylist(rows, schema=legacy_schema) if layout == "dicts" else rows.to_table()
+            span.add(table.num_rows)
+        del rows, table
+
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        rows = fill(layout)
+        per_message[layout] = (tracemalloc.get_traced_memory()[0] - baseline) / n
+        tracemalloc.stop()
+        del rows
+    return per_message
+
+
+def bench_label(corpus, n, args):
+    import pyarrow.dataset as ds
+    from ml.cti_classifier import label_message, prepare_training_data
+
+    dataset = ds.dataset(corpus, format="parquet")
+    with _telemetry().span("bench.label_message", size=n) as span:
+        for batch in dataset.to_batches(columns=["Content"]):
+            for text in batch.column("Content").to_pylist():
+                label_message(text)
+        span.add(n)
+    with _telemetry().span("bench.prepare_training_data", size=n) as span:
+        for batch in dataset.to_batches(columns=["Content"]):
+            prepare_training_data(batch.to_pandas(), text_column="Content")
+        span.add(n)
+
+
+def bench_train(corpus, n, args):
+    from ml.cti_classifier import prepare_training_data, train_and_save_model
+    from scrapers.parquet_sink import read_dataset
+    from utils.text_normalization import NORMALIZED_COLUMN
+
+    # The batch trainer learns from one DataFrame: load and label it as `model_lifecycle train` does, untimed
+    df = prepare_training_data(read_dataset(corpus, columns=["Content", NORMALIZED_COLUMN]), text_column="Content")
+    with _telemetry().span("bench.train", size=n) as span:
+        train_and_save_model(df, text_column="Content", label_column="Label")
+        span.add(len(df))
+
+
+def bench_predict(corpus, args):
+    from ml.batch_scoring import score_parquet
+
+    return score_parquet(corpus, f"{corpus}_scored.parquet")
+
+
+def bench_exa(queries, args):
+    from benchmarks.fixtures import FakeExa, generate_messages
+    from utils.disk_cache import DiskCache
+    from utils.exa_helpers import cross_validate_with_exa
+
+    messages = list(generate_messages(queries, cti_ratio=1.0, seed=queries))
+    cache = DiskCache(os.path.join(os.getcwd(), f"exa_bench_{queries}.sqlite"))
+    client = FakeExa(latency=args.exa_latency)
+    try:
+        # Cold: every distinct query goes to the (fake) API; warm: all served from the cache
+        for phase in ("cold", "warm"):
+            with _telemetry().span(f"bench.exa.{phase}", size=queries) as span:
+                validated = cross_validate_with_exa(messages, top_n=queries, client=client, cache=cache)
+                span.add(len(validated))
+    finally:
+        cache.close()
+
+
+def bench_crew(threats, args):
+    from benchmarks.stub_llm import StubLLM
+    import crew
+
+    crew.llm = StubLLM(latency=args.llm_latency)
+    inputs = {
+        "topic": "Benchmark run",
+        "exa_results": "",
+        "threat_summary": "",
+        "cve_analysis": "",
+        "mitigation_strategies": "",
+    }
+    fake_threats = [f"{i}. Synthetic threat {i}" for i in range(1, threats + 1)]
+    crew.CyberThreatIntelCrew().kickoff_fanout(inputs=inputs, threats=fake_threats, context={"topic": inputs["topic"]})
+    return threats
+
+
+def bench_handoff(n, args):
+    """
+    Scraping `n` messages and scoring them: scrape first and score the finished dataset
+    (sequential) vs scoring each part while the scrape goes on (StreamingScorer).
+    """
+    from benchmarks.fixtures import FakeTelegramClient
+    from ml.batch_scoring import StreamingScorer, score_parquet
+    import scrapers.telegram_scraper as telegram_scraper
+
+    telegram_scraper.MAX_T_INDEX = n
+    channels = [f"@bench_channel_{i}" for i in range(SCRAPE_CHANNELS)]
+
+    def client():
+        return FakeTelegramClient(math.ceil(n / SCRAPE_CHANNELS), telegram_scraper.DATE_MIN, telegram_scraper.DATE_MAX,
+                                  latency=args.telegram_latency)
+
+    with _telemetry().span("bench.handoff.sequential", size=n) as span:
+        _, dataset_path = asyncio.run(telegram_scraper.scrape(
+            channels=channels, client=client(), incremental=False, dataset_path=f"handoff_seq_{n}", load=False))
+        span.add(score_parquet(dataset_path, f"{dataset_path}_scored.parquet"))
+
+    async def overlapped():
+        scorer = StreamingScorer(f"handoff_overlap_{n}_scored.parquet", cti_path=f"handoff_overlap_{n}_cti.parquet")
+        return await scorer.score_during(telegram_scraper.scrape(
+            channels=channels, client=client(), incremental=False, dataset_path=f"handoff_overlap_{n}", load=False,
+            on_part=scorer.submit))
+
+    with _telemetry().span("bench.handoff.overlapped", size=n) as span:
+        span.add(asyncio.run(overlapped()))
+
+
+def _telemetry():
+    from utils.telemetry import telemetry
+    return telemetry
+
+
+def run(args):
+    from benchmarks.fixtures import synthetic_dataset
+
+    telemetry = _telemetry()
+    quiet = not args.verbose
+
+    for n in args.sizes:
+        print(f"▶ size {n:,}")
+        if "scrape" in args.stages:
+            with _quiet(quiet), telemetry.span("bench.scrape", size=n) as span:
+                span.add(bench_scrape(n, args))
+        if "handoff" in args.stages:
+            with _quiet(quiet):
+                bench_handoff(n, args)
+        if "buffer" in args.stages:
+            per_message = bench_buffer(n, args)
+            print("  buffered rows: " + ", ".join(
+                f"{layout} {size:,.0f} B/message ({size * 1e6 / 2 ** 20:,.0f} MiB per 1M)"
+                for layout, size in per_message.items()))
+
+        needs_corpus = {"label", "train", "predict"} & set(args.stages)
+        if needs_corpus:
+            # Written to disk chunk by chunk, like a scrape, and read back by each stage
+            with telemetry.span("bench.generate", size=n) as span:
+                corpus = synthetic_dataset(f"corpus_{n}", n, seed=n)
+                span.add(n)
+            if "label" in args.stages:
+                with _quiet(quiet):
+                    bench_label(corpus, n, args)
+            if "train" in args.stages:
+                with _quiet(quiet):
+                    bench_train(corpus, n, args)
+            if "predict" in args.stages:
+                with _quiet(quiet), telemetry.span("bench.predict", size=n) as span:
+                    span.add(bench_predict(corpus, args))
+            shutil.rmtree(corpus, ignore_errors=True)
+
+    if "exa" in args.stages:
+        for queries in args.exa_queries:
+            print(f"▶ exa {queries:,} queries")
+            with _quiet(quiet):
+                bench_exa(queries, args)
+
+    if "crew" in args.stages:
+        print(f"▶ crew {args.crew_threats} threats")
+        with _quiet(quiet), telemetry.span("bench.crew", threats=args.crew_threats) as span:
+            span.add(bench_crew(args.crew_threats, args))
+
+
+def print_summary(spans):
+    print(f"\n{'stage':<32}{'size':>12}{'seconds':>12}{'items/s':>14}{'peak RSS MiB':>15}")
+    for span in spans:
+        if not span["name"].startswith("bench."):
+            continue
+        size = next(iter(span["labels"].values()), "")
+        rss = span["peak_rss_bytes"] / 2 ** 20 if span["peak_rss_bytes"] else 0
+        rate = span["items_per_s"] or 0
+        print(f"{span['name'][6:]:<32}{size:>12,}{span['wall_time_s']:>12.3f}{rate:>14,.0f}{rss:>15,.0f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the CTI pipeline.")
+    parser.add_argument("--sizes", type=_parse_sizes, default=[10_000, 100_000],
+                        help="comma-separated corpus sizes, e.g. 10000,100000,1e6,1e7")
+    parser.add_argument("--stages", type=lambda v: [s.strip() for s in v.split(",") if s.strip()],
+                        default=list(DEFAULT_STAGES), help=f"comma-separated subset of {','.join(STAGES)}")
+    parser.add_argument("--exa-queries", type=_parse_sizes, default=[10, 100, 1000],
+                        help="comma-separated numbers of messages to cross-validate")
+    parser.add_argument("--crew-threats", type=int, default=3, help="threats fanned out in the crew stage")
+    parser.add_argument("--telegram-latency", type=float, default=0.0, help="simulated seconds per GetHistory page")
+    parser.add_argument("--exa-latency", type=float, default=0.0, help="simulated seconds per Exa search")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="simulated seconds per LLM call")
+    parser.add_argument("--output", default=os.path.join(REPO_ROOT, "benchmarks", "results"),
+                        help="directory for the JSON / Prometheus results")
+    parser.add_argument("--keep-workdir", action="store_true", help="keep the scratch directory for inspection")
+    parser.add_argument("--verbose", action="store_true", help="show the stages' own output")
+    args = parser.parse_args(argv)
+
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    # Settings read at import time; the fakes answer instantly so pacing would only add sleeps
+    os.environ.setdefault("TELEGRAM_RATE_LIMIT_INTERVAL", "0")
+    os.environ.setdefault("TELEGRAM_TIME_LIMIT", str(10 ** 9))
+    os.environ.setdefault("CTI_KEYWORDS_FILE", os.path.join(REPO_ROOT, "ml", "cti_keywords.txt"))
+    os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+    output = os.path.abspath(args.output)
+
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    workdir = tempfile.mkdtemp(prefix="cti_bench_")
+    cwd = os.getcwd()
+    os.chdir(workdir)  # datasets, models and caches all land in the scratch directory
+    try:
+        run(args)
+    finally:
+        os.chdir(cwd)
+        if args.keep_workdir:
+            print(f"Scratch files kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    telemetry = _telemetry()
+    print_summary(telemetry.to_dict()["spans"])
+    telemetry.export(output, name=f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+import time
+from crewai import LLM
+
+STUB_RESPONSE = (
+    "Thought: I now can give a great answer\n"
+    "Final Answer: ## Summary\n"
+    "Synthetic analysis of the provided threats for benchmarking. No real model was called.\n"
+)
+
+
+class StubLLM(LLM):
+    """
+    crewai LLM that never leaves the process: every call sleeps `latency` seconds and
+    returns STUB_RESPONSE, so crew runs can be timed without an API key or network.
+    """
+
+    def __init__(self, *args, latency=0.0, response=STUB_RESPONSE, **kwargs):
+        kwargs.setdefault("model", "openai/stub")
+        super().__init__(*args, **kwargs)
+        self.latency = latency
+        self.response = response
+        self.calls = 0
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self.response
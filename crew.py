@@ -1,14 +1,36 @@
 import os
-from crewai import Agent, Crew, Process, Task, LLM
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from crewai import Agent, Crew, Process, Task
 from crewai.project import CrewBase, agent, task, crew
 from crewai.agents.agent_builder.base_agent import BaseAgent
 from typing import List
+from utils.disk_cache import DiskCache
+from utils.llm_cache import CachedLLM
+from utils.telemetry import telemetry
+from utils.token_budget import CREW_TASK_TOKEN_BUDGET, fit_inputs_to_budget
+
+# Parallel branches when a stage fans out (e.g. one vulnerability analysis per threat)
+CREW_MAX_WORKERS = int(os.getenv("CREW_MAX_WORKERS", "4"))
+
+# LLM settings (LLM_BASE_URL can point at a local OpenAI-compatible stub for development)
+LLM_MODEL = os.getenv("LLM_MODEL", "openai/gpt-3.5-turbo")
+LLM_BASE_URL = os.getenv("LLM_BASE_URL") or None
+
+# Disk-backed response cache: identical prompts at temperature 0 are answered locally.
+# Opened on the first LLM call, so importing this module leaves no file behind
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite")
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+LLM_CACHE_BYPASS = os.getenv("LLM_CACHE_BYPASS", "false").lower() in ("1", "true", "yes")
 
 # Initialize LLM
-llm = LLM(
-    model = "openai/gpt-3.5-turbo",
+llm = CachedLLM(
+    model = LLM_MODEL,
     api_key = os.getenv("OPENAI_API_KEY"),
-    temperature = 0.0
+    base_url = LLM_BASE_URL,
+    temperature = 0.0,
+    cache = partial(DiskCache, LLM_CACHE_PATH, max_bytes = LLM_CACHE_MAX_BYTES),
+    bypass = LLM_CACHE_BYPASS
 )
 
 @CrewBase
@@ -179,6 +201,10 @@ class CyberThreatIntelCrew:
         if "cross" in topic or "telegram" in topic:
             output_path = "reports/cybersecurity_report_crossvalidate.md"
 
+        # Scheduled runs write a timestamped report instead (see utils/scheduling.py)
+        if hasattr(self, "context") and self.context.get("report_path"):
+            output_path = self.context["report_path"]
+
         return Task(
             config = {},
             agent = self.report_writer(),
@@ -207,6 +233,56 @@ class CyberThreatIntelCrew:
         """
         self.context = context or {}
         return self.crew().kickoff(inputs=inputs)
+
+    def run_task(self, task_method, inputs: dict, token_budget: int = CREW_TASK_TOKEN_BUDGET):
+        """
+        Run one task of this crew on its own, with its agent, and return the CrewOutput.
+        Inputs are trimmed so the task prompt stays within `token_budget` tokens.
+        Used by `kickoff_fanout` to schedule tasks individually.
+        """
+        task = task_method()
+        template = task.description + "\n" + task.expected_output
+        fitted, tokens = fit_inputs_to_budget(template, inputs, token_budget)
+        trimmed = f" (inputs trimmed to fit {token_budget})" if fitted is not inputs else ""
+        print(f"🧮 {task.name}: ~{tokens} prompt tokens{trimmed}")
+        inputs = fitted
+        with telemetry.span(f"crew.{task.name}"):
+            return Crew(
+                agents = [task.agent],
+                tasks = [task],
+                process = Process.sequential,
+                verbose = True
+            ).kickoff(inputs=inputs)
+
+    def kickoff_fanout(self, inputs: dict, threats: List[str], context: dict = None, max_workers: int = CREW_MAX_WORKERS):
+        """
+        Run the four-agent chain with the independent work in parallel:
+
+            threat_analysis → vulnerability_analysis × len(threats) (concurrent) → incident_response → report_generation
+
+        Each vulnerability branch analyses one threat in its own crew instance, in the
+        light of the threat_analysis summary; the branch results are merged into
+        `cve_analysis` before the downstream tasks run.
+        """
+        self.context = context or {}
+        inputs = dict(inputs)
+
+        inputs["threat_summary"] = self.run_task(self.threat_analysis_task, inputs).raw
+
+        def analyse(threat):
+            branch = CyberThreatIntelCrew()
+            branch.context = self.context
+            threat_summary = f"{inputs['threat_summary']}\n\nThreat to analyse in this branch:\n{threat}"
+            return branch.run_task(branch.vulnerability_analysis_task, {**inputs, "threat_summary": threat_summary}).raw
+
+        with ThreadPoolExecutor(max_workers = max(1, min(max_workers, len(threats)))) as pool:
+            analyses = list(pool.map(analyse, threats))
+        inputs["cve_analysis"] = "\n\n".join(
+            f"Threat {idx+1} analysis:\n{analysis}" for idx, analysis in enumerate(analyses)
+        )
+
+        inputs["mitigation_strategies"] = self.run_task(self.incident_response_task, inputs).raw
+        return self.run_task(self.report_generation_task, inputs)
     
     @crew
     def crew(self) -> Crew:
@@ -1,72 +1,463 @@
+import argparse
 import asyncio
-from scrapers.telegram_scraper import scrape
-from ml.cti_classifier import predict_messages
-from utils.exa_helpers import cross_validate_with_exa, search_cyber_threats
-from crew import CyberThreatIntelCrew
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from utils.telemetry import telemetry
 
+# Heavy dependencies (telethon, sklearn, exa_py, crewai) are imported inside the stage that
+# needs them, so e.g. `python main.py scrape` never loads crewai. Modules per stage, for
+# `python main.py profile-imports`:
+STAGE_MODULES = {
+    "startup": ["main"],
+    "scrape": ["scrapers.telegram_scraper"],
+    "classify": ["ml.batch_scoring", "ml.streaming_trainer", "utils.cti_store"],
+    "validate": ["pandas", "ml.near_duplicates", "ml.ranking", "utils.exa_helpers", "exa_py"],
+    "report": ["utils.token_budget", "crew"],
+}
 
-def run_full_pipeline():
+TELEGRAM_TOPIC = "Telegram Cross-Validation: Weekly Top 10 CTI Messages (Validated via Exa.ai)"
+EXA_QUERY = "latest verified cybersecurity threats"
+# Report names; scheduled runs write <name>_<stamp>.md next to a diff against the previous run
+TELEGRAM_REPORT = "cybersecurity_report_crossvalidate"
+EXA_REPORT = "cybersecurity_report"
+
+
+def exa_topic(when):
+    return f"Latest cybersecurity threats {when:%B %Y}"
+
+
+def scrape_stage(date_min=None, date_max=None, incremental=None):
+    """Scrape TELEGRAM_CHANNELS into a new dataset (by default over TELEGRAM_DATE_MIN..MAX); returns its path."""
+    with telemetry.span("import", stage="scrape"):
+        from scrapers.telegram_scraper import FILE_FORMAT, scrape
+
+    # The dataset is only loaded back when an Excel copy is wanted
+    _, dataset_path = asyncio.get_event_loop().run_until_complete(
+        scrape(incremental=incremental, load=FILE_FORMAT != "parquet", date_min=date_min, date_max=date_max))
+    return dataset_path
+
+
+def ingest_stage(scored_path):
+    """Keep every scored message, with its indicators, queryable after the run (CTI_STORE_INGEST)."""
+    with telemetry.span("import", stage="ingest"):
+        from utils.cti_store import STORE_INGEST, CTIStore
+
+    if STORE_INGEST:
+        with CTIStore() as store:
+            store.ingest_file(scored_path)
+
+
+def online_update_stage(dataset_path):
     """
-    Runs both pipelines sequentially:
-    1. Telegram + Exa Cross-Validation
-    2. Exa.ai Threat Search
+    Let the streaming model learn from a scraped dataset (CTI_ONLINE_UPDATE). It only replaces
+    the served model when an explicit CTI_PROMOTE_MIN_F1 gate is set and its held-out F1 passes it.
     """
+    with telemetry.span("import", stage="classify"):
+        from ml import model_lifecycle
+        from ml.streaming_trainer import train_streaming
+
+    with telemetry.span("train.streaming"):
+        train_streaming(dataset_path, promote=model_lifecycle.PROMOTE_MIN_F1 > 0)
 
-    # ──────────────────────────────────────
-    # PIPELINE 1: Telegram + Exa Cross-Validation
-    # ──────────────────────────────────────
-    print("\n🚀 Starting Telegram + Exa Cross-Validation Pipeline...\n")
 
-    df, _ = asyncio.get_event_loop().run_until_complete(scrape())
-    preds = predict_messages(df["Content"].tolist())
-    df["Predicted_Label"] = preds
-    cti_messages = df[df["Predicted_Label"] == "CTI"]["Content"].tolist()
+def classify_stage(dataset_path, online_update=None):
+    """
+    Score a scraped dataset, after an online update of the model from it if `online_update`
+    (default CTI_ONLINE_UPDATE); returns the scored Parquet path, or None if nothing was scored.
+    """
+    with telemetry.span("import", stage="classify"):
+        from ml.cti_classifier import warm_up_model
+        from ml.batch_scoring import score_parquet
+        from ml.streaming_trainer import ONLINE_UPDATE
+
+    if ONLINE_UPDATE if online_update is None else online_update:
+        online_update_stage(dataset_path)
+
+    # Load the classifier once up front; it stays resident for every prediction below
+    warm_up_model()
+
+    # Score the scraped dataset in chunks across all cores
+    scored_path = f"{dataset_path}_scored.parquet"
+    if not score_parquet(dataset_path, scored_path):
+        return None
+    ingest_stage(scored_path)
+    return scored_path
+
+
+def scrape_classify_stage():
+    """
+    Scrape and score at once: each part the scraper writes is scored while the scrape goes on
+    (StreamingScorer), so memory stays flat however large the scrape. Writes
+    `<dataset>_scored.parquet` and the CTI rows alone to `<dataset>_cti.parquet`.
+    Returns (dataset path, CTI path), the CTI path being None if nothing was scored.
+    """
+    with telemetry.span("import", stage="scrape"):
+        from scrapers.telegram_scraper import FILE_FORMAT, new_dataset_path, scrape
+    with telemetry.span("import", stage="classify"):
+        from ml.cti_classifier import warm_up_model
+        from ml.batch_scoring import StreamingScorer
+
+    warm_up_model()
+    dataset_path = new_dataset_path()
+    scorer = StreamingScorer(f"{dataset_path}_scored.parquet", cti_path=f"{dataset_path}_cti.parquet")
+
+    scrape_coro = scrape(dataset_path=dataset_path, load=FILE_FORMAT != "parquet", on_part=scorer.submit)
+    try:
+        asyncio.get_event_loop().run_until_complete(scorer.score_during(scrape_coro))
+    except Exception:
+        # Parts flushed before the failure stay on disk and can be scored on their own
+        print(f"❌ Scrape / scoring stopped; messages scraped so far are in {dataset_path} "
+              f"(`python main.py classify {dataset_path}`)")
+        raise
+    if not scorer.rows:
+        return dataset_path, None
+    ingest_stage(scorer.output_path)
+    return dataset_path, scorer.cti_path
+
+
+def validate_stage(scored_path, top_n=10, date_min=None):
+    """
+    Deduplicate and rank the CTI rows of a scored dataset (or list of them, optionally only
+    rows dated from `date_min` on), then cross-check the top ones with Exa.
+    """
+    with telemetry.span("import", stage="validate"):
+        import pandas as pd
+        from ml.near_duplicates import deduplicate_messages
+        from ml.ranking import rank_messages
+        from utils.exa_helpers import cross_validate_with_exa_async
+
+    # Read back only the CTI rows
+    filters = [("Predicted_Label", "==", "CTI")]
+    if date_min is not None:
+        filters.append(("Date", ">=", pd.Timestamp(date_min).tz_convert("UTC").tz_localize(None)))
+    cti_df = pd.read_parquet(scored_path, filters=filters)
+    # Reposts of the same advisory collapse into one message before validation
+    with telemetry.span("dedup") as span:
+        span.add(len(cti_df))
+        cti_df = deduplicate_messages(cti_df, text_column="Content")
+    # Validate the most relevant threats, not the first ones scraped
+    with telemetry.span("rank") as span:
+        span.add(len(cti_df))
+        top_df = rank_messages(cti_df, k=top_n)
+    cti_messages = top_df["Content"].tolist()
+
+    print("\n================= CTI RELEVANCE RANKING =================\n")
+    for idx, row in enumerate(top_df.itertuples(index=False), 1):
+        print(f"{idx}. score={row.Score:.3f} (proba={row.Score_Probability:.3f}, engagement={row.Score_Engagement:.3f}, "
+              f"recency={row.Score_Recency:.3f}, cve={row.Score_CVE:.3f}) {row.Content[:100]}")
 
     if not cti_messages:
+        return []
+    with telemetry.span("exa.validate") as span:
+        validated = asyncio.get_event_loop().run_until_complete(cross_validate_with_exa_async(cti_messages, top_n=top_n))
+        span.add(len(validated))
+
+    # Print for transparency
+    print("\n================= TOP 10 SELECTED CTI MESSAGES =================\n")
+    for idx, item in enumerate(validated, 1):
+        print(f"{idx}. [{item['status']}] {item['message'][:200]}")
+        print(f"   → Exa Result: {'FOUND' if item['exa_results'] != 'No external validation found' else 'NOT FOUND'}\n")
+    print("===============================================================\n")
+    return validated
+
+
+def report_stage(validated, topic=TELEGRAM_TOPIC, report_path=None):
+    """
+    Run the crew over validated messages (one vulnerability analysis per threat, in parallel).
+    The report goes to `report_path`, by default the crew's fixed reports/ file.
+    """
+    with telemetry.span("import", stage="report"):
+        from utils.token_budget import EXA_CONTEXT_TOKEN_BUDGET, compact_validated, count_tokens
+        from crew import CyberThreatIntelCrew
+
+    # Compact the validated messages into the token budget: repeated Exa hits dropped,
+    # URLs shortened, long messages and summaries trimmed
+    threats = compact_validated(validated)
+    exa_context = "\n\n".join(threats)
+    print(f"🧮 Exa context for the crew: ~{count_tokens(exa_context)} tokens (budget {EXA_CONTEXT_TOKEN_BUDGET})")
+
+    # Combine into one multi-threat Crew run
+    inputs_cross = {
+        "topic": topic,
+        "exa_results": exa_context,
+        "threat_summary": "",
+        "cve_analysis": "",
+        "mitigation_strategies": ""
+    }
+
+    with telemetry.span("crew", pipeline="telegram") as span:
+        span.add(len(threats))
+        CyberThreatIntelCrew().kickoff_fanout(inputs=inputs_cross, threats=threats,
+                                              context={"topic": inputs_cross["topic"], "report_path": report_path})
+
+
+def run_telegram_pipeline():
+    """
+    PIPELINE 1: Telegram + Exa Cross-Validation
+    """
+    print("\n🚀 Starting Telegram + Exa Cross-Validation Pipeline...\n")
+
+    with telemetry.span("import", stage="classify"):
+        from ml.streaming_trainer import ONLINE_UPDATE
+
+    if ONLINE_UPDATE:
+        # The model learns from the whole scrape before scoring it, so the two cannot overlap
+        scored_path = classify_stage(scrape_stage())
+    else:
+        _, scored_path = scrape_classify_stage()
+    validated = validate_stage(scored_path) if scored_path else []
+
+    if not validated:
         print("⚠️ No CTI messages found from Telegram.")
     else:
-        validated = cross_validate_with_exa(cti_messages, top_n=10)
-
-        # Print for transparency
-        print("\n================= TOP 10 SELECTED CTI MESSAGES =================\n")
-        for idx, item in enumerate(validated, 1):
-            print(f"{idx}. [{item['status']}] {item['message'][:200]}")
-            print(f"   → Exa Result: {'FOUND' if item['exa_results'] != 'No external validation found' else 'NOT FOUND'}\n")
-        print("===============================================================\n")
-
-        # Combine into one multi-threat Crew run
-        inputs_cross = {
-            "topic": "Telegram Cross-Validation: Weekly Top 10 CTI Messages (Validated via Exa.ai)",
-            "exa_results": "\n\n".join([
-                f"{idx+1}. {item['status']} - {item['message']}\n{item['exa_results']}"
-                for idx, item in enumerate(validated)
-            ]),
-            "threat_summary": "",
-            "cve_analysis": "",
-            "mitigation_strategies": ""
-        }
-
-        crew_instance = CyberThreatIntelCrew()
-        CyberThreatIntelCrew().kickoff_with_context(inputs=inputs_cross, context={"topic": inputs_cross["topic"]})
-
-    # ──────────────────────────────────────
-    # PIPELINE 2: Exa.ai Threat Search
-    # ──────────────────────────────────────
-    print("\n🌐 Starting Exa.ai Threat Intelligence Pipeline...\n")
+        report_stage(validated)
+
+
+def exa_search_stage(since=None):
+    """Exa results for EXA_QUERY, only those published since `since` (ISO date) if given."""
+    with telemetry.span("import", stage="exa"):
+        from utils.exa_helpers import search_cyber_threat_hits
+
+    with telemetry.span("exa.search", pipeline="exa") as span:
+        hits = search_cyber_threat_hits(EXA_QUERY, start_published_date=since)
+        span.add(len(hits))
+    return hits
 
-    exa_results = search_cyber_threats("latest verified cybersecurity threats")
+
+def exa_report_stage(hits, topic, report_path=None):
+    """Run the crew over Exa results; the report goes to `report_path`, by default the crew's fixed file."""
+    with telemetry.span("import", stage="exa"):
+        from utils.exa_helpers import format_hits
+        from crew import CyberThreatIntelCrew
 
     inputs_exa = {
-        "topic": "Latest cybersecurity threats September 2025",
-        "exa_results": exa_results,
+        "topic": topic,
+        "exa_results": format_hits(hits),
         "threat_summary": "",
         "cve_analysis": "",
         "mitigation_strategies": ""
     }
 
-    crew_instance = CyberThreatIntelCrew()
-    CyberThreatIntelCrew().kickoff_with_context(inputs=inputs_exa, context={"topic": inputs_exa["topic"]})
+    # One vulnerability analysis per Exa result, run in parallel
+    threats = [format_hits([hit]) for hit in hits]
+    with telemetry.span("crew", pipeline="exa") as span:
+        span.add(len(threats))
+        CyberThreatIntelCrew().kickoff_fanout(inputs=inputs_exa, threats=threats,
+                                              context={"topic": inputs_exa["topic"], "report_path": report_path})
+
+
+def run_exa_pipeline():
+    """
+    PIPELINE 2: Exa.ai Threat Search
+    """
+    print("\n🌐 Starting Exa.ai Threat Intelligence Pipeline...\n")
+
+    exa_report_stage(exa_search_stage(), topic=exa_topic(datetime.now(timezone.utc)))
+
+
+def run_full_pipeline():
+    """
+    Runs both pipelines concurrently:
+    1. Telegram + Exa Cross-Validation (on this thread, it owns the event loop)
+    2. Exa.ai Threat Search (on a worker thread)
+    """
+    with telemetry.span("pipeline"), ThreadPoolExecutor(max_workers=1) as pool:
+        exa_pipeline = pool.submit(run_exa_pipeline)
+        run_telegram_pipeline()
+        exa_pipeline.result()
+
+    from crew import llm
+
+    stats = llm.cache_stats()
+    if stats:
+        print(f"🗄️ LLM cache: {stats['hits']} hits / {stats['misses']} misses ({stats['hit_rate']:.0%}), "
+              f"{stats['entries']} entries, {stats['bytes'] / 1024:.0f} KiB")
+
+
+def scheduled_telegram_run(window, cache, stamp, top_n=10):
+    """
+    Telegram pipeline over a rolling `window`, reusing earlier runs through `cache` (StageCache):
+    only the part of the window no earlier scrape covered is fetched, each scraped chunk is
+    scored once per model, and the crew only runs when the validated top messages changed.
+    """
+    from scrapers.telegram_scraper import CHANNELS, KEY_SEARCH
+    from ml.cti_classifier import model_fingerprint
+    from ml.streaming_trainer import ONLINE_UPDATE
+    from utils.scheduling import artifact_path, dataset_fingerprint, fingerprint, write_diff
+
+    start, end = window
+    source = fingerprint(CHANNELS, KEY_SEARCH)
+
+    # Scraped chunks still (partly) inside the window; ISO timestamps in UTC compare as text
+    chunks = [chunk for chunk in cache.get("scrape", source) or []
+              if chunk["end"] > start.isoformat() and os.path.exists(chunk["path"])]
+    if chunks and min(chunk["start"] for chunk in chunks) > start.isoformat():
+        chunks = []  # the window grew backwards: scrape it whole
+    covered = max((chunk["end"] for chunk in chunks), default=start.isoformat())
+    if covered < end.isoformat():
+        chunk_start = max(datetime.fromisoformat(covered), start)
+        dataset_path = scrape_stage(date_min=chunk_start, date_max=end, incremental=False)
+        chunks.append({"start": chunk_start.isoformat(), "end": end.isoformat(), "path": dataset_path,
+                       "fingerprint": dataset_fingerprint(dataset_path)})
+        cache.put("scrape", source, chunks)
+        # Online training stays outside the cached classify stage: the model learns from the new
+        # chunk only, and the classify keys below name the model that actually scores
+        if ONLINE_UPDATE:
+            online_update_stage(dataset_path)
+    else:
+        print(f"♻️ scrape: window already covered by {len(chunks)} earlier scrapes")
+
+    model = model_fingerprint()
+    classify_keys = [fingerprint(chunk["fingerprint"], model) for chunk in chunks]
+    scored = [cache.run("classify", key,
+                        lambda chunk=chunk: {"path": classify_stage(chunk["path"], online_update=False)})["path"]
+              for key, chunk in zip(classify_keys, chunks)]
+    scored = [path for path in scored if path]
+    if not scored:
+        print("⚠️ No CTI messages found from Telegram.")
+        return
+
+    validated = cache.run("validate", fingerprint(classify_keys, start, top_n),
+                          lambda: {"validated": validate_stage(scored, top_n=top_n, date_min=start)})["validated"]
+    if not validated:
+        print("⚠️ No CTI messages found from Telegram.")
+        return
+
+    def report():
+        report_path = artifact_path(TELEGRAM_REPORT, stamp, ".md")
+        report_stage(validated, report_path=report_path)
+        write_diff(TELEGRAM_REPORT, stamp, [f"[{item['status']}] {' '.join(item['message'].split())[:200]}"
+                                            for item in validated])
+        return {"path": report_path}
+
+    cache.run("report", fingerprint(validated, TELEGRAM_TOPIC), report)
+
+
+def scheduled_exa_run(window, cache, stamp):
+    """Exa pipeline over results published within `window`; the crew only runs when the results changed."""
+    from utils.scheduling import artifact_path, fingerprint, write_diff
+
+    start, end = window
+    hits = exa_search_stage(since=start.date().isoformat())
+    topic = exa_topic(end)
+
+    def report():
+        report_path = artifact_path(EXA_REPORT, stamp, ".md")
+        exa_report_stage(hits, topic, report_path=report_path)
+        write_diff(EXA_REPORT, stamp, [f"{hit['title']} ({hit['url']})" for hit in hits])
+        return {"path": report_path}
+
+    cache.run("exa.report", fingerprint(hits, topic), report)
+
+
+def run_scheduled(every=None, window_hours=None, once=False, top_n=10):
+    """
+    Scheduler mode: at every hour / day boundary, run both pipelines over the last
+    `window_hours`, reusing the stage outputs whose inputs did not change (STAGE_CACHE_PATH).
+    Reports are written as timestamped artifacts with a diff against the previous run
+    (REPORTS_DIR); telemetry is exported per run. A failed run is reported and the next one
+    still happens, unless `once`.
+    """
+    from utils.scheduling import SCHEDULE_EVERY, SCHEDULE_WINDOW_HOURS, StageCache, next_run, rolling_window
+
+    every = every or SCHEDULE_EVERY
+    window_hours = window_hours or SCHEDULE_WINDOW_HOURS
+    with StageCache() as cache:
+        while True:
+            window = rolling_window(every, window_hours)
+            stamp = window[1].strftime("%Y%m%d_%H%M")
+            print(f"\n🗓️ Scheduled run {stamp}: {window[0]:%Y-%m-%d %H:%M} → {window[1]:%Y-%m-%d %H:%M} UTC\n")
+            start_time = time.perf_counter()
+            try:
+                with telemetry.span("scheduled_run", every=every), ThreadPoolExecutor(max_workers=1) as pool:
+                    exa_run = pool.submit(scheduled_exa_run, window, cache, stamp)
+                    scheduled_telegram_run(window, cache, stamp, top_n)
+                    exa_run.result()
+            except Exception:
+                if once:
+                    raise
+                traceback.print_exc()
+            print(f"⏱️ scheduled run {stamp} finished in {time.perf_counter() - start_time:.1f}s")
+            telemetry.export(name=f"metrics_{stamp}")
+            telemetry.reset_spans()
+            if once:
+                return
+
+            following = next_run(window[1], every)
+            print(f"💤 Next run at {following:%Y-%m-%d %H:%M} UTC")
+            time.sleep(max((following - datetime.now(timezone.utc)).total_seconds(), 0))
+
+
+def profile_imports(top=8):
+    """Import cost of each stage in a fresh interpreter, heaviest packages first."""
+    from utils.import_profile import report
+
+    report(STAGE_MODULES, top=top)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Telegram / Exa.ai cyber threat intelligence pipeline.")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.add_parser("full", help="both pipelines end to end (the default)")
+    commands.add_parser("scrape", help="scrape TELEGRAM_CHANNELS into a new dataset")
+    classify = commands.add_parser("classify", help="score a scraped dataset and load it into the CTI store")
+    classify.add_argument("dataset", help="dataset directory or Parquet file written by `scrape`")
+    validate = commands.add_parser("validate", help="rank the CTI rows of a scored dataset and cross-check them with Exa")
+    validate.add_argument("scored", help="`<dataset>_scored.parquet` written by `classify`")
+    validate.add_argument("--top", type=int, default=10, help="messages to validate")
+    validate.add_argument("--output", help="JSON file for `report` (default: <scored>_validated.json)")
+    report = commands.add_parser("report", help="run the crew over a validated JSON file")
+    report.add_argument("validated", help="JSON file written by `validate`")
+    commands.add_parser("exa", help="Exa.ai threat search pipeline only")
+    schedule = commands.add_parser("schedule", help="run both pipelines every hour / day over a rolling window")
+    schedule.add_argument("--every", choices=["hourly", "daily"], help="run interval (default: SCHEDULE_EVERY)")
+    schedule.add_argument("--window-hours", type=float, help="rolling window length (default: SCHEDULE_WINDOW_HOURS)")
+    schedule.add_argument("--top", type=int, default=10, help="messages to validate per run")
+    schedule.add_argument("--once", action="store_true", help="run the current window once and exit")
+    profile = commands.add_parser("profile-imports", help="import cost per stage")
+    profile.add_argument("--top", type=int, default=8, help="packages listed per stage")
+    args = parser.parse_args(argv)
+
+    command = args.command or "full"
+    if command == "profile-imports":
+        profile_imports(args.top)
+        return
+    if command == "schedule":
+        run_scheduled(args.every, args.window_hours, once=args.once, top_n=args.top)
+        return
+
+    start_time = time.perf_counter()
+    if command == "full":
+        run_full_pipeline()
+    elif command == "scrape":
+        print(f"Dataset saved at: {scrape_stage()}")
+    elif command == "classify":
+        scored_path = classify_stage(args.dataset)
+        print(f"Scored dataset saved at: {scored_path}" if scored_path else "⚠️ Nothing to score.")
+    elif command == "validate":
+        validated = validate_stage(args.scored, top_n=args.top)
+        output = args.output or f"{args.scored.removesuffix('.parquet')}_validated.json"
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(validated, f, ensure_ascii=False, indent=2, default=str)
+        print(f"Validated messages saved at: {output}")
+    elif command == "report":
+        with open(args.validated, encoding="utf-8") as f:
+            validated = json.load(f)
+        if validated:
+            report_stage(validated)
+        else:
+            print("⚠️ No validated messages to report on.")
+    elif command == "exa":
+        run_exa_pipeline()
+    print(f"⏱️ {command} finished in {time.perf_counter() - start_time:.1f}s")
+
+    # Per-stage wall time, throughput, peak RSS and external call counts (TELEMETRY_DIR)
+    telemetry.export()
 
 
 if __name__ == "__main__":
-    run_full_pipeline()
+    main()
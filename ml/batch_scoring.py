@@ -0,0 +1,235 @@
+import asyncio
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from ml.cti_classifier import get_model, predict_with_proba
+from utils.telemetry import telemetry
+from utils.text_normalization import NORMALIZED_COLUMN, normalize_texts
+
+CHUNK_SIZE = int(os.getenv("CTI_SCORING_CHUNK_SIZE", "50000"))
+WORKERS = int(os.getenv("CTI_SCORING_WORKERS", str(os.cpu_count() or 1)))
+
+
+def _score_chunk(texts):
+    """Worker entry point: score one chunk of normalized texts with the process-resident model."""
+    model, vectorizer = get_model()
+    labels, cti_proba = predict_with_proba(model, vectorizer, texts, normalized=True)
+    return labels.tolist(), cti_proba.tolist()
+
+
+def _chunk_texts(batch, text_column):
+    """
+    Normalized texts of a chunk: the dataset's NORMALIZED_COLUMN when it has one (written by
+    the scraper), otherwise normalized here and appended, so the scored output carries it.
+    Returns (batch, texts).
+    """
+    if text_column == "Content" and NORMALIZED_COLUMN in batch.schema.names:
+        return batch, [text or "" for text in batch.column(NORMALIZED_COLUMN).to_pylist()]
+    texts = normalize_texts(batch.column(text_column).to_pylist())
+    if text_column == "Content":
+        batch = _append_column(batch, NORMALIZED_COLUMN, pa.array(texts, pa.string()))
+    return batch, texts
+
+
+def _append_column(batch, name, values):
+    if isinstance(batch, pa.RecordBatch):
+        return pa.RecordBatch.from_arrays(batch.columns + [values], names=batch.schema.names + [name])
+    return batch.append_column(name, values)
+
+
+def _scored_table(table, labels, cti_proba):
+    table = table.append_column("Predicted_Label", pa.array(labels, pa.string()))
+    return table.append_column("CTI_Probability", pa.array(cti_proba, pa.float64()))
+
+
+def score_parquet(input_path, output_path, text_column="Content", chunk_size=CHUNK_SIZE, workers=WORKERS):
+    """
+    Classify a Parquet file or dataset directory chunk by chunk.
+
+    Chunks are vectorized and predicted across a pool of `workers` processes (each with
+    its own resident model, memory-mapped when CTI_MODEL_MMAP is set; the keyword
+    fallback when no model was promoted) and written to
+    `output_path` in input order as they finish, with `Predicted_Label` and
+    `CTI_Probability` appended (and NORMALIZED_COLUMN, if the input has none). Only a few chunks are in flight at once, so memory stays
+    bounded by `chunk_size`, not by the dataset size.
+    Returns the number of rows scored.
+    """
+    batches = ds.dataset(input_path, format="parquet").to_batches(batch_size=chunk_size)
+    writer = None
+    rows = 0
+    start_time = time.time()
+
+    def write(batch, labels, cti_proba):
+        nonlocal writer, rows
+        table = _scored_table(pa.Table.from_batches([batch]), labels, cti_proba)
+        if writer is None:
+            writer = pq.ParquetWriter(output_path, table.schema)
+        writer.write_table(table)
+
+        rows += table.num_rows
+        elapsed = max(time.time() - start_time, 1e-9)
+        print(f"Scored {rows:,} rows | {rows / elapsed:,.0f} rows/sec")
+
+    get_model()  # fail fast (CTI_MISSING_MODEL=fail) before any worker starts; never trains
+
+    with telemetry.span("classify", workers=workers) as span:
+        try:
+            if workers <= 1:
+                for batch in batches:
+                    batch, texts = _chunk_texts(batch, text_column)
+                    if texts:
+                        write(batch, *_score_chunk(texts))
+            else:
+                pending = deque()
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    for batch in batches:
+                        batch, texts = _chunk_texts(batch, text_column)
+                        if not texts:
+                            continue
+                        pending.append((batch, pool.submit(_score_chunk, texts)))
+                        # Keep at most two chunks per worker in flight, write the oldest in order
+                        while len(pending) >= workers * 2:
+                            done_batch, future = pending.popleft()
+                            write(done_batch, *future.result())
+                    while pending:
+                        done_batch, future = pending.popleft()
+                        write(done_batch, *future.result())
+        finally:
+            if writer is not None:
+                writer.close()
+        span.add(rows)
+
+    elapsed = max(time.time() - start_time, 1e-9)
+    print(f"✅ Scored {rows:,} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/sec) → {output_path}")
+    return rows
+
+
+class StreamingScorer:
+    """
+    Scores a dataset while it is being scraped: scraped part → queue → scoring → scored and CTI files.
+
+    Pass `submit` as the scraper's `on_part` callback and the scrape coroutine to `score_during`
+    (or run `run()` alongside it and `finish()` once it is done). Parts are read back one at a time and scored
+    across `workers` processes (a thread with `workers` <= 1) with at most two chunks per
+    worker in flight, so memory stays bounded by the part size however long the scrape
+    runs. The queue holds part paths, never rows: a scorer that falls behind does not slow
+    the scraper down (or hold its rows in memory), the backlog just waits on disk.
+    Scored rows go to `output_path` in scrape order, the CTI ones also to `cti_path`.
+    """
+
+    def __init__(self, output_path, cti_path=None, text_column="Content", workers=WORKERS):
+        self.output_path = output_path
+        self.cti_path = cti_path
+        self.text_column = text_column
+        self.workers = workers
+        self.queue = asyncio.Queue()
+        self.rows = 0
+        self.cti_rows = 0
+        self.max_backlog = 0
+        self._writer = None
+        self._cti_writer = None
+
+    def submit(self, part_path):
+        """Hand over one written part (the scraper's `on_part` callback); never blocks."""
+        self.queue.put_nowait(part_path)
+        self.max_backlog = max(self.max_backlog, self.queue.qsize())
+
+    def finish(self):
+        """No more parts: `run` returns once everything submitted is scored."""
+        self.queue.put_nowait(None)
+
+    def _write(self, table, labels, cti_proba):
+        table = _scored_table(table, labels, cti_proba)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.output_path, table.schema)
+            if self.cti_path:
+                self._cti_writer = pq.ParquetWriter(self.cti_path, table.schema)
+        self._writer.write_table(table)
+        if self._cti_writer is not None:
+            cti = table.filter(pc.equal(table.column("Predicted_Label"), "CTI"))
+            self._cti_writer.write_table(cti)
+            self.cti_rows += cti.num_rows
+        self.rows += table.num_rows
+
+    async def score_during(self, producer):
+        """
+        Run the `producer` coroutine (e.g. a scrape whose `on_part` is `submit`) and score
+        its parts alongside it; returns the number of rows scored. Whichever of the two fails
+        first cancels the other and its own error is raised, so a broken scorer stops the
+        scrape instead of surfacing only after it finished.
+        """
+        scoring = asyncio.ensure_future(self.run())
+        producing = asyncio.ensure_future(producer)
+        try:
+            # The scorer only finishes before the producer by failing, so the first task done
+            # is either the producer (finished or failed) or a failed scorer
+            await asyncio.wait({producing, scoring}, return_when=asyncio.FIRST_COMPLETED)
+        except BaseException:  # cancelled from outside: stop both
+            for task in (producing, scoring):
+                task.cancel()
+            await asyncio.gather(producing, scoring, return_exceptions=True)
+            raise
+        for failed, other in ((scoring, producing), (producing, scoring)):
+            if failed.done() and failed.exception() is not None:
+                other.cancel()
+                await asyncio.gather(other, return_exceptions=True)
+                raise failed.exception()
+        self.finish()
+        return await scoring
+
+    async def run(self):
+        """Score parts as they arrive until `finish()`; returns the number of rows scored."""
+        get_model()  # fail fast (CTI_MISSING_MODEL=fail) before any worker starts; never trains
+        loop = asyncio.get_running_loop()
+        pool = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        max_in_flight = max(self.workers, 1) * 2
+        pending = deque()
+        start_time = time.time()
+
+        async def write_oldest():
+            table, future = pending.popleft()
+            await asyncio.to_thread(self._write, table, *await future)
+            elapsed = max(time.time() - start_time, 1e-9)
+            print(f"Scored {self.rows:,} rows | {self.rows / elapsed:,.0f} rows/sec | "
+                  f"{self.queue.qsize()} parts waiting")
+
+        with telemetry.span("classify", workers=self.workers, streaming=True) as span:
+            try:
+                while (part_path := await self.queue.get()) is not None:
+                    table = await asyncio.to_thread(pq.read_table, part_path)
+                    table, texts = _chunk_texts(table, self.text_column)
+                    if not texts:
+                        continue
+                    # pool None: the event loop's default thread pool
+                    pending.append((table, loop.run_in_executor(pool, _score_chunk, texts)))
+                    while len(pending) >= max_in_flight:
+                        await write_oldest()
+                while pending:
+                    await write_oldest()
+            finally:
+                if pool is not None:
+                    pool.shutdown(cancel_futures=True)
+                for writer in (self._writer, self._cti_writer):
+                    if writer is not None:
+                        writer.close()
+            span.add(self.rows)
+
+        elapsed = max(time.time() - start_time, 1e-9)
+        print(f"✅ Scored {self.rows:,} rows while scraping ({self.cti_rows:,} CTI, peak backlog {self.max_backlog} "
+              f"parts) in {elapsed:.1f}s → {self.output_path}")
+        return self.rows
+
+
+# Entry point if run directly: python -m ml.batch_scoring <input.parquet|dataset_dir> <output.parquet>
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 3:
+        print("Usage: python -m ml.batch_scoring <input.parquet|dataset_dir> <output.parquet>")
+        sys.exit(1)
+    score_parquet(sys.argv[1], sys.argv[2])
@@ -1,11 +1,11 @@
 import os
+import numpy as np
 import pandas as pd
-import joblib
 import platform
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report
+from ml import model_lifecycle
+from ml.model_registry import ModelRegistry
+from ml.keyword_matcher import KeywordMatcher, load_keywords
+from utils.text_normalization import NORMALIZED_COLUMN, normalize_texts, normalized_column
 
 # Heuristic keyword list (for quick labelling before training)
 CTI_KEYWORDS = [
@@ -14,79 +14,196 @@ CTI_KEYWORDS = [
     "trojan", "spyware", "patch", "vulnerabilities"
 ]
 
+# Extra keywords, one per line, appended to CTI_KEYWORDS
+KEYWORDS_FILE = os.getenv("CTI_KEYWORDS_FILE", "ml/cti_keywords.txt")
+
+# Unversioned model from before ml/model_lifecycle.py; served only until a version is promoted
 MODEL_PATH = "ml/cti_classifier_model.pkl"
 VECTORIZER_PATH = "ml/tfidf_vectorizer.pkl"
+# "true" memory-maps the model arrays so several worker processes share one copy
+MODEL_MMAP = os.getenv("CTI_MODEL_MMAP", "false").lower() in ("1", "true", "yes")
+# What inference does without a model: "keyword" scores with the keyword heuristic, "fail" raises.
+# Inference never trains; see `python -m ml.model_lifecycle train`.
+MISSING_MODEL = os.getenv("CTI_MISSING_MODEL", "keyword").lower()
+
+
+def resolve_model_paths():
+    """Paths of the promoted model version, or of the legacy unversioned model if none was promoted."""
+    try:
+        return model_lifecycle.model_paths()
+    except FileNotFoundError:
+        if os.path.exists(MODEL_PATH) and os.path.exists(VECTORIZER_PATH):
+            return MODEL_PATH, VECTORIZER_PATH
+        raise
+
+
+def model_fingerprint():
+    """
+    Identifies what inference would score with right now: the promoted model files (path,
+    size, mtime), or the keyword list when the keyword fallback is in use.
+    """
+    try:
+        paths = resolve_model_paths()
+    except FileNotFoundError:
+        return ["keyword", sorted(get_keyword_matcher().keywords)]
+    return [[path, os.path.getsize(path), os.path.getmtime(path)] for path in paths]
+
+
+# Process-wide registry: the model is unpickled once and reloaded when the files change or another version is promoted
+registry = ModelRegistry(mmap_mode="r" if MODEL_MMAP else None, resolve=resolve_model_paths)
+
+
+_keyword_matcher = None
+
+
+def get_keyword_matcher():
+    """Compiled matcher for CTI_KEYWORDS plus KEYWORDS_FILE, built on first use."""
+    global _keyword_matcher
+    if _keyword_matcher is None:
+        _keyword_matcher = KeywordMatcher(CTI_KEYWORDS + load_keywords(KEYWORDS_FILE))
+    return _keyword_matcher
 
 
 def label_message(text):
     """Keyword-based heuristic labelling for bootstrap training data."""
-    if not isinstance(text, str):
-        return "Non-CTI"
-    text_lower = text.lower()
-    return "CTI" if any(k.lower() in text_lower for k in CTI_KEYWORDS) else "Non-CTI"
+    return "CTI" if get_keyword_matcher().is_match(text) else "Non-CTI"
 
 
 def prepare_training_data(df, text_column="Content"):
-    """Apply keyword heuristic to generate labels."""
-    df["Label"] = df[text_column].apply(label_message)
+    """
+    Apply keyword heuristic to generate labels, in one regex pass over the normalized column
+    (added as NORMALIZED_COLUMN and reused by `train_and_save_model`).
+    Adds `Label` and `Matched_Keywords`; per-keyword hit counts go to df.attrs["keyword_hits"].
+    """
+    matcher = get_keyword_matcher()
+    is_cti, found = matcher.match_series(normalized_column(df, text_column), normalized=True)
+    df["Label"] = np.where(is_cti, "CTI", "Non-CTI")
+    df["Matched_Keywords"] = found.map(lambda hits: ", ".join(dict.fromkeys(hits)))
+
+    hits = matcher.hit_counts(found)
+    df.attrs["keyword_hits"] = hits
+    print("🔎 Keyword hits: " + ", ".join(f"{k}={n}" for k, n in sorted(hits.items(), key=lambda kv: -kv[1]) if n))
     return df
 
 
-def train_and_save_model(df, text_column="Content", label_column="Label"):
-    """Train TF-IDF + Logistic Regression classifier and save it."""
-    X = df[text_column].astype(str)
-    y = df[label_column]
-
-    vectorizer = TfidfVectorizer(max_features=1000)
-    X_vec = vectorizer.fit_transform(X)
+def train_and_save_model(df, text_column="Content", label_column="Label", promote=True):
+    """
+    Train TF-IDF + Logistic Regression classifier and save it as a new model version,
+    with metrics on a 20% held-out split. The version is promoted (served) if `promote`.
+    """
+    # sklearn is only imported when training; scoring with the keyword fallback never needs it
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import train_test_split
 
-    X_train, X_test, y_train, y_test = train_test_split(X_vec, y, test_size=0.2, random_state=42)
+    X_train, X_test, y_train, y_test = train_test_split(
+        normalized_column(df, text_column), df[label_column], test_size=0.2, random_state=42
+    )
 
+    # Texts arrive normalized (see predict_with_proba), so the vectorizer need not lowercase them again
+    vectorizer = TfidfVectorizer(max_features=1000, lowercase=False)
     model = LogisticRegression(max_iter=1000)
-    model.fit(X_train, y_train)
+    model.fit(vectorizer.fit_transform(X_train), y_train)
+
+    metrics = model_lifecycle.evaluate(model, vectorizer, X_test, y_test)
+    metrics.update(kind="tfidf-logreg", n_train=len(y_train), label_source="keywords" if "keyword_hits" in df.attrs else label_column)
+    version = model_lifecycle.save_version(model, vectorizer, metrics)
+    if promote:
+        model_lifecycle.promote(version)
+        registry.invalidate()
+    return model, vectorizer
 
-    y_pred = model.predict(X_test)
-    print("📊 Classification Report:")
-    print(classification_report(y_test, y_pred))
 
-    # Save model + vectorizer
-    os.makedirs("ml", exist_ok=True)
-    joblib.dump(model, MODEL_PATH)
-    joblib.dump(vectorizer, VECTORIZER_PATH)
+def load_model_and_vectorizer():
+    """Return the resident model + vectorizer, loading them from disk on first use or after a change."""
+    return registry.get()
 
-    return model, vectorizer
 
+class KeywordFallbackModel:
+    """
+    Keyword-only stand-in for the (model, vectorizer) pair when no model has been trained:
+    `transform` passes (normalized) texts through and `predict_proba` is 1.0 for CTI on a keyword match.
+    """
 
-def load_model_and_vectorizer():
-    """Load model + vectorizer from disk."""
-    if not os.path.exists(MODEL_PATH) or not os.path.exists(VECTORIZER_PATH):
-        raise FileNotFoundError("CTI classifier model/vectorizer not found. Train first.")
+    classes_ = np.array(["CTI", "Non-CTI"])
 
-    model = joblib.load(MODEL_PATH)
-    vectorizer = joblib.load(VECTORIZER_PATH)
-    return model, vectorizer
+    def transform(self, messages):
+        return pd.Series(list(messages), dtype=object)
 
+    def predict_proba(self, texts):
+        is_cti, _ = get_keyword_matcher().match_series(texts, normalized=True)
+        is_cti = np.asarray(is_cti, dtype=float)
+        return np.column_stack([is_cti, 1.0 - is_cti])
 
-def predict_messages(messages):
-    """Predict CTI vs Non-CTI for a list of messages."""
+    def predict(self, texts):
+        return self.classes_[self.predict_proba(texts).argmax(axis=1)]
+
+
+_fallback_warned = False
+
+
+def get_model():
+    """
+    The resident (model, vectorizer) for inference. Without a trained model this never
+    trains: it returns the keyword fallback, or raises FileNotFoundError when
+    CTI_MISSING_MODEL=fail.
+    """
+    global _fallback_warned
     try:
-        model, vectorizer = load_model_and_vectorizer()
+        return load_model_and_vectorizer()
     except FileNotFoundError:
-        print("⚠️ No trained model found. Training a new one...")
-        df = pd.DataFrame({"Content": messages})
-        df = prepare_training_data(df, text_column="Content")
-        model, vectorizer = train_and_save_model(df, text_column="Content", label_column="Label")
+        if MISSING_MODEL == "fail":
+            raise
+        if not _fallback_warned:
+            print("⚠️ No trained model found. Scoring with the keyword heuristic; "
+                  "train one with `python -m ml.model_lifecycle train <dataset> --promote`.")
+            _fallback_warned = True
+        fallback = KeywordFallbackModel()
+        return fallback, fallback
+
+
+def warm_up_model():
+    """Load the classifier at startup so the first prediction does not pay the unpickle cost."""
+    try:
+        registry.warm_up()
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def predict_with_proba(model, vectorizer, messages, normalized=False):
+    """
+    Labels and CTI-class probability for each message, from a single predict_proba pass.
+    Messages are normalized first unless `normalized` says they already are.
+    """
+    X_vec = vectorizer.transform(messages if normalized else normalize_texts(messages))
+    proba = model.predict_proba(X_vec)
+    labels = model.classes_[proba.argmax(axis=1)]
+    classes = list(model.classes_)
+    cti_proba = proba[:, classes.index("CTI")] if "CTI" in classes else np.zeros(len(labels))
+    return labels, cti_proba
 
-    X_vec = vectorizer.transform(messages)
+
+def predict_messages(messages):
+    """Predict CTI vs Non-CTI for a list of messages."""
+    model, vectorizer = get_model()
+
+    X_vec = vectorizer.transform(normalize_texts(messages))
     preds = model.predict(X_vec)
     return preds
 
 
+def predict_messages_with_proba(messages):
+    """Predict CTI vs Non-CTI plus the CTI probability for a list of messages."""
+    model, vectorizer = get_model()
+    return predict_with_proba(model, vectorizer, messages)
+
+
 def save_labeled_dataframe(df, filename="labeled_output.xlsx"):
     """
     Save the labeled DataFrame to Excel and auto-open depending on OS.
     """
-    df.to_excel(filename, index=False)
+    df.drop(columns=[NORMALIZED_COLUMN], errors="ignore").to_excel(filename, index=False)
     print(f"✅ Labeled data saved to {filename}")
 
     # Try to open file automatically
@@ -0,0 +1,72 @@
+import os
+import re
+from collections import Counter
+
+
+def load_keywords(path):
+    """Read extra keywords from a text file: one per line, `#` starts a comment."""
+    if not path or not os.path.exists(path):
+        return []
+    keywords = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            keyword = line.split("#", 1)[0].strip()
+            if keyword:
+                keywords.append(keyword)
+    return keywords
+
+
+class KeywordMatcher:
+    """
+    All keywords compiled into one case-insensitive regex with word boundaries.
+
+    A keyword must not be glued to letters or digits in front, nor to letters behind it
+    other than a plural or verb ending (s, es, ed, ing): "APT" matches "APT" and "APT29"
+    but not "adapt"; "attack" matches "attacks"; "CVE" matches "CVE-2025-1234".
+    Methods take `normalized=True` for already lowercased text (utils/text_normalization.py),
+    which is matched by a case-sensitive copy of the pattern, faster than the case-insensitive one.
+    """
+
+    def __init__(self, keywords):
+        # Lowercase form -> keyword as first given, used to report hits
+        self.canonical = {}
+        for keyword in keywords:
+            self.canonical.setdefault(keyword.lower(), keyword)
+        self.keywords = list(self.canonical.values())
+
+        # Longest first so overlapping keywords ("vulnerabilities" / "vulnerability") prefer the full word
+        alternation = "|".join(re.escape(k) for k in sorted(self.canonical, key=len, reverse=True))
+        # The one group is the keyword itself, so findall reports it without the ending
+        body = rf"(?<!\w)({alternation})(?:s|es|ed|ing)?(?![^\W\d])"
+        self.pattern = re.compile(body, re.IGNORECASE)
+        self.normalized_pattern = re.compile(body)
+
+    def _pattern(self, normalized):
+        return self.normalized_pattern if normalized else self.pattern
+
+    def is_match(self, text, normalized=False):
+        return isinstance(text, str) and self._pattern(normalized).search(text) is not None
+
+    def find(self, text, normalized=False):
+        """Keywords found in `text`, in order of appearance (repeats included)."""
+        if not isinstance(text, str):
+            return []
+        return [self.canonical[m.lower()] for m in self._pattern(normalized).findall(text)]
+
+    def match_series(self, series, normalized=False):
+        """
+        One regex pass over a whole text column.
+        Returns (is_match boolean Series, Series of matched-keyword lists).
+        """
+        try:
+            found = series.str.findall(self._pattern(normalized))
+        except AttributeError:  # not a text column
+            return (series.map(lambda text: self.is_match(text, normalized)),
+                    series.map(lambda text: self.find(text, normalized)))
+        found = found.map(lambda hits: [self.canonical[h.lower()] for h in hits] if isinstance(hits, list) else [])
+        return found.str.len() > 0, found
+
+    def hit_counts(self, found):
+        """Per-keyword hit counts (every occurrence) from the lists returned by `match_series`."""
+        counts = Counter(hit for hits in found for hit in hits)
+        return {keyword: counts.get(keyword, 0) for keyword in self.keywords}
@@ -0,0 +1,160 @@
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+import joblib
+
+# Versioned models live in MODELS_DIR/<version>/ (model.pkl, vectorizer.pkl, metrics.json);
+# MODELS_DIR/CURRENT names the promoted version that inference serves
+MODELS_DIR = os.getenv("CTI_MODELS_DIR", "ml/models")
+CURRENT_FILE = "CURRENT"
+MODEL_FILE = "model.pkl"
+VECTORIZER_FILE = "vectorizer.pkl"
+METRICS_FILE = "metrics.json"
+# Promotion is refused below this held-out F1 for the CTI class, and always without one.
+# The pipeline's online updates (CTI_ONLINE_UPDATE) only promote when it is set above 0
+PROMOTE_MIN_F1 = float(os.getenv("CTI_PROMOTE_MIN_F1", "0"))
+
+
+def version_dir(version):
+    return os.path.join(MODELS_DIR, version)
+
+
+def new_version():
+    return "v" + datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S-%f")
+
+
+def list_versions():
+    """All saved versions, oldest first."""
+    if not os.path.isdir(MODELS_DIR):
+        return []
+    return sorted(name for name in os.listdir(MODELS_DIR)
+                  if name.startswith("v") and os.path.isdir(version_dir(name)))
+
+
+def current_version():
+    """The promoted version, or None before anything was promoted."""
+    path = os.path.join(MODELS_DIR, CURRENT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return f.read().strip() or None
+
+
+def model_paths(version=None):
+    """(model path, vectorizer path) of `version`, by default the promoted one."""
+    version = version or current_version()
+    if version is None:
+        raise FileNotFoundError("No promoted CTI classifier. Train one with `python -m ml.model_lifecycle train`.")
+    return os.path.join(version_dir(version), MODEL_FILE), os.path.join(version_dir(version), VECTORIZER_FILE)
+
+
+def load_metrics(version):
+    path = os.path.join(version_dir(version), METRICS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def evaluate(model, vectorizer, texts, labels):
+    """Held-out metrics of a model: accuracy plus CTI precision / recall / F1 and the full report."""
+    from sklearn.metrics import classification_report
+
+    predicted = model.predict(vectorizer.transform(texts))
+    report = classification_report(labels, predicted, output_dict=True, zero_division=0)
+    print("📊 Classification Report:")
+    print(classification_report(labels, predicted, zero_division=0))
+    cti = report.get("CTI", {})
+    return {
+        "accuracy": report.get("accuracy"),
+        "cti_precision": cti.get("precision"),
+        "cti_recall": cti.get("recall"),
+        "cti_f1": cti.get("f1-score"),
+        "n_test": len(labels),
+        "report": report,
+    }
+
+
+def save_version(model, vectorizer, metrics):
+    """
+    Write a new version directory and return its name. The directory is assembled under a
+    temporary name and renamed into place, so a version is either complete or absent.
+    """
+    version = new_version()
+    tmp_dir = os.path.join(MODELS_DIR, f".tmp-{version}")
+    os.makedirs(tmp_dir)
+    try:
+        joblib.dump(model, os.path.join(tmp_dir, MODEL_FILE))
+        joblib.dump(vectorizer, os.path.join(tmp_dir, VECTORIZER_FILE))
+        metrics = dict(metrics, version=version, created_at=datetime.now(timezone.utc).isoformat(timespec="seconds"))
+        with open(os.path.join(tmp_dir, METRICS_FILE), "w", encoding="utf-8") as f:
+            json.dump(metrics, f, indent=2, default=str)
+        os.replace(tmp_dir, version_dir(version))
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    print(f"💾 Saved model version {version} → {version_dir(version)}")
+    return version
+
+
+def promote(version, min_f1=PROMOTE_MIN_F1):
+    """
+    Make `version` the one inference serves by atomically replacing CURRENT.
+    Refused (ValueError) if the version is incomplete, or has no held-out CTI F1 or one below
+    `min_f1`; `min_f1=None` skips the metric check (rollback to a version served before).
+    """
+    model_path, vectorizer_path = model_paths(version)
+    if not os.path.exists(model_path) or not os.path.exists(vectorizer_path):
+        raise ValueError(f"Model version {version} is missing or incomplete")
+    f1 = load_metrics(version).get("cti_f1")
+    if min_f1 is not None and f1 is None:
+        raise ValueError(f"Model version {version} has no held-out CTI F1 to check against {min_f1}")
+    if min_f1 is not None and f1 < min_f1:
+        raise ValueError(f"Model version {version} has CTI F1 {f1}, below the promotion threshold {min_f1}")
+
+    tmp_path = os.path.join(MODELS_DIR, f".{CURRENT_FILE}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+    os.replace(tmp_path, os.path.join(MODELS_DIR, CURRENT_FILE))
+    print(f"🚀 Promoted model version {version}")
+    return version
+
+
+def rollback():
+    """Promote the version saved before the current one."""
+    versions = list_versions()
+    current = current_version()
+    older = [v for v in versions if current is None or v < current]
+    if not older:
+        raise ValueError("No earlier model version to roll back to")
+    return promote(older[-1], min_f1=None)
+
+
+# Entry point if run directly:
+#   python -m ml.model_lifecycle train <input.parquet|dataset_dir> [--promote]
+#   python -m ml.model_lifecycle promote <version> | rollback | list
+if __name__ == "__main__":
+    import sys
+
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == "train" and len(sys.argv) >= 3:
+        import pandas as pd
+        from ml.cti_classifier import prepare_training_data, train_and_save_model
+
+        df = pd.read_parquet(sys.argv[2], columns=["Content"])
+        train_and_save_model(prepare_training_data(df), promote="--promote" in sys.argv)
+    elif command == "promote" and len(sys.argv) == 3:
+        promote(sys.argv[2])
+    elif command == "rollback":
+        rollback()
+    elif command == "list":
+        current = current_version()
+        for version in list_versions():
+            metrics = load_metrics(version)
+            marker = "*" if version == current else " "
+            print(f"{marker} {version}  kind={metrics.get('kind')}  accuracy={metrics.get('accuracy')}  "
+                  f"cti_f1={metrics.get('cti_f1')}")
+    else:
+        print("Usage: python -m ml.model_lifecycle train <dataset> [--promote] | promote <version> | rollback | list")
+        sys.exit(1)
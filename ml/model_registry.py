@@ -0,0 +1,67 @@
+import os
+import threading
+import joblib
+
+
+class ModelRegistry:
+    """
+    Process-wide cache for a model + vectorizer pair.
+
+    Both files are unpickled once and kept resident. Every `get()` stats the files
+    and reloads them if their mtime/size changed, so a retrained model is picked up
+    without restarting. With `resolve` (a callable returning both paths) the paths are
+    looked up on every `get()` too, so promoting another model version switches over.
+    With `mmap_mode="r"` numpy arrays are memory-mapped instead of copied, letting
+    several worker processes share one copy of the weights via the page cache.
+    """
+
+    def __init__(self, model_path=None, vectorizer_path=None, mmap_mode=None, resolve=None):
+        self.model_path = model_path
+        self.vectorizer_path = vectorizer_path
+        self.mmap_mode = mmap_mode
+        self.resolve = resolve
+        self._lock = threading.Lock()
+        self._loaded = (None, None, None)  # (signature, model, vectorizer), swapped as one unit
+
+    def _paths(self):
+        return self.resolve() if self.resolve else (self.model_path, self.vectorizer_path)
+
+    def _file_signature(self):
+        model_path, vectorizer_path = self._paths()
+        if not os.path.exists(model_path) or not os.path.exists(vectorizer_path):
+            raise FileNotFoundError("CTI classifier model/vectorizer not found. Train first.")
+        model_stat = os.stat(model_path)
+        vectorizer_stat = os.stat(vectorizer_path)
+        return (model_path, model_stat.st_mtime_ns, model_stat.st_size,
+                vectorizer_path, vectorizer_stat.st_mtime_ns, vectorizer_stat.st_size)
+
+    def get(self):
+        """Return (model, vectorizer), loading or reloading them if needed."""
+        signature = self._file_signature()
+        loaded_signature, model, vectorizer = self._loaded
+        if signature == loaded_signature:
+            return model, vectorizer
+
+        with self._lock:
+            while signature != self._loaded[0]:
+                model_path, _, _, vectorizer_path, _, _ = signature
+                model = joblib.load(model_path, mmap_mode=self.mmap_mode)
+                vectorizer = joblib.load(vectorizer_path, mmap_mode=self.mmap_mode)
+                self._loaded = (signature, model, vectorizer)
+                # Files replaced while we were loading: go again so the pair stays consistent
+                signature = self._file_signature()
+            return self._loaded[1], self._loaded[2]
+
+    def warm_up(self):
+        """Load eagerly (e.g. at startup) so the first prediction does not pay for it."""
+        self.get()
+        return self
+
+    def invalidate(self):
+        """Force a reload on the next `get()`."""
+        with self._lock:
+            self._loaded = (None, None, None)
+
+    @property
+    def loaded(self):
+        return self._loaded[0] is not None
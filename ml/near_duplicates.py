@@ -0,0 +1,112 @@
+import re
+import zlib
+import numpy as np
+import pandas as pd
+from utils.reactions import merge_reactions, reaction_pairs
+from utils.text_normalization import normalized_column
+
+NUM_PERM = 128  # MinHash signature length
+BANDS = 32  # LSH bands of NUM_PERM // BANDS rows each
+SHINGLE_SIZE = 3  # words per shingle
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_TOKEN_RE = re.compile(r"\w+")
+
+_rng = np.random.default_rng(1)
+_PERM_A = _rng.integers(1, 1 << 32, NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 1 << 32, NUM_PERM, dtype=np.uint64)
+
+
+def shingles(text, normalized=False):
+    """Hashed word n-grams of the lowercased text (`normalized`: already lowercased)."""
+    if not isinstance(text, str):
+        text = ""
+    tokens = _TOKEN_RE.findall(text if normalized else text.lower())
+    if len(tokens) < SHINGLE_SIZE:
+        grams = [" ".join(tokens)]
+    else:
+        grams = [" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)]
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in set(grams)), dtype=np.uint64)
+
+
+def minhash(text, normalized=False):
+    """MinHash signature (NUM_PERM values) of one text."""
+    hashes = shingles(text, normalized)
+    # uint64 arithmetic wraps around, which is fine for hashing purposes
+    permuted = (np.outer(hashes, _PERM_A) + _PERM_B) % _MERSENNE_PRIME
+    return permuted.min(axis=0)
+
+
+def cluster_near_duplicates(texts, threshold=0.7, normalized=False):
+    """
+    Group near-identical texts with MinHash + LSH in roughly linear time.
+
+    Texts sharing an LSH bucket are merged when their estimated Jaccard similarity
+    reaches `threshold`. Returns one cluster id per text (ids are 0..n_clusters-1,
+    in order of first appearance). `normalized` says the texts are already lowercased.
+    """
+    n = len(texts)
+    if n == 0:
+        return np.array([], dtype=np.int64)
+
+    signatures = np.vstack([minhash(t, normalized) for t in texts])
+    parent = np.arange(n)
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    rows = NUM_PERM // BANDS
+    for band in range(BANDS):
+        buckets = {}
+        band_slice = signatures[:, band * rows:(band + 1) * rows]
+        for i in range(n):
+            key = band_slice[i].tobytes()
+            first = buckets.setdefault(key, i)
+            if first == i:
+                continue
+            root_i, root_first = find(i), find(first)
+            if root_i != root_first and np.mean(signatures[i] == signatures[first]) >= threshold:
+                parent[max(root_i, root_first)] = min(root_i, root_first)
+
+    roots = np.array([find(i) for i in range(n)])
+    _, cluster_ids = np.unique(roots, return_inverse=True)
+    return cluster_ids
+
+
+def deduplicate_messages(df, text_column="Content", threshold=0.7):
+    """
+    Collapse reposts / forwards of the same message into one row per cluster.
+
+    The representative is the most viewed message of its cluster. Views and Shares are
+    summed, Reactions merged (summed per emoji, kept as a map), and `Cluster_Size` /
+    `Cluster_Groups` record how many copies were seen and in which channels. Order
+    follows the first appearance of each cluster.
+    """
+    if df.empty:
+        return df.assign(Cluster_Size=pd.Series(dtype="int64"), Cluster_Groups=pd.Series(dtype="object"))
+
+    df = df.reset_index(drop=True).copy()
+    texts = normalized_column(df, text_column).tolist()
+    df["Cluster_ID"] = cluster_near_duplicates(texts, threshold=threshold, normalized=True)
+    clusters = df.groupby("Cluster_ID", sort=True)
+
+    if "Views" in df.columns:
+        representative_idx = df["Views"].fillna(-1).groupby(df["Cluster_ID"]).idxmax()
+    else:
+        representative_idx = df.index.to_series().groupby(df["Cluster_ID"]).first()
+    deduped = df.loc[representative_idx.values].set_index("Cluster_ID")
+
+    deduped["Cluster_Size"] = clusters.size()
+    for column in ("Views", "Shares"):
+        if column in df.columns:
+            deduped[column] = clusters[column].sum(min_count=1)
+    if "Reactions" in df.columns:
+        # Kept in the map column's (emoji, count) pair form
+        deduped["Reactions"] = clusters["Reactions"].agg(lambda values: reaction_pairs(merge_reactions(values)))
+    if "Group" in df.columns:
+        deduped["Cluster_Groups"] = clusters["Group"].agg(lambda g: ", ".join(dict.fromkeys(g)))
+
+    print(f"🧹 Near-duplicate clustering: {len(df)} messages → {len(deduped)} distinct")
+    return deduped.reset_index(drop=True)
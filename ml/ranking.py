@@ -0,0 +1,71 @@
+import heapq
+import os
+import numpy as np
+import pandas as pd
+from utils.reactions import total_reactions
+
+# Weights of each score component (each component is scaled to 0..1 first)
+WEIGHT_PROBABILITY = float(os.getenv("RANK_WEIGHT_PROBABILITY", "0.4"))
+WEIGHT_ENGAGEMENT = float(os.getenv("RANK_WEIGHT_ENGAGEMENT", "0.3"))
+WEIGHT_RECENCY = float(os.getenv("RANK_WEIGHT_RECENCY", "0.2"))
+WEIGHT_CVE = float(os.getenv("RANK_WEIGHT_CVE", "0.1"))
+
+ENGAGEMENT_SCALE = float(os.getenv("RANK_ENGAGEMENT_SCALE", "100000"))  # interactions that count as full engagement
+RECENCY_HALF_LIFE_HOURS = float(os.getenv("RANK_RECENCY_HALF_LIFE_HOURS", "72"))
+
+CVE_PATTERN = r"(?i)\bCVE-\d{4}-\d{4,}\b"
+
+
+def _column(df, name, default=0):
+    return df[name] if name in df.columns else pd.Series(default, index=df.index)
+
+
+def score_messages(df, reference_time=None):
+    """
+    Relevance score per message with its breakdown.
+
+    Adds `Score_Probability` (classifier CTI probability), `Score_Engagement` (log-scaled
+    views + shares + reactions), `Score_Recency` (exponential decay, RECENCY_HALF_LIFE_HOURS,
+    relative to `reference_time` or the newest message) and `Score_CVE` (mentions a CVE id),
+    each already multiplied by its weight, plus their sum as `Score`.
+    """
+    df = df.copy()
+
+    probability = pd.to_numeric(_column(df, "CTI_Probability", 1.0), errors="coerce").fillna(0).clip(0, 1)
+
+    interactions = (
+        pd.to_numeric(_column(df, "Views"), errors="coerce").fillna(0)
+        + pd.to_numeric(_column(df, "Shares"), errors="coerce").fillna(0)
+        + _column(df, "Reactions", "").map(total_reactions)
+    )
+    engagement = (np.log1p(interactions) / np.log1p(ENGAGEMENT_SCALE)).clip(0, 1)
+
+    dates = pd.to_datetime(_column(df, "Date", pd.NaT), utc=True, errors="coerce")
+    reference = pd.Timestamp(reference_time) if reference_time is not None else dates.max()
+    if reference is not pd.NaT and reference.tzinfo is None:
+        reference = reference.tz_localize("UTC")
+    age_hours = ((reference - dates).dt.total_seconds() / 3600).clip(lower=0)
+    recency = np.exp2(-age_hours / RECENCY_HALF_LIFE_HOURS).fillna(0)
+
+    has_cve = _column(df, "Content", "").astype(str).str.contains(CVE_PATTERN, regex=True).astype(float)
+
+    df["Score_Probability"] = WEIGHT_PROBABILITY * probability
+    df["Score_Engagement"] = WEIGHT_ENGAGEMENT * engagement
+    df["Score_Recency"] = WEIGHT_RECENCY * recency
+    df["Score_CVE"] = WEIGHT_CVE * has_cve
+    df["Score"] = df["Score_Probability"] + df["Score_Engagement"] + df["Score_Recency"] + df["Score_CVE"]
+    return df
+
+
+def top_k(df, k=10, score_column="Score"):
+    """Highest-scoring k rows via a bounded heap: O(n log k), ties keep the earlier row."""
+    scores = df[score_column].to_numpy()
+    best = heapq.nlargest(k, range(len(scores)), key=lambda i: (scores[i], -i))
+    return df.iloc[best]
+
+
+def rank_messages(df, k=10, reference_time=None):
+    """Score every message and return the top k, best first, with the score breakdown columns."""
+    if df.empty:
+        return df
+    return top_k(score_messages(df, reference_time=reference_time), k=k).reset_index(drop=True)
@@ -0,0 +1,187 @@
+import json
+import os
+import time
+from datetime import datetime, timezone
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+from ml import model_lifecycle
+from ml.cti_classifier import get_keyword_matcher, registry
+from utils.text_normalization import NORMALIZED_COLUMN, normalize_texts
+
+CLASSES = np.array(["CTI", "Non-CTI"])
+
+HASHING_FEATURES = int(os.getenv("CTI_HASHING_FEATURES", str(2 ** 20)))  # hashed (1,2)-gram buckets
+CHUNK_SIZE = int(os.getenv("CTI_STREAM_CHUNK_SIZE", "50000"))
+CHECKPOINT_EVERY = int(os.getenv("CTI_STREAM_CHECKPOINT_EVERY", "10"))  # chunks between model checkpoints
+SGD_ALPHA = float(os.getenv("CTI_SGD_ALPHA", "1e-6"))
+# Working checkpoint of the streaming model; finished runs are published as model versions
+STREAMING_DIR = os.getenv("CTI_STREAMING_DIR", "ml/streaming")
+STATE_PATH = os.path.join(STREAMING_DIR, "state.json")
+# "true" updates the model from every new scrape before it is scored, promoting the result (main.py)
+ONLINE_UPDATE = os.getenv("CTI_ONLINE_UPDATE", "false").lower() in ("1", "true", "yes")
+
+
+def make_vectorizer(n_features=HASHING_FEATURES):
+    """
+    Stateless text features: no vocabulary to fit or hold in memory, no feature cap.
+    Texts arrive normalized, so there is no second lowercasing pass.
+    """
+    from sklearn.feature_extraction.text import HashingVectorizer
+
+    return HashingVectorizer(n_features=n_features, ngram_range=(1, 2), alternate_sign=False, norm="l2",
+                             lowercase=False)
+
+
+def make_model(alpha=SGD_ALPHA):
+    """Online logistic regression (log loss), so `predict_proba` works like the batch model."""
+    from sklearn.linear_model import SGDClassifier
+
+    return SGDClassifier(loss="log_loss", alpha=alpha, random_state=42)
+
+
+def load_state():
+    if not os.path.exists(STATE_PATH):
+        return {"rows_seen": 0, "chunks_seen": 0, "sources": []}
+    with open(STATE_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_checkpoint(model, vectorizer, state):
+    """Write the working checkpoint, each file via write-then-rename."""
+    os.makedirs(STREAMING_DIR, exist_ok=True)
+    for obj, name in ((model, model_lifecycle.MODEL_FILE), (vectorizer, model_lifecycle.VECTORIZER_FILE)):
+        path = os.path.join(STREAMING_DIR, name)
+        joblib.dump(obj, path + ".tmp")
+        os.replace(path + ".tmp", path)
+    with open(STATE_PATH + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(STATE_PATH + ".tmp", STATE_PATH)
+
+
+def load_streaming_model():
+    """The checkpointed model + vectorizer and whether they exist; a fresh pair otherwise."""
+    model_path = os.path.join(STREAMING_DIR, model_lifecycle.MODEL_FILE)
+    vectorizer_path = os.path.join(STREAMING_DIR, model_lifecycle.VECTORIZER_FILE)
+    if os.path.exists(model_path) and os.path.exists(vectorizer_path):
+        return joblib.load(model_path), joblib.load(vectorizer_path), True
+    return make_model(), make_vectorizer(), False
+
+
+def _chunk_labels(texts, labels):
+    """Given labels where present, keyword heuristic labels (on the normalized texts) otherwise."""
+    if labels is not None:
+        return np.asarray(labels, dtype=object)
+    is_cti, _ = get_keyword_matcher().match_series(pd.Series(texts), normalized=True)
+    return np.where(is_cti, "CTI", "Non-CTI")
+
+
+def train_streaming(input_path, text_column="Content", label_column="Label", chunk_size=CHUNK_SIZE,
+                    checkpoint_every=CHECKPOINT_EVERY, warm_start=True, promote=False):
+    """
+    Train (or keep training) the classifier over a Parquet file or dataset directory,
+    one chunk at a time, so memory stays bounded by `chunk_size` rows.
+
+    Rows are labelled from `label_column` when the data has it, else by the keyword
+    heuristic. Each chunk is scored before the model learns from it (progressive
+    validation), giving held-out metrics without a separate test set. The working model
+    is checkpointed to STREAMING_DIR every `checkpoint_every` chunks; with `warm_start`
+    an existing checkpoint continues learning. The result is saved as a new model version
+    and promoted if `promote` and it passes the promotion gate.
+    Returns the version name, or None when there was nothing to train on (no version is saved).
+    """
+    model, vectorizer, resumed = load_streaming_model() if warm_start else (make_model(), make_vectorizer(), False)
+    state = load_state() if resumed else {"rows_seen": 0, "chunks_seen": 0, "sources": []}
+    print(f"{'🔁 Warm-starting' if resumed else '🆕 Training new'} streaming model "
+          f"({state['rows_seen']:,} rows seen so far) on {input_path}")
+
+    dataset = ds.dataset(input_path, format="parquet")
+    if text_column not in dataset.schema.names:
+        # E.g. an incremental scrape with no new messages: its dataset directory has no parts
+        print(f"⚠️ No `{text_column}` rows in {input_path}; streaming model left unchanged")
+        return None
+    # Scraped datasets carry the normalized text (scrapers/parquet_sink.py): read it instead
+    prenormalized = text_column == "Content" and NORMALIZED_COLUMN in dataset.schema.names
+    columns = [NORMALIZED_COLUMN if prenormalized else text_column]
+    columns += [label_column] if label_column in dataset.schema.names else []
+    start_time = time.time()
+    rows = correct = scored = chunks = 0
+    true_pos = false_pos = false_neg = 0
+
+    for batch in dataset.to_batches(columns=columns, batch_size=chunk_size):
+        # Normalized once, shared by the keyword labeller and the vectorizer
+        if prenormalized:
+            texts = [text or "" for text in batch.column(NORMALIZED_COLUMN).to_pylist()]
+        else:
+            texts = normalize_texts(batch.column(text_column).to_pylist())
+        if not texts:
+            continue
+        labels = batch.column(label_column).to_pylist() if label_column in columns else None
+        y = _chunk_labels(texts, labels)
+        X = vectorizer.transform(texts)
+
+        if hasattr(model, "classes_"):
+            predicted = model.predict(X)
+            correct += int((predicted == y).sum())
+            scored += len(y)
+            true_pos += int(((predicted == "CTI") & (y == "CTI")).sum())
+            false_pos += int(((predicted == "CTI") & (y != "CTI")).sum())
+            false_neg += int(((predicted != "CTI") & (y == "CTI")).sum())
+        model.partial_fit(X, y, classes=CLASSES)
+
+        rows += len(texts)
+        chunks += 1
+        state["rows_seen"] += len(texts)
+        state["chunks_seen"] += 1
+        elapsed = max(time.time() - start_time, 1e-9)
+        accuracy = f" | progressive accuracy {correct / scored:.3f}" if scored else ""
+        print(f"Trained on {rows:,} rows | {rows / elapsed:,.0f} rows/sec{accuracy}")
+
+        if checkpoint_every and chunks % checkpoint_every == 0:
+            save_checkpoint(model, vectorizer, state)
+
+    if not rows or not hasattr(model, "classes_"):
+        print(f"⚠️ No rows to train on in {input_path}; streaming model left unchanged")
+        return None
+
+    state["sources"].append({
+        "path": os.path.abspath(input_path),
+        "rows": rows,
+        "progressive_accuracy": correct / scored if scored else None,
+        "trained_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    })
+    save_checkpoint(model, vectorizer, state)
+    print(f"✅ Streaming model updated with {rows:,} rows ({state['rows_seen']:,} in total)")
+
+    precision = true_pos / (true_pos + false_pos) if true_pos + false_pos else 0.0
+    recall = true_pos / (true_pos + false_neg) if true_pos + false_neg else 0.0
+    version = model_lifecycle.save_version(model, vectorizer, {
+        "kind": "hashing-sgd",
+        "accuracy": correct / scored if scored else None,
+        "cti_precision": precision,
+        "cti_recall": recall,
+        "cti_f1": 2 * precision * recall / (precision + recall) if scored and precision + recall else None,
+        "n_test": scored,  # progressive validation: rows scored before being trained on
+        "n_train": state["rows_seen"],
+        "label_source": label_column if label_column in columns else "keywords",
+        "source": os.path.abspath(input_path),
+    })
+    if promote:
+        try:
+            model_lifecycle.promote(version)
+            registry.invalidate()
+        except ValueError as e:
+            print(f"⚠️ Not promoted, still serving {model_lifecycle.current_version()}: {e}")
+    return version
+
+
+# Entry point if run directly: python -m ml.streaming_trainer <input.parquet|dataset_dir> [--fresh] [--promote]
+if __name__ == "__main__":
+    import sys
+
+    args = [arg for arg in sys.argv[1:] if arg not in ("--fresh", "--promote")]
+    if len(args) != 1:
+        print("Usage: python -m ml.streaming_trainer <input.parquet|dataset_dir> [--fresh] [--promote]")
+        sys.exit(1)
+    train_streaming(args[0], warm_start="--fresh" not in sys.argv, promote="--promote" in sys.argv)
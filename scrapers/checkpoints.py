@@ -0,0 +1,122 @@
+import sqlite3
+from datetime import datetime, timezone
+
+
+class CheckpointStore:
+    """
+    Per-channel high-water marks for incremental scraping, kept in a local SQLite file.
+
+    last_message_id / last_date   newest message stored by the last *completed* pass
+    pass_top_id / pass_low_id     newest / oldest message stored by the pass in flight;
+                                  set while a pass runs, cleared once it completes
+
+    Telegram returns history newest-first, so an interrupted pass leaves a gap between
+    pass_low_id and last_message_id. The next run fills that gap before anything else.
+    """
+
+    def __init__(self, path="telegram_checkpoints.sqlite", search=""):
+        self.path = path
+        self.search = search
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS channel_checkpoints (
+                channel TEXT NOT NULL,
+                search TEXT NOT NULL,
+                last_message_id INTEGER NOT NULL DEFAULT 0,
+                last_date TEXT,
+                pass_top_id INTEGER,
+                pass_top_date TEXT,
+                pass_low_id INTEGER,
+                updated_at TEXT,
+                PRIMARY KEY (channel, search)
+            )
+        """)
+        self.conn.commit()
+        self._state = {}
+        self._dirty = set()
+
+    def get(self, channel):
+        """Current checkpoint for `channel` as a dict (all zero/None if never scraped)."""
+        if channel not in self._state:
+            row = self.conn.execute(
+                "SELECT last_message_id, last_date, pass_top_id, pass_top_date, pass_low_id "
+                "FROM channel_checkpoints WHERE channel = ? AND search = ?",
+                (channel, self.search),
+            ).fetchone()
+            keys = ("last_message_id", "last_date", "pass_top_id", "pass_top_date", "pass_low_id")
+            self._state[channel] = dict(zip(keys, row)) if row else {
+                "last_message_id": 0, "last_date": None,
+                "pass_top_id": None, "pass_top_date": None, "pass_low_id": None,
+            }
+        return self._state[channel]
+
+    def window(self, channel):
+        """
+        (offset_id, min_id) to pass to `iter_messages` for the next pass over `channel`.
+        Resumes below the oldest message of an interrupted pass, otherwise fetches only newer messages.
+        """
+        state = self.get(channel)
+        if state["pass_low_id"] is not None:
+            return state["pass_low_id"], state["last_message_id"]
+        return 0, state["last_message_id"]
+
+    def record(self, channel, message_id, date):
+        """Note a stored message. Held in memory until `flush()`."""
+        state = self.get(channel)
+        if state["pass_top_id"] is None or message_id > state["pass_top_id"]:
+            state["pass_top_id"] = message_id
+            state["pass_top_date"] = date.isoformat()
+        if state["pass_low_id"] is None or message_id < state["pass_low_id"]:
+            state["pass_low_id"] = message_id
+        self._dirty.add(channel)
+
+    def complete(self, channel):
+        """
+        Close the pass in flight: its newest message becomes the new high-water mark.
+        Like `record()`, this is only persisted by the next `flush()`.
+        """
+        state = self.get(channel)
+        if state["pass_top_id"] is not None and state["pass_top_id"] > state["last_message_id"]:
+            state["last_message_id"] = state["pass_top_id"]
+            state["last_date"] = state["pass_top_date"]
+        state["pass_top_id"] = state["pass_top_date"] = state["pass_low_id"] = None
+        self._dirty.add(channel)
+
+    def copy_from(self, other, channel):
+        """Take `channel`'s checkpoint from another store (e.g. a sharded worker's file); persisted by `flush()`."""
+        self._state[channel] = dict(other.get(channel))
+        self._dirty.add(channel)
+
+    def flush(self):
+        """
+        Persist pending checkpoints. Call this only once the matching messages are on disk,
+        otherwise a crash could skip messages that were never saved.
+        """
+        if not self._dirty:
+            return
+        now = datetime.now(timezone.utc).isoformat()
+        self.conn.executemany(
+            """
+            INSERT INTO channel_checkpoints
+                (channel, search, last_message_id, last_date, pass_top_id, pass_top_date, pass_low_id, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (channel, search) DO UPDATE SET
+                last_message_id = excluded.last_message_id,
+                last_date = excluded.last_date,
+                pass_top_id = excluded.pass_top_id,
+                pass_top_date = excluded.pass_top_date,
+                pass_low_id = excluded.pass_low_id,
+                updated_at = excluded.updated_at
+            """,
+            [
+                (channel, self.search, state["last_message_id"], state["last_date"],
+                 state["pass_top_id"], state["pass_top_date"], state["pass_low_id"], now)
+                for channel, state in ((c, self._state[c]) for c in self._dirty)
+            ],
+        )
+        self.conn.commit()
+        self._dirty.clear()
+
+    def close(self):
+        """Close the database. Progress that was never flushed is dropped on purpose."""
+        self.conn.close()
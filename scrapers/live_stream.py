@@ -0,0 +1,291 @@
+import asyncio
+import json
+import os
+import time
+import urllib.request
+from collections import deque
+from datetime import datetime, timezone
+from telethon import TelegramClient, events
+from telethon.utils import get_peer_id
+from scrapers.telegram_scraper import API_HASH, API_ID, CHANNELS, USERNAME, message_to_record
+from ml.cti_classifier import get_model, predict_with_proba, warm_up_model
+from utils.telemetry import telemetry
+
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "1000"))  # messages waiting for classification
+LIVE_OVERFLOW = os.getenv("LIVE_OVERFLOW", "block").lower()  # full queue: "block" the receiver or "drop" the message
+LIVE_BATCH_SIZE = int(os.getenv("LIVE_BATCH_SIZE", "64"))
+LIVE_BATCH_WAIT = float(os.getenv("LIVE_BATCH_WAIT", "0.05"))  # seconds a micro-batch waits to fill up
+LIVE_ALERT_THRESHOLD = float(os.getenv("LIVE_ALERT_THRESHOLD", "0.5"))  # CTI probability that raises an alert
+LIVE_ALERTS_PATH = os.getenv("LIVE_ALERTS_PATH", "live_alerts.jsonl")
+LIVE_WEBHOOK_URL = os.getenv("LIVE_WEBHOOK_URL") or None
+LIVE_STATS_INTERVAL = float(os.getenv("LIVE_STATS_INTERVAL", "60"))  # seconds between latency reports
+
+
+class LatencyStats:
+    """Rolling latency percentiles over the last `window` samples."""
+
+    def __init__(self, window=10000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def percentile(self, q):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "p50_ms": _ms(self.percentile(0.50)),
+            "p95_ms": _ms(self.percentile(0.95)),
+            "p99_ms": _ms(self.percentile(0.99)),
+            "max_ms": _ms(max(self.samples) if self.samples else None),
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+class JsonlAlertSink:
+    """Appends one JSON object per alert to `path`."""
+
+    def __init__(self, path=LIVE_ALERTS_PATH):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+
+    async def send(self, alerts):
+        for alert in alerts:
+            self._file.write(json.dumps(alert, ensure_ascii=False, default=str) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class WebhookAlertSink:
+    """POSTs each micro-batch of alerts as a JSON list to `url`; failures are logged, not retried."""
+
+    def __init__(self, url=LIVE_WEBHOOK_URL, timeout=5):
+        self.url = url
+        self.timeout = timeout
+
+    def _post(self, alerts):
+        data = json.dumps(alerts, ensure_ascii=False, default=str).encode("utf-8")
+        request = urllib.request.Request(self.url, data=data, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+    async def send(self, alerts):
+        try:
+            await asyncio.to_thread(self._post, alerts)
+        except Exception as e:
+            print(f"⚠️ Webhook {self.url} failed: {e}")
+
+    def close(self):
+        pass
+
+
+class LiveClassifier:
+    """
+    Receiver → bounded queue → micro-batched classification → alert sinks.
+
+    `submit` enqueues a message; when the queue is full it either waits (backpressure
+    on the receiver, LIVE_OVERFLOW=block) or drops the message (LIVE_OVERFLOW=drop).
+    `run` takes up to `batch_size` messages, waiting at most `batch_wait` seconds for a
+    batch to fill, scores them with the resident model in a worker thread and sends the
+    ones at or above `threshold` to every sink. A batch that fails to classify and a sink
+    that fails to send are logged and counted (`errors`); the consumer keeps going.
+    Latency is measured from receipt to alert (`latency`) and from the message's post
+    time to alert (`post_latency`).
+    """
+
+    def __init__(self, sinks, queue_size=LIVE_QUEUE_SIZE, batch_size=LIVE_BATCH_SIZE,
+                 batch_wait=LIVE_BATCH_WAIT, threshold=LIVE_ALERT_THRESHOLD, overflow=LIVE_OVERFLOW):
+        self.sinks = sinks
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.threshold = threshold
+        self.overflow = overflow
+        self.latency = LatencyStats()
+        self.post_latency = LatencyStats()
+        self.received = 0
+        self.dropped = 0
+        self.alerts = 0
+        self.errors = 0
+
+    async def submit(self, message, channel):
+        item = (message_to_record(message, channel), time.perf_counter(), message.date)
+        self.received += 1
+        telemetry.count("live.received")
+        if self.overflow == "drop":
+            try:
+                self.queue.put_nowait(item)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                telemetry.count("live.dropped")
+        else:
+            await self.queue.put(item)
+
+    async def _next_batch(self):
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _classify(self, texts):
+        model, vectorizer = get_model()
+        return predict_with_proba(model, vectorizer, texts)
+
+    async def _send(self, alerts):
+        """Send `alerts` to every sink; one failing sink does not keep them from the others."""
+        for sink in self.sinks:
+            try:
+                await sink.send(alerts)
+            except Exception as e:
+                self.errors += 1
+                telemetry.count("live.sink_errors")
+                print(f"❌ {type(sink).__name__} failed to send {len(alerts)} alerts: {e}")
+
+    async def run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                texts = [record["Content"] for record, _, _ in batch]
+                labels, cti_proba = await asyncio.to_thread(self._classify, texts)
+            except Exception as e:
+                self.errors += 1
+                telemetry.count("live.classify_errors")
+                print(f"❌ Failed to classify {len(batch)} live messages, skipping them: {e}")
+                for _ in batch:
+                    self.queue.task_done()
+                continue
+
+            alerts = []
+            for (record, received_at, posted_at), label, proba in zip(batch, labels, cti_proba):
+                if label == "CTI" and proba >= self.threshold:
+                    alerts.append(dict(record, Predicted_Label=label, CTI_Probability=float(proba),
+                                       Alerted_At=datetime.now(timezone.utc).isoformat()))
+            if alerts:
+                await self._send(alerts)
+
+            now = time.perf_counter()
+            wall_now = datetime.now(timezone.utc)
+            for _, received_at, posted_at in batch:
+                self.latency.record(now - received_at)
+                if posted_at is not None:
+                    self.post_latency.record((wall_now - posted_at).total_seconds())
+            self.alerts += len(alerts)
+            telemetry.count("live.classified", len(batch))
+            telemetry.count("live.alerts", len(alerts))
+            for _ in batch:
+                self.queue.task_done()
+
+    def stats(self):
+        return {
+            "received": self.received,
+            "dropped": self.dropped,
+            "alerts": self.alerts,
+            "errors": self.errors,
+            "queued": self.queue.qsize(),
+            "latency": self.latency.summary(),
+            "post_latency": self.post_latency.summary(),
+        }
+
+    async def report_stats(self, interval=LIVE_STATS_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            stats = self.stats()
+            latency = stats["latency"]
+            print(f"📡 live: {stats['received']} received, {stats['alerts']} alerts, {stats['dropped']} dropped, "
+                  f"{stats['errors']} errors, {stats['queued']} queued | latency p50={latency['p50_ms']}ms p95={latency['p95_ms']}ms "
+                  f"p99={latency['p99_ms']}ms")
+
+
+def default_sinks():
+    sinks = [JsonlAlertSink(LIVE_ALERTS_PATH)]
+    if LIVE_WEBHOOK_URL:
+        sinks.append(WebhookAlertSink(LIVE_WEBHOOK_URL))
+    return sinks
+
+
+async def run_live(channels=None, client=None, sinks=None):
+    """
+    Long-running daemon: classify new posts in `channels` as they arrive and alert on CTI.
+    Runs until the client disconnects; returns the final stats.
+    """
+    channels = channels or CHANNELS
+    sinks = sinks if sinks is not None else default_sinks()
+    if not warm_up_model():
+        get_model()  # keyword fallback, or fail now with CTI_MISSING_MODEL=fail
+    live = LiveClassifier(sinks)
+
+    async def listen(active_client):
+        names = {}
+        for channel in channels:
+            names[get_peer_id(await active_client.get_entity(channel))] = channel
+
+        async def on_message(event):
+            await live.submit(event.message, names.get(event.chat_id, str(event.chat_id)))
+
+        active_client.add_event_handler(on_message, events.NewMessage(chats=list(names)))
+        print(f"👂 Listening to {len(names)} channels; alerts → {', '.join(type(s).__name__ for s in sinks)}")
+        await active_client.run_until_disconnected()
+
+    workers = [asyncio.create_task(live.run()), asyncio.create_task(live.report_stats())]
+    try:
+        if client is None:
+            async with TelegramClient(USERNAME, API_ID, API_HASH) as client:
+                await listen(client)
+        else:
+            await listen(client)
+    finally:
+        for worker in workers:
+            worker.cancel()
+        for sink in sinks:
+            sink.close()
+    return live.stats()
+
+
+def serve_webhook_stand_in(port=8765, path="webhook_received.jsonl"):
+    """Local stand-in for an alerting webhook: appends every POSTed payload to `path`."""
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with open(path, "ab") as f:
+                f.write(body + b"\n")
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            print(f"🪝 webhook: {format % args}")
+
+    print(f"🪝 Webhook stand-in on http://127.0.0.1:{port}/ → {path}")
+    HTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+
+# Entry point if run directly:
+#   python -m scrapers.live_stream                  (set LIVE_WEBHOOK_URL to also POST alerts)
+#   python -m scrapers.live_stream --webhook-stand-in [port]
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "--webhook-stand-in":
+        serve_webhook_stand_in(int(sys.argv[2]) if len(sys.argv) > 2 else 8765)
+    else:
+        print(asyncio.run(run_live()))
@@ -0,0 +1,220 @@
+import os
+from array import array
+from datetime import datetime, timezone
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from utils.reactions import format_reactions, parse_reactions
+from utils.text_normalization import NORMALIZED_COLUMN, normalize_texts
+
+
+# Column layout of every scraped dataset. Dates are UTC (timezone-naive, so they survive an
+# Excel export); reactions are emoji -> count maps. Content_Normalized is Content cleaned and
+# lowercased once at write time, read by classification, training and dedup as is
+MESSAGE_SCHEMA = pa.schema([
+    ("Type", pa.string()),
+    ("Group", pa.string()),
+    ("Content", pa.string()),
+    (NORMALIZED_COLUMN, pa.string()),
+    ("Date", pa.timestamp("s")),
+    ("Message ID", pa.int64()),
+    ("Views", pa.int64()),
+    ("Reactions", pa.map_(pa.string(), pa.int64())),
+    ("Shares", pa.int64()),
+])
+
+
+def _epoch_seconds(value):
+    """UTC epoch seconds of a datetime (naive = UTC) or "YYYY-MM-DD HH:MM:SS" string; None if missing."""
+    if value is None or value != value:  # None, NaN or NaT
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+class MessageBuffer:
+    """
+    Column-wise buffer of scraped messages.
+
+    Integers and dates sit in typed arrays (8 bytes per value, plus one byte marking
+    missing values) and reactions as flat emoji / count columns with per-row offsets,
+    instead of one dict of boxed values and formatted strings per message. `to_table`
+    hands the arrays to Arrow without copying them.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.types, self.groups, self.contents = [], [], []
+        self.dates, self.dates_missing = array("q"), bytearray()
+        self.ids, self.ids_missing = array("q"), bytearray()
+        self.views, self.views_missing = array("q"), bytearray()
+        self.shares, self.shares_missing = array("q"), bytearray()
+        self.reaction_offsets, self.reaction_emojis, self.reaction_counts = array("i", [0]), [], array("q")
+
+    def __len__(self):
+        return len(self.contents)
+
+    @staticmethod
+    def _put(values, missing, value):
+        if value is None:
+            values.append(0)
+            missing.append(1)
+        else:
+            values.append(value)
+            missing.append(0)
+
+    def append_row(self, type_, group, content, date, message_id, views, reactions, shares):
+        """
+        Append one message from native values: `date` a datetime (naive = UTC), `reactions`
+        an iterable of (emoji, count) pairs, missing integers None. The scraper's hot path.
+        """
+        self.types.append(type_)
+        self.groups.append(group)
+        self.contents.append(content)
+        self._put(self.dates, self.dates_missing, _epoch_seconds(date))
+        self._put(self.ids, self.ids_missing, message_id)
+        self._put(self.views, self.views_missing, views)
+        self._put(self.shares, self.shares_missing, shares)
+        for emoji, count in reactions:
+            self.reaction_emojis.append(emoji)
+            self.reaction_counts.append(count)
+        self.reaction_offsets.append(len(self.reaction_emojis))
+
+    def append(self, record):
+        """Append a row dict with the dataset's column names (older string dates / reactions accepted too)."""
+        def integer(name):
+            value = record.get(name)
+            return None if value is None or value != value else int(value)
+
+        self.append_row(record.get("Type"), record.get("Group"), record.get("Content"),
+                        record.get("Date"), integer("Message ID"), integer("Views"),
+                        parse_reactions(record.get("Reactions")).items(), integer("Shares"))
+
+    @staticmethod
+    def _column(values, missing, type_):
+        data = np.frombuffer(values, dtype=np.int64)
+        mask = np.frombuffer(missing, dtype=np.bool_) if 1 in missing else None
+        return pa.array(data, type=type_, mask=mask)
+
+    def to_table(self):
+        reactions = pa.MapArray.from_arrays(
+            pa.array(np.frombuffer(self.reaction_offsets, dtype=np.int32)),
+            pa.array(self.reaction_emojis, pa.string()),
+            pa.array(np.frombuffer(self.reaction_counts, dtype=np.int64)),
+            type=MESSAGE_SCHEMA.field("Reactions").type,
+        )
+        return pa.Table.from_arrays([
+            pa.array(self.types, pa.string()),
+            pa.array(self.groups, pa.string()),
+            pa.array(self.contents, pa.string()),
+            pa.array(normalize_texts(self.contents), pa.string()),
+            self._column(self.dates, self.dates_missing, pa.timestamp("s")),
+            self._column(self.ids, self.ids_missing, pa.int64()),
+            self._column(self.views, self.views_missing, pa.int64()),
+            reactions,
+            self._column(self.shares, self.shares_missing, pa.int64()),
+        ], schema=MESSAGE_SCHEMA)
+
+
+class StreamingParquetWriter:
+    """
+    Append-only Parquet dataset writer with bounded memory.
+
+    Rows are buffered column-wise (MessageBuffer) until `row_group_size` is reached, then
+    written as one self-contained part file (`part-00000.parquet`, ...) inside `path`. Each
+    part is readable on its own, so a crashed run keeps everything flushed before the crash,
+    and `pd.read_parquet(path)` reads the whole dataset back.
+    `on_flush` is called after every part hits the disk (e.g. to persist checkpoints), and
+    `on_part` with the path of each new part (e.g. to score it while scraping goes on).
+    `append_table` takes rows that are already Arrow data in this layout, as they are.
+    """
+
+    def __init__(self, path, row_group_size=5000, on_flush=None, on_part=None):
+        self.path = path
+        self.row_group_size = row_group_size
+        self.on_flush = on_flush
+        self.on_part = on_part
+        self.rows_written = 0
+        self._buffer = MessageBuffer()
+        self._tables, self._table_rows = [], 0  # appended Arrow tables, written before the buffer
+        os.makedirs(path, exist_ok=True)
+        # Appending to an existing dataset continues its part numbering
+        self._parts = sum(1 for name in os.listdir(path) if name.endswith(".parquet"))
+
+    def append(self, record):
+        self._buffer.append(record)
+        if len(self._buffer) >= self.row_group_size:
+            self.flush()
+
+    def append_row(self, type_, group, content, date, message_id, views, reactions, shares):
+        """Append one message from native values, without building a row dict (see MessageBuffer)."""
+        self._buffer.append_row(type_, group, content, date, message_id, views, reactions, shares)
+        if len(self._buffer) >= self.row_group_size:
+            self.flush()
+
+    def append_table(self, table):
+        """Append an Arrow table (or record batch) with MESSAGE_SCHEMA's columns, without per-row conversion."""
+        if isinstance(table, pa.RecordBatch):
+            table = pa.Table.from_batches([table])
+        if not table.num_rows:
+            return
+        if len(self._buffer):
+            self.flush()  # rows appended earlier go first
+        self._tables.append(table.select(MESSAGE_SCHEMA.names).cast(MESSAGE_SCHEMA))
+        self._table_rows += table.num_rows
+        if self._table_rows >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        tables = self._tables + ([self._buffer.to_table()] if len(self._buffer) else [])
+        if tables:
+            table = pa.concat_tables(tables) if len(tables) > 1 else tables[0]
+            part_path = os.path.join(self.path, f"part-{self._parts:05}.parquet")
+            tmp_path = os.path.join(self.path, f".part-{self._parts:05}.parquet.tmp")  # dot-files are ignored by readers
+            pq.write_table(table, tmp_path)
+            os.replace(tmp_path, part_path)  # never leave a half-written part behind
+
+            self._parts += 1
+            self.rows_written += table.num_rows
+            self._buffer = MessageBuffer()
+            self._tables, self._table_rows = [], 0
+            if self.on_part:
+                self.on_part(part_path)
+
+        if self.on_flush:
+            self.on_flush()
+
+    def close(self):
+        """Flush the remaining rows and return the dataset path."""
+        self.flush()
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def read_dataset(path, columns=None):
+    """Read a dataset written by StreamingParquetWriter back into one DataFrame."""
+    parts = sorted(name for name in os.listdir(path) if name.endswith(".parquet"))
+    if not parts:
+        return MESSAGE_SCHEMA.empty_table().to_pandas()[columns or MESSAGE_SCHEMA.names]
+    if not pq.read_schema(os.path.join(path, parts[0])).equals(MESSAGE_SCHEMA):
+        # Written before dates and reactions were native columns: read it as it is
+        return pq.read_table(path, columns=columns).to_pandas()
+    return pq.read_table(path, columns=columns, schema=MESSAGE_SCHEMA).to_pandas()
+
+
+def export_excel(df, path):
+    """Excel copy of a dataset; reactions are written in the "👍 12 🔥 3 " text form."""
+    df = df.drop(columns=[NORMALIZED_COLUMN], errors="ignore")
+    if "Reactions" in df.columns:
+        df = df.assign(Reactions=df["Reactions"].map(lambda value: format_reactions(parse_reactions(value))))
+    df.to_excel(path, index=False, engine="openpyxl")
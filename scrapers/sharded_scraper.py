@@ -0,0 +1,300 @@
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import shutil
+import time
+from collections import deque
+from datetime import datetime
+from multiprocessing.connection import wait
+import numpy as np
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from telethon import TelegramClient
+from scrapers.checkpoints import CheckpointStore
+from scrapers.parquet_sink import StreamingParquetWriter, export_excel, read_dataset
+from scrapers.telegram_scraper import (API_HASH, API_ID, CHANNELS, CHECKPOINT_DB, FILE_FORMAT, FILE_NAME, INCREMENTAL,
+                                       KEY_SEARCH, MAX_T_INDEX, ROW_GROUP_SIZE, TIME_LIMIT, USERNAME, scrape)
+
+# JSON list of accounts, one worker process each: [{"session": "acc1", "api_id": 123, "api_hash": "..."}, ...]
+ACCOUNTS_FILE = os.getenv("TELEGRAM_ACCOUNTS_FILE", "telegram_accounts.json")
+SHARD_MAX_RETRIES = int(os.getenv("TELEGRAM_SHARD_MAX_RETRIES", "2"))  # extra attempts per channel
+SHARD_POLL_INTERVAL = 1.0  # seconds the coordinator waits for worker messages per loop
+
+
+def load_accounts(path=ACCOUNTS_FILE):
+    """Accounts from `path`, or the single account configured in .env."""
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return [{"session": USERNAME, "api_id": API_ID, "api_hash": API_HASH}]
+
+
+def telegram_client_factory(account):
+    """Default client factory: one TelegramClient session per account."""
+    return TelegramClient(account["session"], account["api_id"], account["api_hash"])
+
+
+async def _worker_loop(client, conn, incremental):
+    while True:
+        task = await asyncio.to_thread(conn.recv)
+        if task is None:
+            return
+        channel, attempt, shard_path, max_messages, time_limit, checkpoint_db = task
+        try:
+            await scrape(channels=[channel], client=client, incremental=incremental, dataset_path=shard_path,
+                         load=False, raise_errors=True, max_messages=max_messages, time_limit=time_limit,
+                         checkpoint_db=checkpoint_db)
+            conn.send(("done", None))
+        except Exception as e:
+            conn.send(("failed", f"{e.__class__.__name__}: {e}"))
+
+
+def _worker_main(account, client_factory, conn, incremental):
+    """Worker process: one client session; scrapes the channels the coordinator sends until None."""
+    async def run():
+        client = client_factory(account)
+        if hasattr(client, "__aenter__"):
+            async with client:
+                await _worker_loop(client, conn, incremental)
+        else:
+            await _worker_loop(client, conn, incremental)
+
+    # A fresh loop: with nest_asyncio, asyncio.run would reuse the loop inherited from the
+    # parent, whose wake-up pipe is shared with every sibling worker forked from it
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(run())
+    finally:
+        loop.close()
+
+
+def _shard_rows(path):
+    """Messages an attempt wrote to its shard (0 if it failed before writing any)."""
+    if not os.path.isdir(path):
+        return 0
+    return sum(pq.read_metadata(os.path.join(path, name)).num_rows
+               for name in os.listdir(path) if name.endswith(".parquet"))
+
+
+def _first_seen_mask(batch, seen):
+    """
+    Boolean mask of the rows of `batch` whose (Group, Message ID) is neither in `seen`
+    (channel -> sorted array of message ids) nor earlier in the batch; adds them to `seen`.
+    """
+    groups = batch.column("Group")
+    ids = batch.column("Message ID").to_numpy(zero_copy_only=False)
+    mask = np.zeros(len(ids), dtype=bool)
+    for group in pc.unique(groups).to_pylist():
+        rows = np.flatnonzero(pc.fill_null(pc.equal(groups, group), False).to_numpy(zero_copy_only=False))
+        rows = rows[np.unique(ids[rows], return_index=True)[1]]  # first row of each id
+        known = seen.get(group)
+        if known is not None:
+            rows = rows[~np.isin(ids[rows], known, assume_unique=True)]
+        mask[rows] = True
+        seen[group] = np.sort(ids[rows]) if known is None else np.union1d(known, ids[rows])
+    return mask
+
+
+def merge_shards(shard_paths, output_path, row_group_size=ROW_GROUP_SIZE):
+    """
+    Stream every shard into one dataset at `output_path`, keeping the first row seen for
+    each (Group, Message ID). Batches are filtered with a key mask and written as Arrow
+    data; only the message ids are held in memory. Returns rows written.
+    """
+    seen = {}
+    with StreamingParquetWriter(output_path, row_group_size=row_group_size) as sink:
+        for path in shard_paths:
+            if not os.path.isdir(path) or not os.listdir(path):
+                continue  # attempt failed before writing anything
+            for batch in ds.dataset(path, format="parquet").to_batches():
+                sink.append_table(batch.filter(_first_seen_mask(batch, seen)))
+    return sink.rows_written
+
+
+def scrape_sharded(channels=None, accounts=None, client_factory=telegram_client_factory,
+                   incremental=None, max_retries=SHARD_MAX_RETRIES, dataset_path=None, keep_shards=False,
+                   max_messages=None, time_limit=None):
+    """
+    Scrape `channels` across one worker process per account, each with its own session,
+    so per-account flood limits apply to each account's share only.
+
+    The coordinator keeps the work queue and hands each idle worker the next channel,
+    so fast workers take more of them.
+    A channel whose scrape raises, or whose worker process dies, is queued again (up to
+    `max_retries` extra attempts) for whichever worker is free; a dead worker is replaced.
+    Every attempt writes its own shard, and the shards are merged into one dataset
+    deduplicated by (Group, Message ID).
+    `max_messages` / `time_limit` (MAX_T_INDEX / TIME_LIMIT by default) cap the whole run:
+    each attempt is handed a share of the messages not yet scraped or promised to another
+    worker, and the time left; channels still queued once either runs out are skipped.
+    In incremental mode each attempt works on its own copy of the channel's checkpoint
+    (no two processes write one SQLite file); the copies go back into CHECKPOINT_DB once
+    the shards are merged, so checkpoints never get ahead of the merged dataset.
+    `client_factory(account)` builds each worker's client and must be picklable (a
+    module-level function), which also lets tests pass fake clients.
+    Returns (DataFrame, dataset path) like `scrape`.
+    """
+    channels = list(dict.fromkeys(channels or CHANNELS))
+    accounts = accounts or load_accounts()
+    incremental = INCREMENTAL if incremental is None else incremental
+    max_messages = MAX_T_INDEX if max_messages is None else max_messages
+    time_limit = TIME_LIMIT if time_limit is None else time_limit
+    dataset_path = dataset_path or f"{FILE_NAME}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    shards_dir = f"{dataset_path}_shards"
+    os.makedirs(shards_dir, exist_ok=True)
+
+    # Each worker has its own pipe, so a worker dying mid-write cannot wedge the others
+    workers = {}  # worker id -> (process, coordinator end of its pipe, account, task or None)
+    pending = deque()
+    attempts = {channel: 0 for channel in channels}
+    finished, failed, skipped, shard_paths = set(), {}, set(), []
+    checkpoint_files = {}  # channel -> checkpoint copy of its latest attempt
+    scraped = 0  # messages written by attempts that ended
+    next_worker_id = 0
+
+    def submit(channel):
+        shard_path = os.path.join(shards_dir, f"shard-{len(shard_paths):05}-attempt{attempts[channel]}")
+        shard_paths.append(shard_path)
+        pending.append((channel, attempts[channel], shard_path))
+
+    def checkpoint_copy(channel, shard_path):
+        """Fresh checkpoint file for one attempt, starting where the channel's last attempt (or CHECKPOINT_DB) left off."""
+        path = f"{shard_path}.checkpoints.sqlite"
+        source = CheckpointStore(checkpoint_files.get(channel, CHECKPOINT_DB), search=KEY_SEARCH)
+        target = CheckpointStore(path, search=KEY_SEARCH)
+        target.copy_from(source, channel)
+        target.flush()
+        for store in (source, target):
+            store.close()
+        checkpoint_files[channel] = path
+        return path
+
+    def in_flight_budget():
+        return sum(task[3] for _, _, _, task in workers.values() if task is not None)
+
+    def spawn(account):
+        nonlocal next_worker_id
+        conn, worker_conn = mp.Pipe()
+        process = mp.Process(target=_worker_main, name=f"telegram-shard-{next_worker_id}",
+                             args=(account, client_factory, worker_conn, incremental))
+        process.start()
+        worker_conn.close()
+        workers[next_worker_id] = (process, conn, account, None)
+        next_worker_id += 1
+
+    def retry(channel, reason):
+        attempts[channel] += 1
+        if attempts[channel] > max_retries:
+            failed[channel] = reason
+            print(f"❌ {channel}: giving up after {max_retries + 1} attempts ({reason})")
+        else:
+            print(f"🔁 {channel}: retrying ({reason})")
+            submit(channel)
+
+    start_time = time.time()
+    for channel in channels:
+        submit(channel)
+    for account in accounts[:max(1, len(channels))]:
+        spawn(account)
+
+    try:
+        while len(finished) + len(failed) + len(skipped) < len(channels):
+            # Hand queued channels to idle workers, each with its share of the run's budget
+            idle = [worker_id for worker_id, (_, _, _, task) in workers.items() if task is None]
+            for position, worker_id in enumerate(idle):
+                time_left = start_time + time_limit - time.time()
+                unpromised = max_messages - scraped - in_flight_budget()
+                if pending and (time_left <= 0 or (unpromised <= 0 and not in_flight_budget())):
+                    for channel, _, _ in pending:
+                        skipped.add(channel)
+                    print(f"⏹️ Message or time budget used up; skipping {len(pending)} queued channels")
+                    pending.clear()
+                if not pending or unpromised <= 0:
+                    break
+                channel, attempt, shard_path = pending.popleft()
+                share = -(-unpromised // (len(idle) - position))  # split what is left among the idle workers
+                task = (channel, attempt, shard_path, share, time_left,
+                        checkpoint_copy(channel, shard_path) if incremental else None)
+                process, conn, account, _ = workers[worker_id]
+                conn.send(task)
+                workers[worker_id] = (process, conn, account, task)
+
+            if not workers:
+                for channel in channels:
+                    if channel not in finished and channel not in failed and channel not in skipped:
+                        failed[channel] = "no workers left"
+                print("❌ All workers exited")
+                break
+
+            ready = wait([w[1] for w in workers.values()] + [w[0].sentinel for w in workers.values()],
+                         timeout=SHARD_POLL_INTERVAL)
+            for worker_id, (process, conn, account, task) in list(workers.items()):
+                if conn in ready:
+                    try:
+                        status, detail = conn.recv()
+                    except EOFError:
+                        status = None
+                    if status is not None:
+                        workers[worker_id] = (process, conn, account, None)
+                        scraped += _shard_rows(task[2])
+                        if status == "done":
+                            finished.add(task[0])
+                            print(f"✅ {task[0]} done by worker {worker_id} ({len(finished)}/{len(channels)})")
+                        else:
+                            retry(task[0], detail)
+                        continue
+                if process.sentinel in ready or conn in ready:
+                    # Died: requeue its channel and replace it. A worker that died idle
+                    # (e.g. bad credentials) is not replaced.
+                    process.join()
+                    conn.close()
+                    del workers[worker_id]
+                    print(f"⚠️ Worker {worker_id} exited with code {process.exitcode}")
+                    if task is not None:
+                        scraped += _shard_rows(task[2])
+                        retry(task[0], f"worker {worker_id} died")
+                        spawn(account)
+    finally:
+        for process, conn, _, _ in workers.values():
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+        for process, conn, _, _ in workers.values():
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+            conn.close()
+
+    rows = merge_shards(shard_paths, dataset_path)
+    if checkpoint_files:
+        # The merged dataset now holds every message the attempts' checkpoints cover
+        checkpoints = CheckpointStore(CHECKPOINT_DB, search=KEY_SEARCH)
+        for channel, path in checkpoint_files.items():
+            attempt_checkpoints = CheckpointStore(path, search=KEY_SEARCH)
+            checkpoints.copy_from(attempt_checkpoints, channel)
+            attempt_checkpoints.close()
+        checkpoints.flush()
+        checkpoints.close()
+    if not keep_shards:
+        shutil.rmtree(shards_dir, ignore_errors=True)
+    print(f"✅ Sharded scrape: {len(finished)}/{len(channels)} channels, {rows:05} unique messages "
+          f"in {time.time() - start_time:.1f}s across {len(accounts)} accounts → {dataset_path}")
+    if failed:
+        print(f"⚠️ Failed channels: {', '.join(failed)}")
+    if skipped:
+        print(f"⚠️ Skipped channels (budget used up): {', '.join(sorted(skipped))}")
+
+    df = read_dataset(dataset_path)
+    if FILE_FORMAT != "parquet":
+        export_excel(df, f"{dataset_path}.xlsx")
+    return df, dataset_path
+
+
+# Entry point if run directly: python -m scrapers.sharded_scraper
+if __name__ == "__main__":
+    df, path = scrape_sharded()
+    print(f"Scraping done. Dataset saved at: {path}")
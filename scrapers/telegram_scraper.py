@@ -1,13 +1,17 @@
 import os
-import re
 import time
 import json
 import asyncio
-import pandas as pd
 import nest_asyncio
 from datetime import datetime, timezone
 from telethon import TelegramClient
+from telethon.errors import FloodWaitError
 from dotenv import load_dotenv
+from utils.rate_limit import AsyncRateLimiter
+from scrapers.checkpoints import CheckpointStore
+from scrapers.parquet_sink import StreamingParquetWriter, export_excel, read_dataset
+from utils.telemetry import ProgressThrottle, telemetry
+from utils.text_normalization import clean_text
 
 # Load .env variables
 load_dotenv()
@@ -35,20 +39,17 @@ KEY_SEARCH = os.getenv("TELEGRAM_KEYWORD", "")
 MAX_T_INDEX = int(os.getenv("TELEGRAM_MAX_INDEX", "20000"))
 TIME_LIMIT = int(os.getenv("TELEGRAM_TIME_LIMIT", "21600"))  # default 6 hours
 FILE_FORMAT = os.getenv("TELEGRAM_FILE_FORMAT", "parquet").lower()  # "parquet" or "excel"
+MAX_CONCURRENCY = int(os.getenv("TELEGRAM_MAX_CONCURRENCY", "4"))  # channels fetched in parallel
+RATE_LIMIT_INTERVAL = float(os.getenv("TELEGRAM_RATE_LIMIT_INTERVAL", "1.0"))  # seconds between history requests
+FLOOD_WAIT_RETRIES = int(os.getenv("TELEGRAM_FLOOD_WAIT_RETRIES", "3"))
+PAGE_SIZE = 100  # messages telethon fetches per GetHistory request
+INCREMENTAL = os.getenv("TELEGRAM_INCREMENTAL", "false").lower() in ("1", "true", "yes")  # only fetch new messages
+CHECKPOINT_DB = os.getenv("TELEGRAM_CHECKPOINT_DB", "telegram_checkpoints.sqlite")
+ROW_GROUP_SIZE = int(os.getenv("TELEGRAM_ROW_GROUP_SIZE", "5000"))  # rows buffered before a part file is written
+PROGRESS_INTERVAL = float(os.getenv("TELEGRAM_PROGRESS_INTERVAL", "5"))  # seconds between progress printouts
 
 
 # ========= HELPERS =========
-def remove_unsupported_characters(text: str) -> str:
-    """Remove invalid XML characters from text."""
-    if not text:
-        return ""
-    valid_xml_chars = (
-        "[^\u0009\u000A\u000D\u0020-\uD7FF\uE000-\uFFFD"
-        "\U00010000-\U0010FFFF]"
-    )
-    return re.sub(valid_xml_chars, "", text)
-
-
 def format_time(seconds: int) -> str:
     """Format time in dd:hh:mm:ss format."""
     days = seconds // 86400
@@ -71,95 +72,193 @@ def print_progress(t_index, message_id, start_time, max_t_index):
     print(f"Progress: {percentage:.2f}% | Elapsed Time: {elapsed_time_str} | Remaining Time: {remaining_time_str}")
 
 
-# ========= MAIN SCRAPER =========
-async def scrape():
-    data = []
-    t_index = 0
-    start_time = time.time()
+class ScrapeBudget:
+    """Global MAX_T_INDEX / TIME_LIMIT budget shared by all channel tasks."""
 
-    for channel in CHANNELS:
-        if t_index >= MAX_T_INDEX or (time.time() - start_time) > TIME_LIMIT:
-            break
+    def __init__(self, max_items, time_limit):
+        self.max_items = max_items
+        self.time_limit = time_limit
+        self.start_time = time.time()
+        self.count = 0
 
-        try:
-            c_index = 0
-            async with TelegramClient(USERNAME, API_ID, API_HASH) as client:
-                async for message in client.iter_messages(channel, search=KEY_SEARCH):
-                    try:
-                        if DATE_MIN <= message.date <= DATE_MAX:
-                            content = remove_unsupported_characters(message.text)
-                            emoji_string = ""
-
-                            if message.reactions:
-                                for reaction_count in message.reactions.results:
-                                    emoji = reaction_count.reaction.emoticon
-                                    count = str(reaction_count.count)
-                                    emoji_string += emoji + " " + count + " "
-
-                            date_time = message.date.strftime("%Y-%m-%d %H:%M:%S")
-
-                            data.append({
-                                "Type": "text",
-                                "Group": channel,
-                                "Content": content,
-                                "Date": date_time,
-                                "Message ID": message.id,
-                                "Views": message.views,
-                                "Reactions": emoji_string,
-                                "Shares": message.forwards,
-                            })
-
-                            c_index += 1
-                            t_index += 1
-
-                            # Print progress
-                            print("-" * 80)
-                            print_progress(t_index, message.id, start_time, MAX_T_INDEX)
-                            print(f"From {channel}: {c_index:05} messages processed")
-                            print(f"ID: {message.id:05} / Date: {date_time}")
-                            print(f"Total so far: {t_index:05}")
-                            print("-" * 80)
-
-                            if t_index % 1000 == 0:
-                                backup_filename = f"backup_{FILE_NAME}_{t_index:05}_{channel}.{'parquet' if FILE_FORMAT=='parquet' else 'xlsx'}"
-                                df_backup = pd.DataFrame(data)
-                                if FILE_FORMAT == "parquet":
-                                    df_backup.to_parquet(backup_filename, index=False)
-                                else:
-                                    df_backup.to_excel(backup_filename, index=False, engine="openpyxl")
-
-                            if t_index >= MAX_T_INDEX or (time.time() - start_time) > TIME_LIMIT:
-                                break
+    def exhausted(self):
+        return self.count >= self.max_items or (time.time() - self.start_time) > self.time_limit
 
-                        elif message.date < DATE_MIN:
-                            break
 
-                    except Exception as e:
-                        print(f"Error processing message {message.id}: {e}")
+def message_reactions(message):
+    """(emoji, count) pairs of a telethon message's reactions."""
+    if not message.reactions:
+        return []
+    return [(reaction_count.reaction.emoticon, reaction_count.count) for reaction_count in message.reactions.results]
 
-            print(f"##### {channel} completed with {c_index:05} posts #####")
 
-            df = pd.DataFrame(data)
-            partial_filename = f"complete_{channel}_{FILE_NAME}_{t_index:05}.{'parquet' if FILE_FORMAT=='parquet' else 'xlsx'}"
-            if FILE_FORMAT == "parquet":
-                df.to_parquet(partial_filename, index=False)
-            else:
-                df.to_excel(partial_filename, index=False, engine="openpyxl")
+def message_to_record(message, channel):
+    """Flatten a telethon message into one output row (UTC date, reactions as an emoji -> count dict)."""
+    return {
+        "Type": "text",
+        "Group": channel,
+        "Content": clean_text(message.text),
+        "Date": message.date.astimezone(timezone.utc).replace(tzinfo=None),
+        "Message ID": message.id,
+        "Views": message.views,
+        "Reactions": dict(message_reactions(message)),
+        "Shares": message.forwards,
+    }
 
-        except Exception as e:
-            print(f"{channel} error: {e}")
 
-        time.sleep(2)  # to avoid rate limits
+# ========= MAIN SCRAPER =========
+async def scrape_channel(client, channel, sink, budget, limiter, semaphore, checkpoints=None, progress=None,
+                         raise_errors=False, window=None):
+    """
+    Scrape one channel's messages dated within `window` (date_min, date_max), by default
+    DATE_MIN..DATE_MAX, into the shared Parquet `sink`.
+    On FloodWait every channel is paused and this one resumes from the last message seen.
+    With `checkpoints`, only messages above the channel's high-water mark are fetched
+    (or, after an interrupted run, the gap it left behind).
+    Errors end the channel with a message, or are re-raised with `raise_errors`.
+    """
+    date_min, date_max = window or (DATE_MIN, DATE_MAX)
+    async with semaphore:
+        with telemetry.span("scrape.channel", channel=channel) as span:
+            c_index = 0
+            last_id, min_id = checkpoints.window(channel) if checkpoints else (0, 0)
+            retries = 0
+            finished = False
 
-    df = pd.DataFrame(data)
-    final_filename = f"FINAL_{FILE_NAME}_with_{t_index:05}.{'parquet' if FILE_FORMAT=='parquet' else 'xlsx'}"
-    if FILE_FORMAT == "parquet":
-        df.to_parquet(final_filename, index=False)
-    else:
-        df.to_excel(final_filename, index=False, engine="openpyxl")
+            try:
+                while not budget.exhausted():
+                    try:
+                        await limiter.wait()
+                        telemetry.count("telegram.get_history")
+                        fetched = 0
+                        async for message in client.iter_messages(channel, search=KEY_SEARCH, offset_id=last_id, min_id=min_id, wait_time=0):
+                            last_id = message.id
+                            fetched += 1
+                            if fetched % PAGE_SIZE == 0:
+                                await limiter.wait()
+                                telemetry.count("telegram.get_history")
+
+                            if budget.exhausted():
+                                break
 
-    print(f"✅ Saved final file: {final_filename}")
-    return df, final_filename
+                            try:
+                                if date_min <= message.date <= date_max:
+                                    # Straight into the sink's column buffers, no row dict per message
+                                    sink.append_row("text", channel, clean_text(message.text),
+                                                    message.date, message.id, message.views,
+                                                    message_reactions(message), message.forwards)
+                                    if checkpoints:
+                                        checkpoints.record(channel, message.id, message.date)
+
+                                    c_index += 1
+                                    span.add()
+                                    budget.count += 1
+                                    t_index = budget.count
+
+                                    # Print progress, at most once per PROGRESS_INTERVAL across all channels
+                                    if progress is None or progress.ready():
+                                        print("-" * 80)
+                                        print_progress(t_index, message.id, budget.start_time, MAX_T_INDEX)
+                                        print(f"From {channel}: {c_index:05} messages processed")
+                                        print(f"ID: {message.id:05} / Date: {message.date:%Y-%m-%d %H:%M:%S}")
+                                        print(f"Total so far: {t_index:05}")
+                                        print("-" * 80)
+
+                                elif message.date < date_min:
+                                    finished = True
+                                    break
+
+                            except Exception as e:
+                                print(f"Error processing message {message.id}: {e}")
+                        else:
+                            finished = True
+                        break
+
+                    except FloodWaitError as e:
+                        retries += 1
+                        if retries > FLOOD_WAIT_RETRIES:
+                            print(f"{channel} error: giving up after {FLOOD_WAIT_RETRIES} flood waits")
+                            if raise_errors:
+                                raise
+                            break
+                        print(f"⏳ {channel}: FloodWait of {e.seconds}s, pausing all channels...")
+                        limiter.penalize(e.seconds)
+
+                print(f"##### {channel} completed with {c_index:05} posts #####")
+
+                if checkpoints and finished:
+                    checkpoints.complete(channel)
+
+            except Exception as e:
+                print(f"{channel} error: {e}")
+                if raise_errors:
+                    raise
+
+
+def new_dataset_path():
+    """Default, timestamped dataset directory of a scrape."""
+    return f"{FILE_NAME}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+
+async def scrape(channels=None, client=None, incremental=None, dataset_path=None, load=True, raise_errors=False,
+                 date_min=None, date_max=None, on_part=None, max_messages=None, time_limit=None, checkpoint_db=None):
+    """
+    Scrape all channels concurrently over one shared TelegramClient session.
+    At most MAX_CONCURRENCY channels run at once; MAX_T_INDEX / TIME_LIMIT hold across all of them.
+    In incremental mode per-channel checkpoints in CHECKPOINT_DB limit each run to unseen messages.
+    Messages stream into one Parquet dataset directory (`dataset_path`, timestamped by default);
+    returns (DataFrame, dataset path), the DataFrame being None when `load` is False.
+    With `raise_errors` a failing channel raises instead of ending with an error message.
+    `date_min` / `date_max` (UTC datetimes) override TELEGRAM_DATE_MIN / TELEGRAM_DATE_MAX.
+    `on_part` is called with each part file as soon as it is written (see StreamingParquetWriter).
+    `max_messages` / `time_limit` / `checkpoint_db` override MAX_T_INDEX / TIME_LIMIT / CHECKPOINT_DB
+    (the sharded scraper hands each worker its share of the run's budget and its own checkpoint file).
+    """
+    channels = channels or CHANNELS
+    incremental = INCREMENTAL if incremental is None else incremental
+    checkpoints = CheckpointStore(checkpoint_db or CHECKPOINT_DB, search=KEY_SEARCH) if incremental else None
+    dataset_path = dataset_path or new_dataset_path()
+    # Checkpoints only advance once the rows they cover are on disk
+    sink = StreamingParquetWriter(dataset_path, row_group_size=ROW_GROUP_SIZE,
+                                  on_flush=checkpoints.flush if checkpoints else None, on_part=on_part)
+    budget = ScrapeBudget(MAX_T_INDEX if max_messages is None else max_messages,
+                          TIME_LIMIT if time_limit is None else time_limit)
+    limiter = AsyncRateLimiter(RATE_LIMIT_INTERVAL)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    progress = ProgressThrottle(PROGRESS_INTERVAL)
+    window = (date_min or DATE_MIN, date_max or DATE_MAX)
+
+    async def run_channels(active_client):
+        # Surface every FloodWait to the shared limiter instead of sleeping inside one task
+        active_client.flood_sleep_threshold = 0
+        await asyncio.gather(*(
+            scrape_channel(active_client, channel, sink, budget, limiter, semaphore, checkpoints, progress, raise_errors,
+                           window)
+            for channel in channels
+        ))
+
+    try:
+        with telemetry.span("scrape", channels=len(channels)) as span:
+            if client is None:
+                async with TelegramClient(USERNAME, API_ID, API_HASH) as client:
+                    await run_channels(client)
+            else:
+                await run_channels(client)
+            span.add(budget.count)
+    finally:
+        sink.close()
+        if checkpoints:
+            checkpoints.close()
+
+    print(f"✅ Saved final dataset: {dataset_path} ({sink.rows_written:05} messages)")
+    if not load:
+        return None, dataset_path
+
+    df = read_dataset(dataset_path)
+    if FILE_FORMAT != "parquet":
+        export_excel(df, f"{dataset_path}.xlsx")
+        print(f"✅ Exported Excel copy: {dataset_path}.xlsx")
+    return df, dataset_path
 
 
 # Entry point if run directly
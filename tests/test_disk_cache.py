@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+import utils.disk_cache as disk_cache
+from utils.disk_cache import DiskCache
+
+
+def accessed_at(cache, key):
+    return cache.conn.execute("SELECT accessed_at FROM cache WHERE key = ?", (key,)).fetchone()[0]
+
+
+def test_hits_are_written_in_batches(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache.sqlite"), access_flush_every=3)
+    for key in "abc":
+        cache.set(key, key)
+    changes = cache.conn.total_changes
+
+    assert cache.get("a") == "a" and cache.get("b") == "b"
+    assert cache.conn.total_changes == changes  # two hits, nothing written yet
+    cache.get("c")
+    assert cache.conn.total_changes == changes + 3  # the third one writes all three
+    cache.close()
+
+
+def test_eviction_sees_pending_access_times(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    cache.set("old", 1)
+    cache.set("new", 2)
+    cache.get("old")  # now the most recently used, only in memory so far
+    cache.set("newest", 3)
+
+    assert cache.get("old") == 1
+    assert cache.get("new") is None
+    cache.close()
+
+
+def test_access_times_are_written_on_close(tmp_path, monkeypatch):
+    now = [1_000.0]
+    monkeypatch.setattr(disk_cache, "time", SimpleNamespace(time=lambda: now[0]))
+    path = str(tmp_path / "cache.sqlite")
+    cache = DiskCache(path)
+    cache.set("a", 1)
+    now[0] += 10
+    cache.get("a")
+    assert accessed_at(cache, "a") == 1_000.0
+    cache.close()
+
+    reopened = DiskCache(path)
+    assert accessed_at(reopened, "a") == 1_010.0
+    reopened.close()
@@ -0,0 +1,138 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+import utils.disk_cache as disk_cache
+from benchmarks.fixtures import FakeExa
+from utils.disk_cache import DiskCache
+from utils.exa_helpers import cross_validate_with_exa, cross_validate_with_exa_async, search_cyber_threat_hits
+
+
+class ApiError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"Request failed with status code {status_code}")
+        self.status_code = status_code
+
+
+class FlakyExa(FakeExa):
+    """FakeExa that answers the first `failures` calls with HTTP `status`."""
+
+    def __init__(self, failures, status=429):
+        super().__init__()
+        self.failures = failures
+        self.status = status
+        self.attempts = 0
+
+    def search_and_contents(self, query, summary=True, **kwargs):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise ApiError(self.status)
+        return super().search_and_contents(query, summary=summary, **kwargs)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = DiskCache(str(tmp_path / "exa_cache.sqlite"), ttl=3600)
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def backoff_sleeps(monkeypatch):
+    """Record the retry backoff delays instead of sleeping them."""
+    delays = []
+    sleep = asyncio.sleep
+
+    async def fake_sleep(delay, *args, **kwargs):
+        delays.append(delay)
+        await sleep(0)
+
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+    monkeypatch.setattr("utils.exa_helpers.random.uniform", lambda a, b: 0.0)
+    return delays
+
+
+def test_repeated_query_is_served_from_cache(cache):
+    client = FakeExa()
+    first = search_cyber_threat_hits("LockBit targets hospitals", client=client, cache=cache)
+    second = search_cyber_threat_hits("  lockbit   TARGETS hospitals ", client=client, cache=cache)
+
+    assert client.calls == 1
+    assert second == first
+    assert len(first) == 5
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_other_query_or_date_misses_cache(cache):
+    client = FakeExa()
+    search_cyber_threat_hits("LockBit targets hospitals", client=client, cache=cache)
+    search_cyber_threat_hits("Qakbot returns", client=client, cache=cache)
+    search_cyber_threat_hits("LockBit targets hospitals", client=client, cache=cache, start_published_date="2025-09-01")
+
+    assert client.calls == 3
+
+
+def test_cache_entry_expires_after_ttl(tmp_path, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(disk_cache, "time", SimpleNamespace(time=lambda: now[0]))
+    cache = DiskCache(str(tmp_path / "exa_cache.sqlite"), ttl=60)
+    client = FakeExa()
+
+    search_cyber_threat_hits("LockBit targets hospitals", client=client, cache=cache)
+    now[0] += 59
+    search_cyber_threat_hits("LockBit targets hospitals", client=client, cache=cache)
+    assert client.calls == 1
+
+    now[0] += 2
+    search_cyber_threat_hits("LockBit targets hospitals", client=client, cache=cache)
+    assert client.calls == 2
+    cache.close()
+
+
+def test_duplicate_messages_are_searched_once(cache):
+    client = FakeExa()
+    messages = ["New Akira campaign", "new  AKIRA campaign", "Patch FortiOS now"]
+    validated = cross_validate_with_exa(messages, client=client, cache=cache)
+
+    assert client.calls == 2
+    assert [record["message"] for record in validated] == messages
+    assert all(record["status"] == "Known Threat" for record in validated)
+
+
+def test_async_validation_retries_429_with_backoff(cache, backoff_sleeps):
+    client = FlakyExa(failures=2)
+    validated = asyncio.run(cross_validate_with_exa_async(["New Akira campaign"], rate_limit=1000,
+                                                          max_retries=3, client=client, cache=cache))
+
+    assert client.attempts == 3
+    assert backoff_sleeps == [1, 2]
+    assert validated[0]["status"] == "Known Threat"
+
+
+def test_async_validation_gives_up_after_max_retries(cache, backoff_sleeps):
+    client = FlakyExa(failures=10)
+    validated = asyncio.run(cross_validate_with_exa_async(["New Akira campaign"], rate_limit=1000,
+                                                          max_retries=2, client=client, cache=cache))
+
+    assert client.attempts == 3
+    assert backoff_sleeps == [1, 2]
+    assert validated[0]["status"] == "Early Signal"
+
+
+def test_async_validation_does_not_retry_client_errors(cache, backoff_sleeps):
+    client = FlakyExa(failures=1, status=400)
+    validated = asyncio.run(cross_validate_with_exa_async(["New Akira campaign"], rate_limit=1000,
+                                                          client=client, cache=cache))
+
+    assert client.attempts == 1
+    assert backoff_sleeps == []
+    assert validated[0]["status"] == "Early Signal"
+
+
+def test_async_validation_does_not_retry_timeouts(cache, backoff_sleeps):
+    client = FakeExa(latency=0.3)
+    validated = asyncio.run(cross_validate_with_exa_async(["New Akira campaign"], rate_limit=1000,
+                                                          timeout=0.05, client=client, cache=cache))
+
+    assert client.calls == 1
+    assert backoff_sleeps == []
+    assert validated[0]["status"] == "Early Signal"
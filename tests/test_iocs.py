@@ -0,0 +1,31 @@
+import pytest
+from utils.iocs import extract_iocs
+
+
+@pytest.mark.parametrize("text", [
+    "Update to version 1.2.3.4 now",
+    "fixed in v1.2.3.4",
+    "fixed in v. 8.8.8.8",
+    "Chrome ver 8.8.4.4 is affected",
+])
+def test_version_numbers_are_not_ips(text):
+    assert not [value for kind, value in extract_iocs(text) if kind == "ipv4"]
+
+
+def test_ips_are_extracted():
+    assert extract_iocs("C2 at 8.8.8.8 and 1[.]1[.]1[.]1") == [("ipv4", "1.1.1.1"), ("ipv4", "8.8.8.8")]
+
+
+@pytest.mark.parametrize("text", [
+    "Built with ASP.NET and VB.NET",
+    "dropped payload.exe via loader.php and main.js",
+    "see config.yaml",
+])
+def test_product_and_file_names_are_not_domains(text):
+    assert not [value for kind, value in extract_iocs(text) if kind == "domain"]
+
+
+def test_domains_need_a_known_tld_unless_defanged():
+    iocs = extract_iocs("Phishing on evil-login.com, update.xyz and mirror.onion; payload at bad[.]exe")
+    assert [value for kind, value in iocs if kind == "domain"] == ["bad.exe", "evil-login.com", "mirror.onion",
+                                                                   "update.xyz"]
@@ -0,0 +1,37 @@
+import pandas as pd
+import pytest
+from ml.cti_classifier import CTI_KEYWORDS
+from ml.keyword_matcher import KeywordMatcher
+from utils.text_normalization import clean_text
+
+
+@pytest.fixture
+def matcher():
+    return KeywordMatcher(CTI_KEYWORDS)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("new attacks reported", ["attack"]),
+    ("exploits in the wild", ["exploit"]),
+    ("patches released", ["patch"]),
+    ("data breaches", ["breach"]),
+    ("botnets grow", ["botnet"]),
+    ("actively exploited and attacking", ["exploit", "attack"]),
+    ("APT29 and CVE-2025-1234", ["APT", "CVE"]),
+    ("critical vulnerabilities fixed", ["vulnerabilities"]),
+])
+def test_inflected_keywords_match(matcher, text, expected):
+    assert matcher.find(text) == expected
+    assert matcher.find(clean_text(text).lower(), normalized=True) == expected
+
+
+@pytest.mark.parametrize("text", ["teams adapt quickly", "dispatch the order", "attackers' merch", "patchwork quilt"])
+def test_keywords_inside_other_words_do_not_match(matcher, text):
+    assert not matcher.is_match(text)
+
+
+def test_match_series_reports_canonical_keywords(matcher):
+    is_cti, found = matcher.match_series(pd.Series(["Ransomware attacks hit hospitals", "adapt or perish", None]))
+
+    assert is_cti.tolist() == [True, False, False]
+    assert found.tolist() == [["ransomware", "attack"], [], []]
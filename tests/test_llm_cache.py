@@ -0,0 +1,22 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.llm_cache import CachedLLM
+
+
+def test_lazy_cache_is_opened_once_across_threads():
+    opened = []
+    lock = threading.Lock()
+
+    def open_cache():
+        time.sleep(0.05)  # slow enough for every thread to see the factory
+        with lock:
+            opened.append(object())
+        return opened[-1]
+
+    llm = CachedLLM(model="gpt-4o-mini", cache=open_cache)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        caches = list(pool.map(lambda _: llm.cache, range(8)))
+
+    assert len(opened) == 1
+    assert all(cache is opened[0] for cache in caches)
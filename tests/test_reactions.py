@@ -0,0 +1,43 @@
+import pyarrow as pa
+from ml.near_duplicates import deduplicate_messages
+from ml.ranking import score_messages
+from scrapers.parquet_sink import MESSAGE_SCHEMA
+from utils.cti_store import CTIStore
+
+REACTIONS_TYPE = MESSAGE_SCHEMA.field("Reactions").type
+
+
+def scored_frame():
+    return pa.table({
+        "Group": ["@a", "@b", "@a"],
+        "Content": ["LockBit hits a hospital in Ohio today", "LockBit hits a hospital in Ohio today!", "Patch FortiOS"],
+        "Views": [10, 5, 1],
+        "Reactions": pa.array([[("👍", 2)], [("👍", 3), ("🔥", 1)], []], REACTIONS_TYPE),
+    }).to_pandas()
+
+
+def test_dedup_merges_reactions_as_a_map():
+    deduped = deduplicate_messages(scored_frame())
+
+    assert deduped["Reactions"].tolist() == [[("👍", 5), ("🔥", 1)], []]
+    # Still the map column's form: writes back to Parquet as map<string, int64>
+    column = pa.Table.from_pandas(deduped[["Reactions"]], schema=pa.schema([MESSAGE_SCHEMA.field("Reactions")]),
+                                  preserve_index=False).column("Reactions")
+    assert column.type == REACTIONS_TYPE
+
+
+def test_ranking_counts_map_reactions():
+    scored = score_messages(scored_frame().assign(Views=0))
+    assert scored["Score_Engagement"].iloc[0] < scored["Score_Engagement"].iloc[1]
+    assert scored["Score_Engagement"].iloc[2] == 0
+
+
+def test_store_keeps_reactions_as_json_map():
+    with CTIStore(":memory:") as store:
+        store.ingest_records([
+            {"Group": "@a", "Message ID": 1, "Content": "LockBit", "Reactions": [("👍", 3), ("🔥", 1)]},
+            {"Group": "@a", "Message ID": 2, "Content": "FortiOS", "Reactions": "❤️ 2 "},
+        ])
+        stored = dict(store.conn.execute("SELECT message_id, reactions FROM messages").fetchall())
+        assert stored == {1: '{"👍": 3, "🔥": 1}', 2: '{"❤️": 2}'}
+        assert {row["message_id"]: row["reactions"] for row in store.search()} == {1: {"👍": 3, "🔥": 1}, 2: {"❤️": 2}}
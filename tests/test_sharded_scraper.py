@@ -0,0 +1,89 @@
+import os
+import pytest
+import scrapers.sharded_scraper as sharded_scraper
+import scrapers.telegram_scraper as telegram_scraper
+from benchmarks.fixtures import FakeTelegramClient
+from scrapers.checkpoints import CheckpointStore
+from scrapers.sharded_scraper import scrape_sharded
+
+MESSAGES_PER_CHANNEL = 250
+CHANNELS = ["@alpha", "@bravo", "@charlie", "@flaky"]
+
+
+class FlakyTelegramClient(FakeTelegramClient):
+    """Fails @flaky's first attempt (across all workers) after 150 messages, once some parts are written."""
+
+    def __init__(self, marker_dir, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.marker_dir = marker_dir
+
+    async def iter_messages(self, channel, *args, **kwargs):
+        marker = os.path.join(self.marker_dir, channel.lstrip("@"))
+        fail = channel == "@flaky" and not os.path.exists(marker)
+        served = 0
+        async for message in super().iter_messages(channel, *args, **kwargs):
+            if fail and served == 150:
+                open(marker, "w").close()
+                raise ConnectionError("connection reset by peer")
+            served += 1
+            yield message
+
+
+def fake_client_factory(account):
+    # Module-level, so worker processes can be given it
+    return FlakyTelegramClient(account["marker_dir"], MESSAGES_PER_CHANNEL,
+                               telegram_scraper.DATE_MIN, telegram_scraper.DATE_MAX)
+
+
+@pytest.fixture
+def accounts(tmp_path, monkeypatch):
+    monkeypatch.setattr(telegram_scraper, "RATE_LIMIT_INTERVAL", 0.0)
+    monkeypatch.setattr(telegram_scraper, "ROW_GROUP_SIZE", 50)
+    monkeypatch.setattr(telegram_scraper, "PROGRESS_INTERVAL", 3600)
+    return [{"session": name, "marker_dir": str(tmp_path)} for name in ("account-1", "account-2")]
+
+
+def test_sharded_scrape_yields_unique_rows_and_retries_failed_channel(tmp_path, accounts):
+    df, path = scrape_sharded(channels=CHANNELS, accounts=accounts, client_factory=fake_client_factory,
+                              incremental=False, max_retries=1, dataset_path=str(tmp_path / "dataset"))
+
+    assert path == str(tmp_path / "dataset")
+    assert os.path.exists(tmp_path / "flaky")  # the first @flaky attempt did fail
+    assert not df.duplicated(["Group", "Message ID"]).any()
+    assert len(df) == len(CHANNELS) * MESSAGES_PER_CHANNEL
+    assert df.groupby("Group")["Message ID"].nunique().to_dict() == {channel: MESSAGES_PER_CHANNEL for channel in CHANNELS}
+    assert not os.path.exists(f"{path}_shards")
+
+
+def test_channel_failing_past_max_retries_keeps_partial_rows_only(tmp_path, accounts):
+    df, _ = scrape_sharded(channels=CHANNELS, accounts=accounts, client_factory=fake_client_factory,
+                           incremental=False, max_retries=0, dataset_path=str(tmp_path / "dataset"))
+
+    counts = df.groupby("Group")["Message ID"].nunique().to_dict()
+    assert not df.duplicated(["Group", "Message ID"]).any()
+    assert counts["@flaky"] == 150  # flushed before the failure, no retry
+    assert all(counts[channel] == MESSAGES_PER_CHANNEL for channel in CHANNELS if channel != "@flaky")
+
+
+def test_message_cap_holds_across_workers(tmp_path, accounts):
+    df, _ = scrape_sharded(channels=CHANNELS, accounts=accounts, client_factory=fake_client_factory,
+                           incremental=False, max_retries=1, dataset_path=str(tmp_path / "dataset"),
+                           max_messages=600)
+
+    assert 0 < len(df) <= 600
+    assert not df.duplicated(["Group", "Message ID"]).any()
+
+
+def test_incremental_run_checkpoints_through_the_coordinator(tmp_path, accounts, monkeypatch):
+    monkeypatch.setattr(sharded_scraper, "CHECKPOINT_DB", str(tmp_path / "checkpoints.sqlite"))
+    first, _ = scrape_sharded(channels=CHANNELS, accounts=accounts, client_factory=fake_client_factory,
+                              incremental=True, max_retries=1, dataset_path=str(tmp_path / "first"))
+    second, _ = scrape_sharded(channels=CHANNELS, accounts=accounts, client_factory=fake_client_factory,
+                               incremental=True, max_retries=1, dataset_path=str(tmp_path / "second"))
+
+    assert len(first) == len(CHANNELS) * MESSAGES_PER_CHANNEL
+    assert len(second) == 0  # every channel's high-water mark made it back into CHECKPOINT_DB
+    store = CheckpointStore(str(tmp_path / "checkpoints.sqlite"))
+    high_water_marks = {channel: store.get(channel)["last_message_id"] for channel in CHANNELS}
+    assert high_water_marks == dict.fromkeys(CHANNELS, MESSAGES_PER_CHANNEL)
+    store.close()
@@ -0,0 +1,51 @@
+from datetime import datetime
+import pyarrow.parquet as pq
+import pytest
+import ml.batch_scoring as batch_scoring
+import ml.streaming_trainer as streaming_trainer
+from ml.cti_classifier import KeywordFallbackModel
+from scrapers.parquet_sink import StreamingParquetWriter, read_dataset
+from utils.text_normalization import NORMALIZED_COLUMN, normalize_text
+
+TEXTS = ["LockBit Ransomware hits Hospitals\x0b", "Weekly DevOps Tips", None]
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = str(tmp_path / "dataset")
+    with StreamingParquetWriter(path, row_group_size=2) as sink:
+        for message_id, text in enumerate(TEXTS, 1):
+            sink.append_row("text", "@a", text, datetime(2025, 9, 1), message_id, 10, [], 0)
+    return path
+
+
+def test_sink_writes_normalized_column_once(dataset):
+    df = read_dataset(dataset)
+    assert df[NORMALIZED_COLUMN].tolist() == [normalize_text(text) for text in TEXTS]
+
+
+def test_scoring_reads_the_stored_column(dataset, tmp_path, monkeypatch):
+    def no_normalizing(texts):
+        raise AssertionError("scoring normalized again")
+
+    monkeypatch.setattr(batch_scoring, "normalize_texts", no_normalizing)
+    fallback = KeywordFallbackModel()
+    monkeypatch.setattr(batch_scoring, "get_model", lambda: (fallback, fallback))
+    output = str(tmp_path / "scored.parquet")
+    batch_scoring.score_parquet(dataset, output, workers=1)
+
+    scored = pq.read_table(output)
+    assert scored.column(NORMALIZED_COLUMN).to_pylist() == [normalize_text(text) for text in TEXTS]
+    assert scored.column("Predicted_Label").to_pylist()[0] == "CTI"
+
+
+def test_streaming_training_reads_the_stored_column(dataset, tmp_path, monkeypatch):
+    def no_normalizing(texts):
+        raise AssertionError("training normalized again")
+
+    monkeypatch.setattr(streaming_trainer, "normalize_texts", no_normalizing)
+    monkeypatch.setattr(streaming_trainer, "STREAMING_DIR", str(tmp_path / "streaming"))
+    monkeypatch.setattr(streaming_trainer, "STATE_PATH", str(tmp_path / "streaming" / "state.json"))
+    monkeypatch.setattr(streaming_trainer.model_lifecycle, "MODELS_DIR", str(tmp_path / "models"))
+
+    assert streaming_trainer.train_streaming(dataset, warm_start=False) is not None
@@ -0,0 +1,433 @@
+import json
+import os
+import re
+import sqlite3
+import time
+from datetime import date, datetime
+import pandas as pd
+import pyarrow.dataset as ds
+from utils.iocs import IOC_TYPES, extract_iocs
+from utils.reactions import parse_reactions
+from utils.telemetry import telemetry
+
+STORE_PATH = os.getenv("CTI_STORE_PATH", "cti_store.sqlite")
+# Opt-in: "true" makes main.py load each scored scrape into the store
+STORE_INGEST = os.getenv("CTI_STORE_INGEST", "false").lower() in ("1", "true", "yes")
+INGEST_BATCH_SIZE = 10000
+
+_MESSAGE_COLUMNS = {
+    "Group": "channel", "Message ID": "message_id", "Date": "date", "Type": "type", "Content": "content",
+    "Views": "views", "Shares": "shares", "Reactions": "reactions",
+    "Predicted_Label": "label", "CTI_Probability": "cti_probability",
+}
+_RESULT_COLUMNS = ("id", "channel", "message_id", "date", "type", "content", "views", "shares", "reactions",
+                   "label", "cti_probability", "source")
+
+
+def _timestamp(value):
+    """Query bound in the stored format ("%Y-%m-%d %H:%M:%S", UTC) from a str, date or datetime."""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, date):
+        return value.strftime("%Y-%m-%d")
+    raise TypeError(f"Unsupported date bound: {value!r}")
+
+
+# FTS5 query syntax kept as written: "phrases", parentheses, operators, plain words and prefixes (word*)
+_FTS_TOKEN_RE = re.compile(r'"[^"]*"|[()]|[^\s()"]+')
+_FTS_KEEP_RE = re.compile(r'"[^"]*"|[()]|AND|OR|NOT|\w+\*?', re.UNICODE)
+
+
+def _fts_query(text):
+    """
+    `text` as an FTS5 query with every bare term that is not a plain word quoted, so
+    "CVE-2024-3400" or "evil.com" are searched as phrases instead of parsed as syntax.
+    """
+    return " ".join(token if _FTS_KEEP_RE.fullmatch(token) else '"' + token.replace('"', '""') + '"'
+                    for token in _FTS_TOKEN_RE.findall(text))
+
+
+def _single_ioc(text):
+    """The indicator value if `text` is exactly one indicator (CVE id, hash, IP or domain), else None."""
+    iocs = extract_iocs(text.strip())
+    if len(iocs) == 1 and iocs[0][1].lower() == text.strip().lower():
+        return iocs[0][1]
+    return None
+
+
+def _date_text(value):
+    """Stored form of a post date: datasets hold native timestamps, older ones and Excel copies strings."""
+    if value is None or value != value:  # None, NaN or NaT
+        return None
+    return value.strftime("%Y-%m-%d %H:%M:%S") if isinstance(value, datetime) else str(value)
+
+
+def _reactions_json(value):
+    """Reactions in any form `parse_reactions` accepts, stored as a JSON emoji -> count object."""
+    return json.dumps(parse_reactions(value), ensure_ascii=False)
+
+
+def _reactions_value(text):
+    """Stored reactions back as a dict (rows stored before JSON hold the "👍 12 🔥 3 " text form)."""
+    if text and text.startswith("{"):
+        return json.loads(text)
+    return parse_reactions(text)
+
+
+def _int(value):
+    return None if value is None or pd.isna(value) else int(value)
+
+
+class CTIStore:
+    """
+    Persistent, indexed store of scraped messages and the indicators found in them, on SQLite.
+
+    messages       one row per (channel, message_id); indexed by date and by (channel, date)
+    messages_fts   FTS5 full-text index over `content`, kept in sync by triggers
+    iocs           (type, value, message) for every CVE id, hash, IPv4 and domain in a
+                   message, keyed by value so indicator lookups never scan messages
+
+    Re-ingesting a message updates its engagement counts and label (keeping a label it
+    already had when the new row has none) and re-extracts its indicators.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY,
+                channel TEXT NOT NULL,
+                message_id INTEGER NOT NULL,
+                date TEXT,
+                type TEXT,
+                content TEXT,
+                views INTEGER,
+                shares INTEGER,
+                reactions TEXT,  -- JSON object, emoji -> count
+                label TEXT,
+                cti_probability REAL,
+                source TEXT,
+                UNIQUE (channel, message_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_messages_date ON messages (date);
+            CREATE INDEX IF NOT EXISTS idx_messages_channel_date ON messages (channel, date);
+
+            CREATE TABLE IF NOT EXISTS iocs (
+                type TEXT NOT NULL,
+                value TEXT NOT NULL,
+                message INTEGER NOT NULL REFERENCES messages (id),
+                PRIMARY KEY (value, type, message)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_iocs_message ON iocs (message);
+            CREATE INDEX IF NOT EXISTS idx_iocs_type ON iocs (type, value);
+
+            CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts
+                USING fts5 (content, content='messages', content_rowid='id');
+            CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+                INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+            END;
+            CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+                INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+            END;
+            CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+                INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+                INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+            END;
+        """)
+        self.conn.commit()
+
+    # ---------- ingestion ----------
+
+    def ingest_records(self, records, source=None):
+        """
+        Upsert scraped rows (the scraper's column names, optionally with prediction columns)
+        in one transaction. Returns rows stored.
+        """
+        rows, found = [], []
+        for record in records:
+            values = {column: record.get(name) for name, column in _MESSAGE_COLUMNS.items()}
+            message_id = _int(values["message_id"])
+            if values["channel"] is None or message_id is None:
+                continue
+            content = values["content"] if isinstance(values["content"], str) else ""
+            probability = values["cti_probability"]
+            rows.append((values["channel"], message_id, _date_text(values["date"]), values["type"], content,
+                         _int(values["views"]), _int(values["shares"]),
+                         _reactions_json(values["reactions"]), values["label"],
+                         None if probability is None or pd.isna(probability) else float(probability), source))
+            found.append(extract_iocs(content))
+        if not rows:
+            return 0
+
+        with self.conn:
+            self.conn.executemany(
+                """
+                INSERT INTO messages
+                    (channel, message_id, date, type, content, views, shares, reactions, label, cti_probability, source)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (channel, message_id) DO UPDATE SET
+                    date = excluded.date,
+                    content = excluded.content,
+                    views = excluded.views,
+                    shares = excluded.shares,
+                    reactions = excluded.reactions,
+                    label = COALESCE(excluded.label, label),
+                    cti_probability = COALESCE(excluded.cti_probability, cti_probability),
+                    source = excluded.source
+                """,
+                rows,
+            )
+            # Map the batch back to row ids in one join instead of one lookup per message
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS ingest_keys (position INTEGER PRIMARY KEY, "
+                              "channel TEXT, message_id INTEGER)")
+            self.conn.execute("DELETE FROM ingest_keys")
+            self.conn.executemany("INSERT INTO ingest_keys VALUES (?, ?, ?)",
+                                  [(position, row[0], row[1]) for position, row in enumerate(rows)])
+            ids = dict(self.conn.execute(
+                "SELECT k.position, m.id FROM ingest_keys k "
+                "JOIN messages m ON m.channel = k.channel AND m.message_id = k.message_id"
+            ).fetchall())
+            self.conn.execute("DELETE FROM iocs WHERE message IN (SELECT m.id FROM ingest_keys k "
+                              "JOIN messages m ON m.channel = k.channel AND m.message_id = k.message_id)")
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO iocs (type, value, message) VALUES (?, ?, ?)",
+                [(kind, value, ids[position]) for position, pairs in enumerate(found) for kind, value in pairs],
+            )
+        return len(rows)
+
+    def ingest_dataframe(self, df, source=None):
+        return self.ingest_records(df.to_dict("records"), source=source)
+
+    def ingest_file(self, path, batch_size=INGEST_BATCH_SIZE):
+        """
+        Load a Parquet file / dataset directory (streamed batch by batch) or an Excel export
+        into the store. Returns rows stored.
+        """
+        source = os.path.abspath(path)
+        start_time = time.time()
+        rows = 0
+        with telemetry.span("store.ingest") as span:
+            if path.endswith((".xlsx", ".xls")):
+                rows = self.ingest_dataframe(pd.read_excel(path), source=source)
+            else:
+                for batch in ds.dataset(path, format="parquet").to_batches(batch_size=batch_size):
+                    rows += self.ingest_records(batch.to_pylist(), source=source)
+            span.add(rows)
+        print(f"🗃️ Stored {rows:,} messages from {path} in {time.time() - start_time:.1f}s → {self.path}")
+        return rows
+
+    # ---------- queries ----------
+
+    def _query(self, sql, params):
+        cursor = self.conn.execute(sql, params)
+        columns = [description[0] for description in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        if "reactions" in columns:
+            for row in rows:
+                row["reactions"] = _reactions_value(row["reactions"])
+        return rows
+
+    def search(self, text=None, ioc=None, ioc_type=None, channel=None, since=None, until=None, label=None,
+               limit=100):
+        """
+        Messages matching every given filter, newest first.
+
+        text      FTS5 query over the content ("lockbit", "ransomware AND healthcare", '"zero day"');
+                  terms like CVE-2024-3400 are searched as phrases, and a lone indicator is
+                  looked up in the indicator table instead. ValueError on invalid query syntax
+        ioc       exact indicator value (CVE ids are matched case-insensitively), optionally of `ioc_type`
+        channel   channel name or list of names
+        since     inclusive lower bound on the post date (str "YYYY-MM-DD[ HH:MM:SS]", date or datetime, UTC)
+        until     exclusive upper bound, same forms
+        label     "CTI" / "Non-CTI"
+        """
+        joins, where, params = [], [], []
+        if text and not ioc and _single_ioc(text):
+            text, ioc = None, _single_ioc(text)
+        if text:
+            joins.append("JOIN messages_fts ON messages_fts.rowid = m.id")
+            where.append("messages_fts MATCH ?")
+            params.append(_fts_query(text))
+        if ioc:
+            joins.append("JOIN iocs ON iocs.message = m.id")
+            where.append("iocs.value = ?")
+            params.append(ioc.upper() if ioc.upper().startswith("CVE-") else ioc.lower())
+            if ioc_type:
+                where.append("iocs.type = ?")
+                params.append(ioc_type)
+        if channel:
+            channels = [channel] if isinstance(channel, str) else list(channel)
+            where.append(f"m.channel IN ({', '.join('?' * len(channels))})")
+            params.extend(channels)
+        if since:
+            where.append("m.date >= ?")
+            params.append(_timestamp(since))
+        if until:
+            where.append("m.date < ?")
+            params.append(_timestamp(until))
+        if label:
+            where.append("m.label = ?")
+            params.append(label)
+
+        sql = f"SELECT DISTINCT {', '.join('m.' + c for c in _RESULT_COLUMNS)} FROM messages m {' '.join(joins)}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY m.date DESC LIMIT ?"
+        try:
+            return self._query(sql, params + [limit])
+        except sqlite3.OperationalError as e:
+            if text:
+                raise ValueError(f"Invalid full-text query {text!r}: {e}") from None
+            raise
+
+    def channels_mentioning(self, ioc, since=None, until=None):
+        """Channels that posted `ioc`, with how often and when first / last, most mentions first."""
+        where, params = ["iocs.value = ?"], [ioc.upper() if ioc.upper().startswith("CVE-") else ioc.lower()]
+        if since:
+            where.append("m.date >= ?")
+            params.append(_timestamp(since))
+        if until:
+            where.append("m.date < ?")
+            params.append(_timestamp(until))
+        return self._query(
+            f"""
+            SELECT m.channel, COUNT(*) AS mentions, MIN(m.date) AS first_seen, MAX(m.date) AS last_seen
+            FROM iocs JOIN messages m ON m.id = iocs.message
+            WHERE {' AND '.join(where)}
+            GROUP BY m.channel ORDER BY mentions DESC, last_seen DESC
+            """,
+            params,
+        )
+
+    def top_iocs(self, ioc_type=None, since=None, until=None, limit=20):
+        """Most mentioned indicators (optionally of one type / in a date range), with the channels citing them."""
+        where, params = [], []
+        if ioc_type:
+            if ioc_type not in IOC_TYPES:
+                raise ValueError(f"Unknown IOC type {ioc_type!r}; expected one of {', '.join(IOC_TYPES)}")
+            where.append("iocs.type = ?")
+            params.append(ioc_type)
+        if since:
+            where.append("m.date >= ?")
+            params.append(_timestamp(since))
+        if until:
+            where.append("m.date < ?")
+            params.append(_timestamp(until))
+        return self._query(
+            f"""
+            SELECT iocs.type, iocs.value, COUNT(*) AS mentions, COUNT(DISTINCT m.channel) AS channels,
+                   MAX(m.date) AS last_seen
+            FROM iocs JOIN messages m ON m.id = iocs.message
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+            GROUP BY iocs.type, iocs.value ORDER BY mentions DESC LIMIT ?
+            """,
+            params + [limit],
+        )
+
+    def iocs_for(self, message):
+        """(type, value) pairs extracted from the stored message with id `message`."""
+        return self.conn.execute("SELECT type, value FROM iocs WHERE message = ? ORDER BY type, value",
+                                 (message,)).fetchall()
+
+    def stats(self):
+        messages, channels, first, last = self.conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT channel), MIN(date), MAX(date) FROM messages").fetchone()
+        by_type = dict(self.conn.execute("SELECT type, COUNT(DISTINCT value) FROM iocs GROUP BY type").fetchall())
+        return {"messages": messages, "channels": channels, "first_date": first, "last_date": last, "iocs": by_type}
+
+    def optimize(self):
+        """Merge the full-text index segments and refresh planner statistics (after large loads)."""
+        self.conn.execute("INSERT INTO messages_fts (messages_fts) VALUES ('optimize')")
+        self.conn.execute("ANALYZE")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _print_rows(rows, content_width=120):
+    for row in rows:
+        if "content" in row:
+            content = (row["content"] or "").replace("\n", " ")[:content_width]
+            label = f" [{row['label']}]" if row.get("label") else ""
+            print(f"{row['date']}  {row['channel']} #{row['message_id']}{label}  {content}")
+        else:
+            print("  ".join(f"{key}={value}" for key, value in row.items()))
+    print(f"({len(rows)} rows)")
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local CTI store: ingest scraped datasets and query them.")
+    parser.add_argument("--db", default=STORE_PATH, help="store path (CTI_STORE_PATH)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="load Parquet datasets / files or Excel exports")
+    ingest.add_argument("paths", nargs="+")
+
+    def add_range(command):
+        command.add_argument("--since", help="inclusive, YYYY-MM-DD[ HH:MM:SS] (UTC)")
+        command.add_argument("--until", help="exclusive, YYYY-MM-DD[ HH:MM:SS] (UTC)")
+
+    search = commands.add_parser("search", help="messages by full-text query and / or filters")
+    search.add_argument("text", nargs="?", help="FTS5 query, e.g. 'lockbit AND ransomware'")
+    search.add_argument("--ioc")
+    search.add_argument("--channel", action="append")
+    search.add_argument("--label", choices=["CTI", "Non-CTI"])
+    search.add_argument("--limit", type=int, default=20)
+    add_range(search)
+
+    ioc = commands.add_parser("ioc", help="channels that mentioned an indicator")
+    ioc.add_argument("value")
+    add_range(ioc)
+
+    top = commands.add_parser("top", help="most mentioned indicators")
+    top.add_argument("type", nargs="?", choices=IOC_TYPES)
+    top.add_argument("--limit", type=int, default=20)
+    add_range(top)
+
+    commands.add_parser("stats", help="store size and indicator counts")
+    commands.add_parser("optimize", help="compact the full-text index after large loads")
+    args = parser.parse_args(argv)
+
+    with CTIStore(args.db) as store:
+        start_time = time.perf_counter()
+        if args.command == "ingest":
+            for path in args.paths:
+                store.ingest_file(path)
+        elif args.command == "search":
+            try:
+                _print_rows(store.search(args.text, ioc=args.ioc, channel=args.channel, since=args.since,
+                                         until=args.until, label=args.label, limit=args.limit))
+            except ValueError as e:
+                parser.exit(2, f"❌ {e}\n")
+        elif args.command == "ioc":
+            _print_rows(store.channels_mentioning(args.value, since=args.since, until=args.until))
+        elif args.command == "top":
+            _print_rows(store.top_iocs(args.type, since=args.since, until=args.until, limit=args.limit))
+        elif args.command == "stats":
+            print(store.stats())
+        elif args.command == "optimize":
+            store.optimize()
+        print(f"⏱️ {time.perf_counter() - start_time:.3f}s")
+
+
+# Entry point if run directly:
+#   python -m utils.cti_store ingest FINAL_*.parquet backup_*/
+#   python -m utils.cti_store ioc CVE-2025-1234 --since 2025-09-01 --until 2025-10-01
+#   python -m utils.cti_store search "lockbit AND ransomware" --label CTI
+#   python -m utils.cti_store top cve | stats
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+class DiskCache:
+    """
+    Small persistent key/value cache on SQLite.
+
+    Values are stored as JSON. Entries older than `ttl` seconds are treated as missing,
+    and once more than `max_entries` entries or `max_bytes` of values are stored the
+    least recently used ones are evicted. Hit/miss counters are kept for the lifetime
+    of the object. A hit only records its access time in memory; those are written in one
+    transaction every `access_flush_every` hits, before any eviction and on close, so a
+    warm read costs a SELECT and no commit.
+    """
+
+    def __init__(self, path, ttl=None, max_entries=None, max_bytes=None, access_flush_every=256):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.access_flush_every = access_flush_every
+        self._accessed = {}  # key -> access time not yet written
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache (accessed_at)")
+        self.conn.commit()
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute("SELECT value, created_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.ttl is not None and now - row[1] > self.ttl):
+                self.misses += 1
+                return default
+            self._accessed[key] = now
+            if len(self._accessed) >= self.access_flush_every:
+                self._flush_accessed()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            self._accessed.pop(key, None)
+            self._flush_accessed()  # eviction goes by access time
+            self._evict(now)
+            self.conn.commit()
+
+    def _flush_accessed(self):
+        if self._accessed:
+            self.conn.executemany("UPDATE cache SET accessed_at = ? WHERE key = ?",
+                                  [(accessed_at, key) for key, accessed_at in self._accessed.items()])
+            self.conn.commit()
+            self._accessed.clear()
+
+    def _evict(self, now):
+        if self.ttl is not None:
+            self.conn.execute("DELETE FROM cache WHERE created_at < ?", (now - self.ttl,))
+        if self.max_entries is not None:
+            self.conn.execute(
+                "DELETE FROM cache WHERE key IN "
+                "(SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        if self.max_bytes is not None:
+            self.conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM ("
+                "SELECT key, SUM(LENGTH(CAST(value AS BLOB))) OVER (ORDER BY accessed_at DESC, key) AS running "
+                "FROM cache) WHERE running > ?)",
+                (self.max_bytes,),
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def size_bytes(self):
+        with self._lock:
+            return self.conn.execute("SELECT COALESCE(SUM(LENGTH(CAST(value AS BLOB))), 0) FROM cache").fetchone()[0]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self),
+            "bytes": self.size_bytes(),
+        }
+
+    def close(self):
+        with self._lock:
+            self._flush_accessed()
+            self.conn.close()
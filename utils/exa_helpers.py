@@ -1,65 +1,211 @@
-from exa_py import Exa
 from dotenv import load_dotenv
+from utils.disk_cache import DiskCache
+from utils.rate_limit import AsyncTokenBucket
+from utils.telemetry import telemetry
+import asyncio
+import hashlib
 import os
+import random
+import re
 
 # Load environment variables
 load_dotenv()
 
+# Persistent response cache, keyed on the normalized query
+EXA_CACHE_PATH = os.getenv("EXA_CACHE_PATH", "exa_cache.sqlite")
+EXA_CACHE_TTL = int(os.getenv("EXA_CACHE_TTL", str(7 * 24 * 3600)))  # default 7 days
+EXA_CACHE_MAX_ENTRIES = int(os.getenv("EXA_CACHE_MAX_ENTRIES", "5000"))
+
+# Async cross-validation limits
+EXA_CONCURRENCY = int(os.getenv("EXA_CONCURRENCY", "4"))  # queries in flight
+EXA_RATE_LIMIT = float(os.getenv("EXA_RATE_LIMIT", "5"))  # queries per second
+EXA_MAX_RETRIES = int(os.getenv("EXA_MAX_RETRIES", "3"))
+EXA_TIMEOUT = float(os.getenv("EXA_TIMEOUT", "30"))  # seconds before a query is given up on (never retried)
+
+_exa_client = None
+_exa_cache = None
+
+
 def get_exa_client():
+    """Return the shared Exa client, creating it on first use."""
+    global _exa_client
+    if _exa_client is not None:
+        return _exa_client
+
     exa_api_key = os.getenv("EXA_API_KEY")
     if not exa_api_key:
         raise ValueError("EXA_API_KEY not found. Please check your .env file.")
-    
-    exa_client = Exa(api_key = exa_api_key)
+
+    from exa_py import Exa  # ~1s to import; not needed when every query is served from the cache
+
+    _exa_client = Exa(api_key = exa_api_key)
     print("✅ Exa client initialized.")
-    return exa_client
+    return _exa_client
+
+
+def set_exa_client(client):
+    """Replace the shared client, e.g. with a local fake exposing `search_and_contents`."""
+    global _exa_client
+    _exa_client = client
+
 
-def search_cyber_threats(query: str):
-    exa_client = get_exa_client()
-    result = exa_client.search_and_contents(query, summary = True)
+def get_exa_cache():
+    global _exa_cache
+    if _exa_cache is None:
+        _exa_cache = DiskCache(EXA_CACHE_PATH, ttl = EXA_CACHE_TTL, max_entries = EXA_CACHE_MAX_ENTRIES)
+    return _exa_cache
 
-    items = []
-    for idx, item in enumerate(result.results[:5]):
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a query, so reposts share one cache entry."""
+    return " ".join(query.lower().split())
+
+
+def search_cyber_threat_hits(query: str, client = None, cache = None, start_published_date = None):
+    """
+    Top 5 Exa results for `query` as dicts (title, url, published_date, summary),
+    optionally only those published since `start_published_date` (ISO date).
+    Served from the response cache when the same normalized query was seen within the TTL.
+    """
+    cache = cache if cache is not None else get_exa_cache()
+    cache_query = normalize_query(query)
+    if start_published_date:
+        cache_query += f" since:{start_published_date}"
+    key = hashlib.sha256(cache_query.encode("utf-8")).hexdigest()
+
+    hits = cache.get(key)
+    if hits is not None:
+        telemetry.count("exa.cache_hit")
+        return hits
+
+    exa_client = client or get_exa_client()
+    telemetry.count("exa.search")
+    if start_published_date:
+        result = exa_client.search_and_contents(query, summary = True, start_published_date = start_published_date)
+    else:
+        result = exa_client.search_and_contents(query, summary = True)
+
+    hits = []
+    for item in result.results[:5]:
         summary_text = item.summary or "No summary available."
         if len(summary_text) > 1000:
             summary_text = summary_text[:1000] + "..."
 
-        items.append(
-            f"{idx+1}. Title: {item.title}. "
-            f"URL: {item.url}. "
-            f"Date: {item.published_date}. "
-            f"Summary: {summary_text}."
-        )
-
-    return " ".join(items)
-        
-        
-        
-def cross_validate_with_exa(messages, top_n=10):
+        hits.append({
+            "title": item.title,
+            "url": item.url,
+            "published_date": item.published_date,
+            "summary": summary_text,
+        })
+
+    cache.set(key, hits)
+    return hits
+
+
+def format_hits(hits):
+    return " ".join(
+        f"{idx+1}. Title: {hit['title']}. "
+        f"URL: {hit['url']}. "
+        f"Date: {hit['published_date']}. "
+        f"Summary: {hit['summary']}."
+        for idx, hit in enumerate(hits)
+    )
+
+
+def search_cyber_threats(query: str, client = None, cache = None):
+    return format_hits(search_cyber_threat_hits(query, client = client, cache = cache))
+
+
+
+def validation_record(msg, hits):
+    """{message, status, exa_results} record, plus the structured `exa_hits` behind exa_results."""
+    exa_results = format_hits(hits)
+    if exa_results.strip():
+        return {
+            "message": msg,
+            "status": "Known Threat",
+            "exa_results": exa_results,
+            "exa_hits": hits
+        }
+    return {
+        "message": msg,
+        "status": "Early Signal",
+        "exa_results": "No external validation found",
+        "exa_hits": []
+    }
+
+
+def cross_validate_with_exa(messages, top_n=10, client = None, cache = None):
     """
     Cross-check a list of CTI messages with Exa.ai.
+    Identical queries within the batch are searched once; repeats across runs hit the cache.
     Returns a list of dicts: {message, status, exa_results}.
     """
+    results_by_query = {}
     validated = []
     for msg in messages[:top_n]:
         query = msg[:200]  # trim long Telegram text for searching
-        exa_results = search_cyber_threats(query)
-
-        if exa_results and len(exa_results) > 0:
-            status = "Confirmed"
-        else:
-            status = "Emerging"
-
-        if exa_results.strip():
-            validated.append({
-                "message": msg,
-                "status": "Known Threat",
-                "exa_results": exa_results
-            })
-        else:
-            validated.append({
-                "message": msg,
-                "status": "Early Signal",
-                "exa_results": "No external validation found"
-            })
-    return validated
\ No newline at end of file
+        normalized = normalize_query(query)
+        if normalized not in results_by_query:
+            results_by_query[normalized] = search_cyber_threat_hits(query, client = client, cache = cache)
+        validated.append(validation_record(msg, results_by_query[normalized]))
+    return validated
+
+
+def is_retryable(error):
+    """Connection errors, HTTP 429 and 5xx are worth retrying; anything else is not."""
+    if isinstance(error, asyncio.TimeoutError):
+        return False  # the request may still be running, see cross_validate_with_exa_async
+    if isinstance(error, OSError):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None:
+        match = re.search(r"status code (\d{3})", str(error))
+        status = int(match.group(1)) if match else None
+    return status is not None and (status == 429 or status >= 500)
+
+
+async def cross_validate_with_exa_async(messages, top_n=10, concurrency = EXA_CONCURRENCY,
+                                        rate_limit = EXA_RATE_LIMIT, max_retries = EXA_MAX_RETRIES,
+                                        timeout = EXA_TIMEOUT, client = None, cache = None):
+    """
+    Concurrent version of `cross_validate_with_exa`.
+    At most `concurrency` queries run at once, started at no more than `rate_limit` per second.
+    Connection errors, 429 and 5xx are retried with exponential backoff. A query is given up
+    on after `timeout` seconds but not retried: the client's blocking HTTP call cannot be
+    cancelled, so it keeps running in its thread (and still caches its answer for the next
+    run), and a retry would pay for a second query while the first is in flight.
+    Records come back in input order, same shape as the serial version; a query that
+    still fails after all retries, or timed out, is reported as an Early Signal.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    bucket = AsyncTokenBucket(rate_limit)
+
+    async def search(query):
+        async with semaphore:
+            for attempt in range(max_retries + 1):
+                await bucket.acquire()
+                try:
+                    return await asyncio.wait_for(
+                        asyncio.to_thread(search_cyber_threat_hits, query, client, cache), timeout
+                    )
+                except asyncio.TimeoutError:
+                    print(f"⚠️ Exa search timed out after {timeout:g}s for '{query[:60]}', not retrying")
+                    return []
+                except Exception as e:
+                    if attempt == max_retries or not is_retryable(e):
+                        print(f"⚠️ Exa search failed for '{query[:60]}': {e}")
+                        return []
+                    await asyncio.sleep(2 ** attempt + random.uniform(0, 1))
+
+    selected = messages[:top_n]
+    queries = {}
+    for msg in selected:
+        query = msg[:200]  # trim long Telegram text for searching
+        queries.setdefault(normalize_query(query), query)
+
+    normalized_keys = list(queries)
+    results = await asyncio.gather(*(search(queries[key]) for key in normalized_keys))
+    results_by_query = dict(zip(normalized_keys, results))
+
+    return [validation_record(msg, results_by_query[normalize_query(msg[:200])]) for msg in selected]
@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(modules, cwd=REPO_ROOT):
+    """
+    Import `modules` in a fresh interpreter under `python -X importtime` and return one
+    (module, self µs, cumulative µs) tuple per module it loaded, in load order.
+    """
+    code = "; ".join(f"import {module}" for module in modules)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True, text=True, cwd=cwd)
+    if result.returncode:
+        raise RuntimeError(f"Importing {', '.join(modules)} failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def report(stages, top=8):
+    """
+    Print the import cost of each stage (name -> modules it imports), already-loaded
+    interpreter startup modules excluded, with its most expensive top-level packages.
+    Returns {stage: total seconds}.
+    """
+    baseline = {name for name, _, _ in import_times([])}
+    totals = {}
+    for stage, modules in stages.items():
+        rows = [row for row in import_times(modules) if row[0] not in baseline]
+        by_package = defaultdict(int)
+        for name, self_us, _ in rows:
+            by_package[name.split(".")[0]] += self_us
+        totals[stage] = sum(by_package.values()) / 1e6
+
+        heaviest = sorted(by_package.items(), key=lambda kv: -kv[1])[:top]
+        print(f"{stage:<12}{totals[stage] * 1000:>8.0f} ms  {len(rows):>5} modules  "
+              + ", ".join(f"{package} {us / 1000:.0f}ms" for package, us in heaviest))
+    return totals
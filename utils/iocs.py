@@ -0,0 +1,106 @@
+import ipaddress
+import re
+
+# Defanged indicators as posted in CTI channels: hxxp://, example[.]com, 1.2.3(.)4, user[@]host
+_REFANG = [
+    (re.compile(r"\[\s*\.\s*\]|\(\s*\.\s*\)|\{\s*\.\s*\}|\[dot\]|\(dot\)", re.IGNORECASE), "."),
+    (re.compile(r"\[\s*@\s*\]|\[at\]|\(at\)", re.IGNORECASE), "@"),
+    (re.compile(r"\bhxxp", re.IGNORECASE), "http"),
+    (re.compile(r"\[(:|://)\]"), r"\1"),
+]
+_DEFANG_HINT = re.compile(r"[\[({]|hxxp", re.IGNORECASE)
+# A whitespace-delimited token with a defanged dot or scheme in it
+_DEFANGED_TOKEN_RE = re.compile(r"\S*(?:\[\s*\.\s*\]|\(\s*\.\s*\)|\{\s*\.\s*\}|\[dot\]|\(dot\)|hxxp)\S*", re.IGNORECASE)
+
+# One pass over the text; every indicator starts a word, so the leading \b rejects most
+# positions before any alternative is tried. The first alternative that matches wins.
+_IOC_RE = re.compile(
+    r"\b(?:"
+    r"(?P<cve>CVE-\d{4}-\d{4,7}\b)"
+    r"|(?P<hash>[0-9a-f]{64}|[0-9a-f]{40}|[0-9a-f]{32})\b"
+    r"|(?<![.])(?P<ipv4>(?:\d{1,3}\.){3}\d{1,3})(?![\w.]*\d)"
+    r"|(?<![.@-])(?P<domain>(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,24})(?![\w-])"
+    r")",
+    re.IGNORECASE,
+)
+_HASH_TYPES = {32: "md5", 40: "sha1", 64: "sha256"}
+
+# Top-level domains a dotted word must end in to count as a domain: every country code, the
+# original generic ones and the newer ones common in threat reports. File names (.exe, .php,
+# .js, ...) end in none of them; a domain defanged in the source is kept whatever its ending
+_TLDS = set("""
+    ac ad ae af ag ai al am ao aq ar as at au aw ax az ba bb bd be bf bg bh bi bj bm bn bo bq br bs bt bw by bz
+    ca cc cd cf cg ch ci ck cl cm cn co cr cu cv cw cx cy cz de dj dk dm do dz ec ee eg er es et eu fi fj fk fm
+    fo fr ga gd ge gf gg gh gi gl gm gn gp gq gr gs gt gu gw gy hk hm hn hr ht hu id ie il im in io iq ir is it
+    je jm jo jp ke kg kh ki km kn kp kr kw ky kz la lb lc li lk lr ls lt lu lv ly ma mc md me mg mh mk ml mm mn
+    mo mp mq mr ms mt mu mv mw mx my mz na nc ne nf ng ni nl no np nr nu nz om pa pe pf pg ph pk pl pm pn pr ps
+    pt pw py qa re ro rs ru rw sa sb sc sd se sg sh si sk sl sm sn so sr ss st su sv sx sy sz tc td tf tg th tj
+    tk tl tm tn to tr tt tv tw tz ua ug uk us uy uz va vc ve vg vi vn vu wf ws ye yt za zm zw
+    com net org edu gov mil int arpa info biz name pro mobi aero asia cat coop jobs museum tel travel xxx post
+    app dev page zip mov xyz top online site club shop store tech space website fun icu buzz live life world
+    today cloud digital email link click host network services support systems solutions agency group company
+    center news blog one vip win bid loan work men date download review stream racing party trade science
+    cricket faith accountant gdn kim ltd monster cyou cfd sbs rest bond quest lol art global best run ink
+    pics bar onion
+""".split())
+# Dotted product names ending in a real TLD
+_NOT_DOMAINS = {"asp.net", "ado.net", "vb.net", "dot.net", "asp.net.core"}
+# A dotted quad right after a version marker is a version number: version 1.2.3.4, v. 10.0.0.1
+_VERSION_PREFIX_RE = re.compile(r"\b(?:version|ver|v)\.?\s*$", re.IGNORECASE)
+
+IOC_TYPES = ("cve", "md5", "sha1", "sha256", "ipv4", "domain")
+
+
+def refang(text):
+    """Undo the common defanging conventions so indicators can be matched."""
+    if not _DEFANG_HINT.search(text):
+        return text
+    for pattern, replacement in _REFANG:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def _defanged_domains(text):
+    """Domains the author defanged (evil[.]com, hxxp://evil.zip/...): deliberate indicators."""
+    return {match.group("domain").lower()
+            for token in _DEFANGED_TOKEN_RE.findall(text)
+            for match in _IOC_RE.finditer(refang(token)) if match.lastgroup == "domain"}
+
+
+def _valid_ipv4(value):
+    try:
+        address = ipaddress.IPv4Address(value)
+    except ValueError:
+        return False
+    # Private, loopback and reserved ranges are examples or noise, not indicators
+    return address.is_global
+
+
+def _valid_domain(value):
+    return value.rsplit(".", 1)[1] in _TLDS and value not in _NOT_DOMAINS
+
+
+def extract_iocs(text):
+    """
+    Indicators in `text` as a sorted list of unique (type, value) pairs, type one of IOC_TYPES.
+    Defanged forms are refanged first; CVE ids are upper-cased, hashes and domains lower-cased.
+    Version numbers (v1.2.3.4) are not IPs, and domains must end in a known TLD unless defanged.
+    """
+    if not isinstance(text, str) or not text:
+        return []
+    defanged = _defanged_domains(text) if _DEFANG_HINT.search(text) else set()
+    found = set()
+    text = refang(text)
+    for match in _IOC_RE.finditer(text):
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "cve":
+            found.add(("cve", value.upper()))
+        elif kind == "hash":
+            found.add((_HASH_TYPES[len(value)], value.lower()))
+        elif kind == "ipv4":
+            if _valid_ipv4(value) and not _VERSION_PREFIX_RE.search(text, max(match.start() - 10, 0), match.start()):
+                found.add(("ipv4", value))
+        elif value.lower() in defanged or _valid_domain(value.lower()):
+            found.add(("domain", value.lower()))
+    return sorted(found)
@@ -0,0 +1,80 @@
+import hashlib
+import json
+import threading
+from crewai import LLM
+from utils.telemetry import telemetry
+
+# Request parameters that change the completion and therefore belong in the cache key
+_KEY_PARAMS = (
+    "temperature", "top_p", "n", "stop", "max_tokens", "max_completion_tokens",
+    "presence_penalty", "frequency_penalty", "logit_bias", "seed", "logprobs",
+    "top_logprobs", "reasoning_effort", "base_url", "api_base", "api_version",
+)
+
+
+class CachedLLM(LLM):
+    """
+    crewai LLM with a content-addressed response cache.
+
+    The key is a hash of the model, the rendered messages, the tool schemas and every
+    sampling parameter, so a deterministic (temperature 0) prompt seen before is answered
+    from `cache` (a DiskCache, or a factory returning one, called on the first cached
+    call so that importing the module that builds the LLM creates no file) without an
+    API call. Calls that may execute tools (`available_functions`) and non-text
+    responses are never cached. `bypass=True` sends every call to the API.
+    """
+
+    def __init__(self, *args, cache=None, bypass=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cache = cache
+        self._cache_lock = threading.Lock()  # crew agents may call from several threads at once
+        self.bypass = bypass
+
+    @property
+    def cache(self):
+        if callable(self._cache):
+            with self._cache_lock:
+                if callable(self._cache):  # another thread may have opened it meanwhile
+                    self._cache = self._cache()
+        return self._cache
+
+    @cache.setter
+    def cache(self, cache):
+        self._cache = cache
+
+    def cache_key(self, messages, tools=None):
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "tools": tools,
+            "params": {name: getattr(self, name, None) for name in _KEY_PARAMS},
+            "response_format": getattr(self.response_format, "__name__", self.response_format),
+            "additional_params": self.additional_params,
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        if self.bypass or self.cache is None or available_functions:
+            telemetry.count("llm.call")
+            return super().call(messages, tools, callbacks, available_functions, **kwargs)
+
+        key = self.cache_key(messages, tools)
+        cached = self.cache.get(key)
+        if cached is not None:
+            telemetry.count("llm.cache_hit")
+            return cached["response"]
+
+        telemetry.count("llm.call")
+        response = super().call(messages, tools, callbacks, available_functions, **kwargs)
+        if isinstance(response, str):
+            self.cache.set(key, {"model": self.model, "response": response})
+        return response
+
+    def cache_stats(self):
+        # A cache never opened has nothing to report (and is not created just for that)
+        if self._cache is None or callable(self._cache):
+            return {}
+        return self._cache.stats()
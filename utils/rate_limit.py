@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+
+class AsyncRateLimiter:
+    """
+    Spaces out requests shared by many asyncio tasks.
+    When the API answers with a flood wait, `penalize()` pauses every caller,
+    not just the task that hit the limit.
+    """
+
+    def __init__(self, min_interval: float = 1.0):
+        self.min_interval = min_interval
+        self._next_slot = 0.0
+        self._blocked_until = 0.0
+
+    async def wait(self):
+        """Wait for the next free request slot."""
+        now = time.monotonic()
+        slot = max(now, self._next_slot, self._blocked_until)
+        self._next_slot = slot + self.min_interval
+        delay = slot - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def penalize(self, seconds: float):
+        """Block all callers for `seconds` (e.g. FloodWaitError.seconds)."""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self._next_slot = max(self._next_slot, self._blocked_until)
+
+
+class AsyncTokenBucket:
+    """
+    Token bucket for asyncio callers: `rate` tokens per second, bursts up to `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    async def acquire(self):
+        """Take one token, sleeping until one is available."""
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
@@ -0,0 +1,48 @@
+def parse_reactions(reactions):
+    """
+    Reaction counts as a dict, from the scraper's "👍 12 🔥 3 " string
+    (or an already structured dict / list of (emoji, count) pairs).
+    """
+    if isinstance(reactions, float) or not reactions:  # None, NaN or empty
+        return {}
+    if isinstance(reactions, dict):
+        return dict(reactions)
+    if not isinstance(reactions, str):
+        return {emoji: int(count) for emoji, count in reactions}
+
+    counts = {}
+    tokens = reactions.split()
+    for emoji, count in zip(tokens[::2], tokens[1::2]):
+        try:
+            counts[emoji] = counts.get(emoji, 0) + int(count)
+        except ValueError:
+            continue
+    return counts
+
+
+def merge_reactions(values):
+    """Sum the reaction counts of several messages (any form `parse_reactions` accepts) into one dict."""
+    merged = {}
+    for value in values:
+        for emoji, count in parse_reactions(value).items():
+            merged[emoji] = merged.get(emoji, 0) + count
+    return merged
+
+
+def reaction_pairs(counts):
+    """
+    A dict of counts as (emoji, count) pairs: how pandas holds the dataset's map<string, int64>
+    Reactions column, so a DataFrame column of them is written back to Parquet as a map.
+    """
+    return list(counts.items())
+
+
+def format_reactions(counts):
+    """Inverse of `parse_reactions` for a dict of counts."""
+    return "".join(f"{emoji} {count} " for emoji, count in counts.items())
+
+
+def total_reactions(reactions):
+    if isinstance(reactions, (list, tuple)):  # map column read by pandas: no dict needed
+        return sum(int(count) for _, count in reactions)
+    return sum(parse_reactions(reactions).values())
@@ -0,0 +1,153 @@
+import difflib
+import glob
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from utils.disk_cache import DiskCache
+from utils.telemetry import telemetry
+
+# `python main.py schedule`: run every hour or day over the last SCHEDULE_WINDOW_HOURS
+SCHEDULE_INTERVALS = {"hourly": timedelta(hours=1), "daily": timedelta(days=1)}
+SCHEDULE_EVERY = os.getenv("SCHEDULE_EVERY", "daily").lower()
+SCHEDULE_WINDOW_HOURS = float(os.getenv("SCHEDULE_WINDOW_HOURS", str(7 * 24)))
+# Stage outputs of earlier runs, keyed by the fingerprint of their inputs
+STAGE_CACHE_PATH = os.getenv("STAGE_CACHE_PATH", "stage_cache.sqlite")
+# Timestamped report artifacts (<name>_<stamp>.md / .json / .diff)
+REPORTS_DIR = os.getenv("REPORTS_DIR", "reports")
+
+
+def rolling_window(every=SCHEDULE_EVERY, window_hours=SCHEDULE_WINDOW_HOURS, now=None):
+    """
+    (start, end) of the run at `now`, as UTC datetimes: `end` is `now` floored to the
+    schedule interval, so every run in the same hour / day sees the same window.
+    """
+    interval = SCHEDULE_INTERVALS[every]
+    now = now or datetime.now(timezone.utc)
+    epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+    end = epoch + ((now - epoch) // interval) * interval
+    return end - timedelta(hours=window_hours), end
+
+
+def next_run(end, every=SCHEDULE_EVERY):
+    """Start of the next window after one ending at `end`."""
+    return end + SCHEDULE_INTERVALS[every]
+
+
+def fingerprint(*parts):
+    """Stable hash of JSON-serializable parts (datetimes and paths as text)."""
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def dataset_fingerprint(path):
+    """
+    Content hash of a scraped dataset: the same messages give the same fingerprint whatever
+    order the channels were written in or how the rows were split into part files.
+    """
+    import pandas as pd
+    from scrapers.parquet_sink import read_dataset
+    from utils.reactions import format_reactions, parse_reactions
+
+    df = read_dataset(path)
+    if "Reactions" in df.columns:
+        df["Reactions"] = df["Reactions"].map(lambda value: format_reactions(parse_reactions(value)))
+    df = df.sort_values(["Group", "Message ID"], kind="stable")
+    return hashlib.sha256(pd.util.hash_pandas_object(df, index=False).values.tobytes()).hexdigest()
+
+
+class StageCache:
+    """
+    Stage outputs keyed by the fingerprint of their inputs, on DiskCache.
+
+    An entry is a JSON dict; one whose "path" no longer exists is treated as missing,
+    so deleting an artifact forces its stage to run again.
+    """
+
+    def __init__(self, path=STAGE_CACHE_PATH):
+        self.cache = DiskCache(path)
+
+    def get(self, stage, key):
+        entry = self.cache.get(f"{stage}:{key}")
+        if entry is None or (isinstance(entry, dict) and entry.get("path") and not os.path.exists(entry["path"])):
+            return None
+        return entry
+
+    def put(self, stage, key, entry):
+        self.cache.set(f"{stage}:{key}", entry)
+
+    def run(self, stage, key, compute):
+        """The cached entry of `stage` for `key`, or the result of `compute()` (then cached)."""
+        entry = self.get(stage, key)
+        if entry is not None:
+            telemetry.count("stage_cache.hit")
+            print(f"♻️ {stage}: inputs unchanged, reusing {entry.get('path') or 'previous result'}")
+            return entry
+        telemetry.count("stage_cache.miss")
+        entry = compute()
+        self.put(stage, key, entry)
+        return entry
+
+    def close(self):
+        self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def artifact_path(name, stamp, suffix, directory=REPORTS_DIR):
+    """`<directory>/<name>_<stamp><suffix>`, creating `directory` if needed."""
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{name}_{stamp}{suffix}")
+
+
+def previous_artifact(name, stamp, suffix, directory=REPORTS_DIR):
+    """Latest `<name>_<stamp><suffix>` written before `stamp`, or None."""
+    current = os.path.basename(artifact_path(name, stamp, suffix, directory))
+    earlier = [path for path in glob.glob(os.path.join(directory, f"{glob.escape(name)}_*{suffix}"))
+               if os.path.basename(path) < current]
+    return max(earlier, key=os.path.basename, default=None)
+
+
+def _read_lines(path):
+    if path is None or not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+def write_diff(name, stamp, items, directory=REPORTS_DIR):
+    """
+    Save this run's report sources (`items`, one line each) as `<name>_<stamp>.json` and
+    write `<name>_<stamp>.diff` against the previous run: the items that appeared or
+    dropped out, then a unified diff of the two reports. Returns the diff path.
+    """
+    with open(artifact_path(name, stamp, ".json", directory), "w", encoding="utf-8") as f:
+        json.dump(items, f, ensure_ascii=False, indent=2)
+
+    previous_items_path = previous_artifact(name, stamp, ".json", directory)
+    previous_items = []
+    if previous_items_path:
+        with open(previous_items_path, encoding="utf-8") as f:
+            previous_items = json.load(f)
+    added = [item for item in items if item not in previous_items]
+    dropped = [item for item in previous_items if item not in items]
+
+    previous_report = previous_artifact(name, stamp, ".md", directory)
+    report = artifact_path(name, stamp, ".md", directory)
+    report_diff = difflib.unified_diff(_read_lines(previous_report), _read_lines(report),
+                                       fromfile=previous_report or "/dev/null", tofile=report, lineterm="")
+
+    diff_path = artifact_path(name, stamp, ".diff", directory)
+    with open(diff_path, "w", encoding="utf-8") as f:
+        f.write(f"# Sources: {len(added)} new, {len(dropped)} dropped since "
+                f"{os.path.basename(previous_items_path) if previous_items_path else 'the first run'}\n")
+        f.writelines(f"+ {item}\n" for item in added)
+        f.writelines(f"- {item}\n" for item in dropped)
+        f.write("\n# Report\n")
+        f.writelines(line + "\n" for line in report_diff)
+    print(f"📝 Report diff: {len(added)} new / {len(dropped)} dropped sources → {diff_path}")
+    return diff_path
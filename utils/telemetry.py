@@ -0,0 +1,148 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+TELEMETRY_DIR = os.getenv("TELEMETRY_DIR", "telemetry")
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process so far (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux reports KiB
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Span:
+    """One timed stage; call `add(n)` for each item it processed."""
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.items = 0
+
+    def add(self, n=1):
+        self.items += n
+
+
+class Telemetry:
+    """
+    Lightweight stage instrumentation: wall time, items/sec, peak RSS and external-call
+    counts per span, exported as JSON and Prometheus text. Thread-safe.
+    """
+
+    def __init__(self):
+        self.spans = []
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def count(self, name, n=1):
+        """Count an external call (e.g. "exa.search", "llm.call", "telegram.get_history")."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextmanager
+    def span(self, name, **labels):
+        span = Span(name, labels)
+        with self._lock:
+            calls_before = dict(self.counters)
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                calls = {k: v - calls_before.get(k, 0) for k, v in self.counters.items() if v != calls_before.get(k, 0)}
+                self.spans.append({
+                    "name": name,
+                    "labels": labels,
+                    "wall_time_s": round(elapsed, 6),
+                    "items": span.items,
+                    "items_per_s": round(span.items / elapsed, 3) if elapsed > 0 else None,
+                    "peak_rss_bytes": peak_rss_bytes(),
+                    "external_calls": calls,  # calls made anywhere while the span was open
+                })
+
+    def reset_spans(self):
+        """Drop recorded spans (counters keep counting), e.g. after each export of a long-running process."""
+        with self._lock:
+            self.spans = []
+
+    def to_dict(self):
+        with self._lock:
+            return {"spans": list(self.spans), "external_calls": dict(self.counters), "peak_rss_bytes": peak_rss_bytes()}
+
+    def to_prometheus(self):
+        """Prometheus text exposition; spans with the same name and labels are summed."""
+        data = self.to_dict()
+        stages = {}
+        for span in data["spans"]:
+            key = (span["name"], tuple(sorted(span["labels"].items())))
+            stage = stages.setdefault(key, {"wall_time_s": 0.0, "items": 0, "count": 0})
+            stage["wall_time_s"] += span["wall_time_s"]
+            stage["items"] += span["items"]
+            stage["count"] += 1
+
+        def labels(name, extra):
+            pairs = [("stage", name)] + list(extra)
+            return ",".join(f'{k}="{_escape_label(v)}"' for k, v in pairs)
+
+        lines = [
+            "# TYPE cti_stage_duration_seconds gauge",
+            *(f"cti_stage_duration_seconds{{{labels(n, l)}}} {s['wall_time_s']:.6f}" for (n, l), s in stages.items()),
+            "# TYPE cti_stage_items_total gauge",
+            *(f"cti_stage_items_total{{{labels(n, l)}}} {s['items']}" for (n, l), s in stages.items()),
+            "# TYPE cti_stage_items_per_second gauge",
+            *(f"cti_stage_items_per_second{{{labels(n, l)}}} {s['items'] / s['wall_time_s'] if s['wall_time_s'] else 0:.3f}"
+              for (n, l), s in stages.items()),
+            "# TYPE cti_stage_runs_total gauge",
+            *(f"cti_stage_runs_total{{{labels(n, l)}}} {s['count']}" for (n, l), s in stages.items()),
+            "# TYPE cti_external_calls_total counter",
+            *(f'cti_external_calls_total{{call="{name}"}} {count}' for name, count in data["external_calls"].items()),
+        ]
+        if data["peak_rss_bytes"] is not None:
+            lines += ["# TYPE cti_peak_rss_bytes gauge", f"cti_peak_rss_bytes {data['peak_rss_bytes']}"]
+        return "\n".join(lines) + "\n"
+
+    def export(self, directory=TELEMETRY_DIR, name="metrics"):
+        """Write `<name>.json` and `<name>.prom` into `directory`; returns both paths."""
+        os.makedirs(directory, exist_ok=True)
+        json_path = os.path.join(directory, f"{name}.json")
+        prom_path = os.path.join(directory, f"{name}.prom")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+        with open(prom_path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        print(f"📈 Telemetry written to {json_path} and {prom_path}")
+        return json_path, prom_path
+
+
+class ProgressThrottle:
+    """Lets progress output through at most once every `interval` seconds."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._last = float("-inf")
+
+    def ready(self):
+        now = time.monotonic()
+        if now - self._last >= self.interval:
+            self._last = now
+            return True
+        return False
+
+
+# Process-wide instance shared by all pipeline stages
+telemetry = Telemetry()
@@ -0,0 +1,42 @@
+import re
+
+# Characters that are invalid in XML, and so in Excel exports
+_UNSUPPORTED_RE = re.compile("[^\u0009\u000A\u000D\u0020-\uD7FF\uE000-\uFFFD\U00010000-\U0010FFFF]")
+
+# Column holding the normalized form next to the text column, so later stages reuse it
+NORMALIZED_COLUMN = "Content_Normalized"
+
+
+def clean_text(text):
+    """`text` without characters invalid in XML; "" for None / non-text."""
+    if not isinstance(text, str) or not text:
+        return ""
+    return _UNSUPPORTED_RE.sub("", text)
+
+
+def normalize_text(text):
+    """
+    Matching form of a message: cleaned and lowercased exactly like sklearn's vectorizers
+    lowercase, so the classifier, keyword labeller and dedup can all take it as is.
+    """
+    return clean_text(text).lower()
+
+
+def normalize_batch(texts):
+    """(cleaned, normalized) lists for a batch of texts, each computed once."""
+    cleaned = [clean_text(text) for text in texts]
+    return cleaned, [text.lower() for text in cleaned]
+
+
+def normalize_texts(texts):
+    return normalize_batch(texts)[1]
+
+
+def normalized_column(df, text_column="Content"):
+    """
+    The normalized form of `df[text_column]`, computed once: stored as NORMALIZED_COLUMN
+    on first use and returned from there afterwards.
+    """
+    if NORMALIZED_COLUMN not in df.columns:
+        df[NORMALIZED_COLUMN] = normalize_texts(df[text_column].tolist())
+    return df[NORMALIZED_COLUMN]
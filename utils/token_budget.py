@@ -0,0 +1,146 @@
+import os
+import re
+from collections import Counter
+from urllib.parse import urlsplit
+
+try:
+    import tiktoken
+except ImportError:  # fall back to a ~4 characters per token estimate
+    tiktoken = None
+
+# Token budget for the Exa material fed into threat_analysis_task, and for each crew task prompt
+EXA_CONTEXT_TOKEN_BUDGET = int(os.getenv("EXA_CONTEXT_TOKEN_BUDGET", "6000"))
+CREW_TASK_TOKEN_BUDGET = int(os.getenv("CREW_TASK_TOKEN_BUDGET", "8000"))
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_PLACEHOLDER_RE = re.compile(r"\{(\w+)\}")
+_encoding = None
+
+
+def _get_encoding():
+    """cl100k_base (GPT-3.5/4) encoding, or False when tiktoken or its BPE file is unavailable."""
+    global _encoding
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.get_encoding("cl100k_base") if tiktoken else False
+        except Exception as e:  # the BPE file is downloaded on first use
+            print(f"⚠️ tiktoken unavailable ({e.__class__.__name__}), estimating tokens from length")
+            _encoding = False
+    return _encoding
+
+
+def count_tokens(text):
+    """Token count with the cl100k_base encoding, or a ~4 characters per token estimate."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if not encoding:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def trim_to_tokens(text, budget):
+    """
+    Extractive trim: keep whole sentences from the start while they fit in `budget` tokens.
+    A first sentence longer than the budget is cut mid-sentence.
+    """
+    if not text or count_tokens(text) <= budget:
+        return text or ""
+    if budget <= 0:
+        return ""
+
+    kept, used = [], 0
+    for sentence in _SENTENCE_RE.split(text):
+        cost = count_tokens(sentence) + 1
+        if used + cost > budget:
+            break
+        kept.append(sentence)
+        used += cost
+    if kept:
+        return " ".join(kept) + " ..."
+
+    # No full sentence fits: cut by the character ratio
+    return text[:max(1, int(len(text) * budget / count_tokens(text)))] + "..."
+
+
+def shorten_url(url, max_path=40):
+    """Drop scheme, www., query string and fragment; cap the path length."""
+    if not url:
+        return ""
+    parts = urlsplit(url)
+    host = parts.netloc[4:] if parts.netloc.startswith("www.") else parts.netloc
+    path = parts.path.rstrip("/")
+    if len(path) > max_path:
+        path = path[:max_path] + "…"
+    return host + path
+
+
+def compact_validated(validated, budget=EXA_CONTEXT_TOKEN_BUDGET):
+    """
+    One compact text block per validated message, together within `budget` tokens.
+
+    Exa hits already cited (same URL) for an earlier message are replaced by a
+    back-reference, URLs are shortened for display, and message text and hit summaries are trimmed extractively
+    to each message's share of the budget.
+    """
+    if not validated:
+        return []
+
+    per_message = budget // len(validated)
+    seen_urls = {}
+    blocks = []
+    for idx, item in enumerate(validated, 1):
+        message = trim_to_tokens(item["message"], per_message // 3)
+        header = f"{idx}. {item['status']} - {message}"
+
+        hits = item.get("exa_hits") or []
+        fresh, repeated = [], []
+        for hit in hits:
+            # Compared on the full URL: pages differing only in query or a long path share a short form
+            url = hit.get("url")
+            if url and url in seen_urls:
+                repeated.append(seen_urls[url])
+            else:
+                if url:
+                    seen_urls[url] = idx
+                fresh.append((shorten_url(url), hit))
+
+        lines = []
+        if fresh:
+            summary_budget = max(0, (per_message - count_tokens(header)) // len(fresh) - 20)
+            for url, hit in fresh:
+                summary = trim_to_tokens(hit.get("summary") or "", summary_budget)
+                lines.append(f"- {hit.get('title')} ({url}, {hit.get('published_date')}): {summary}")
+        if repeated:
+            lines.append("- Also reported in: " + ", ".join(f"#{ref}" for ref in sorted(set(repeated))))
+        if not hits:
+            lines.append(trim_to_tokens(item["exa_results"], max(0, per_message - count_tokens(header))))
+
+        blocks.append(header + "\n" + "\n".join(lines))
+    return blocks
+
+
+def render_prompt(template, inputs):
+    """Fill `{name}` placeholders the way crewai does, leaving unknown ones untouched."""
+    return _PLACEHOLDER_RE.sub(lambda m: str(inputs.get(m.group(1), m.group(0))), template)
+
+
+def fit_inputs_to_budget(template, inputs, budget=CREW_TASK_TOKEN_BUDGET):
+    """
+    Trim the text inputs used by `template` so the rendered prompt fits in `budget` tokens.
+    Fields shrink in proportion to their size; returns (inputs, rendered token count).
+    """
+    occurrences = Counter(name for name in _PLACEHOLDER_RE.findall(template) if isinstance(inputs.get(name), str))
+    tokens = count_tokens(render_prompt(template, inputs))
+    if tokens <= budget or not occurrences:
+        return inputs, tokens
+
+    fixed = count_tokens(_PLACEHOLDER_RE.sub("", template))
+    sizes = {name: count_tokens(inputs[name]) * n for name, n in occurrences.items()}
+    total = sum(sizes.values()) or 1
+    available = max(0, budget - fixed)
+
+    fitted = dict(inputs)
+    for name, n in occurrences.items():
+        fitted[name] = trim_to_tokens(inputs[name], available * sizes[name] // total // n)
+    return fitted, count_tokens(render_prompt(template, fitted))